@@ -1,5 +1,5 @@
 import mongoose from "mongoose";
-import submissioSchema from "./schema.js";
+import submissioSchema, { samplePoolSchema } from "./schema.js";
 import { getCurrentYear } from "../config/globalConfig.js";
 
 const models = {
@@ -16,6 +16,8 @@ const getCurrentModel = () => {
 
 export const collection_name = models["2024"].collection.name;
 
+const SamplePool = mongoose.model("sample_pools", samplePoolSchema, "sample_pools");
+
 export const createSubmission = (submission) => {
   delete submission._id;
   return getCurrentModel().create(submission);
@@ -60,7 +62,63 @@ export const findSubmissionsByAbstract = (words) =>  getCurrentModel().find({ ab
 export const findMetaReviewsByUrl = (url) =>  getCurrentModel().find({ url : url })[0].metareviews;
 
 export const deleteSubmission = (id) => getCurrentModel().deleteOne({ _id: id });
-export const getRandomSubmission = (num) => getCurrentModel().aggregate([{ $sample: { size: num } }]);
+
+// Split num picks across strata in proportion to their size; the leftover picks go to
+// strata drawn with probability proportional to their fractional share
+const allocatePicks = (pools, num) => {
+  const total = pools.reduce((sum, pool) => sum + pool.size, 0);
+  const shares = pools.map((pool) => (Math.min(num, total) * pool.size) / total);
+  const counts = shares.map(Math.floor);
+  const fractions = shares.map((share, i) => share - counts[i]);
+  let leftover = Math.min(num, total) - counts.reduce((sum, count) => sum + count, 0);
+  while (leftover > 0) {
+    let target = Math.random() * fractions.reduce((sum, fraction) => sum + fraction, 0);
+    const i = fractions.findIndex((fraction) => (target -= fraction) < 0 && fraction > 0);
+    const pick = i === -1 ? fractions.findIndex((fraction) => fraction > 0) : i;
+    counts[pick] += 1;
+    fractions[pick] = 0;
+    leftover -= 1;
+  }
+  return counts;
+};
+
+// Claim the next count positions of a pool (one atomic $inc) and read them with $slice
+const drawFromPool = async (pool, count) => {
+  const claimed = await SamplePool.findOneAndUpdate({ _id: pool._id }, { $inc: { cursor: count } })
+    .select({ s_ids: 0 }).lean();
+  const start = claimed.cursor % claimed.size;
+  const head = await SamplePool.findById(pool._id).select({ s_ids: { $slice: [start, count] } }).lean();
+  if (head.s_ids.length >= count) {
+    return head.s_ids;
+  }
+  // The window ran past the end of the shuffled array: continue from the front
+  const tail = await SamplePool.findById(pool._id).select({ s_ids: { $slice: [0, count - head.s_ids.length] } }).lean();
+  return head.s_ids.concat(tail.s_ids);
+};
+
+const shuffle = (items) => {
+  for (let i = items.length - 1; i > 0; i--) {
+    const j = Math.floor(Math.random() * (i + 1));
+    [items[i], items[j]] = [items[j], items[i]];
+  }
+  return items;
+};
+
+// Random submissions from the precomputed stratified pools (refreshed by data/sample_pools.py);
+// falls back to $sample while the current year has no pools
+export const getRandomSubmission = async (num = 1) => {
+  // $sample needs a positive integer size
+  num = Math.max(parseInt(num) || 1, 1);
+  const pools = await SamplePool.find({ year: getCurrentYear(), size: { $gt: 0 } }).select({ s_ids: 0 }).lean();
+  if (!pools.length) {
+    return getCurrentModel().aggregate([{ $sample: { size: num } }]);
+  }
+  const counts = allocatePicks(pools, num);
+  const draws = await Promise.all(pools.map((pool, i) => (counts[i] ? drawFromPool(pool, counts[i]) : [])));
+  const submissions = await getCurrentModel().find({ s_id: { $in: draws.flat() } }).lean();
+  // Interleave the strata instead of returning them one decision after another
+  return shuffle(submissions);
+};
 
 // Missing functions that are called in routes
 export const getReviewsByUser = (userId) => getCurrentModel().find({ "metareviews.rebuttal.comments": { $elemMatch: { reply_id: userId } } });
@@ -56,8 +56,13 @@ export default function iclr(app) {
     }
 
     const getRandomSubmissions = async (req, res) => {
-        const response = await dao.getRandomSubmission();
+        try {
+            const response = await dao.getRandomSubmission(parseInt(req.params.num) || 1);
             res.json(response);
+        } catch (error) {
+            console.error("Error in getRandomSubmissions:", error);
+            res.status(500).send({ error: "Failed to retrieve random ICLR submissions" });
+        }
     }
 
     const createSubmissions = async (req, res) => {
@@ -71,7 +76,7 @@ export default function iclr(app) {
     }
     
     const getRandomSubmissionsbyAdmin = async (req, res) => {
-        const count = parseInt(req.params.num)
+        const count = parseInt(req.params.num) || 1
         const response = await dao.getRandomSubmission(count);
         res.send(response);
     }
@@ -47,5 +47,20 @@ submissioSchema.index({ year: 1 });
 submissioSchema.index({ decision: 1 });
 submissioSchema.index({ url: 1 });
 
+// Shuffled s_id pool of one (year, decision) stratum, maintained by data/sample_pools.py
+export const samplePoolSchema = new mongoose.Schema(
+    {
+        _id: {type : String}, // "<year>|<decision>"
+        year: {type : String},
+        decision: {type : String},
+        s_ids: [String],
+        size: {type : Number},
+        cursor: {type : Number}, // picks claimed so far; the next pick is s_ids[cursor % size]
+        cycle: {type : Number},
+        version: {type : Number},
+        inputHash: {type : String},
+        updatedAt: {type : Date},
+    });
+
 // Default export for backward compatibility
 export default submissioSchema;
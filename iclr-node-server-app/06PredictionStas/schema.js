@@ -13,6 +13,26 @@ const predictionStatsSchema = new mongoose.Schema({
             FN: {type: Number, default: 0},
             TP: {type: Number, default: 0},
             TN: {type: Number, default: 0},
+            // Optional, written by data/prompt_stats.py
+            accuracy: {type: Number},
+            accuracy_ci: [Number],
+            f1: {type: Number},
+            f1_ci: [Number],
+        }
+    ],
+    // Paired McNemar comparisons against other prompts (data/prompt_stats.py)
+    comparisons: [
+        {
+            against_prompt: {type: String},
+            year: {type: Number},
+            rebuttal_in_review: {type: Number},
+            papers: {type: Number},
+            only_this_correct: {type: Number},
+            only_other_correct: {type: Number},
+            mcnemar_statistic: {type: Number},
+            mcnemar_p: {type: Number},
+            accuracy_delta: {type: Number},
+            accuracy_delta_ci: [Number],
         }
     ]
 });
@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Bulk loader for predictions and prediction stats.
+importPrediction.js looks every record's paper up with its own findOne and
+importPredictionStats.js saves one document at a time after a deleteMany({}),
+so the API serves an empty or half-filled collection while they run.
+
+This loader streams the JSONL files, resolves papers from one projected scan of
+the year collection, and writes unordered bulk_write batches from several
+threads (one pooled connection each) into a shadow collection. Live documents
+the load does not replace (other prompts, papers or rebuttal flags) are copied
+into the shadow unless --replace is given, secondary indexes are built once the
+data is in, and the shadow is renamed over the live collection, which swaps it
+in atomically; a failed load leaves the live collection untouched.
+
+Prompt ids are mapped to their text like importPrediction.js (prompts.json) and
+importPredictionStats.js (prompt_candidates.json); records of unmapped prompts are
+skipped.
+
+    python bulk_load.py predictions --files result_rebut.jsonl --year 2024
+    python bulk_load.py stats --files prediction_stats_significance.jsonl --replace
+    python bulk_load.py benchmark --records 50000
+"""
+
+import argparse
+import glob
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import chain, islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ASCENDING, IndexModel, InsertOne, MongoClient
+from pymongo.errors import BulkWriteError
+
+from common import batched
+from prediction_matrix import DEFAULT_PROMPTS, iter_jsonl, load_prompts
+
+# Collections the 05Prompt and 06PredictionStas daos read
+PREDICTION_COLLECTIONS = {2024: 'predictions', 2025: 'prediction_2025', 2026: 'prediction_2026'}
+STATS_COLLECTION = 'predictionstats'
+
+SHADOW_SUFFIX = '__loading'
+
+# PROMPT_CANDIDATES of importPredictionStats.js, keyed by their 1-based number
+DEFAULT_CANDIDATES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prompt_candidates.json')
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_WORKERS = 4
+
+# Batch sizes tried on the first documents of a load with --tune
+TUNE_BATCH_SIZES = [250, 1000, 4000]
+
+# Indexes for the dao queries (findOne by paper/prompt/rebuttal, find by prompt/rebuttal, by prompt_type)
+PREDICTION_INDEXES = [
+    IndexModel([('paper_id', ASCENDING), ('prompt', ASCENDING), ('rebuttal', ASCENDING)]),
+    IndexModel([('prompt', ASCENDING), ('rebuttal', ASCENDING)]),
+]
+STATS_INDEXES = [
+    IndexModel([('prompt', ASCENDING)]),
+    IndexModel([('prompt_type', ASCENDING)]),
+]
+
+# Fields identifying a document; live documents whose key is not loaded are kept
+PREDICTION_KEY = ['paper_id', 'prompt', 'rebuttal']
+STATS_KEY = ['prompt', 'prompt_type']
+
+# Index options carried over from the live collection to the shadow
+INDEX_OPTIONS = ['unique', 'sparse', 'partialFilterExpression', 'expireAfterSeconds', 'collation']
+
+
+def prediction_label(value) -> str:
+    text = str(value or '').strip(' *').lower()
+    if text in ('yes', 'accept'):
+        return 'Accept'
+    if text in ('no', 'reject'):
+        return 'Reject'
+    return 'Borderline'
+
+
+def decision_label(value) -> str:
+    return 'Reject' if str(value or '').lower() in ('no', 'reject') else 'Accept'
+
+
+def load_papers(collection) -> Dict[str, Tuple[ObjectId, str, str]]:
+    """s_id -> (_id, title, decision) from one projected scan instead of a findOne per record."""
+    return {
+        paper['s_id']: (paper['_id'], paper.get('title') or '', paper.get('decision') or '')
+        for paper in collection.find({}, {'s_id': 1, 'title': 1, 'decision': 1})
+        if paper.get('s_id')
+    }
+
+
+def prediction_documents(paths: List[str], papers: Dict[str, Tuple[ObjectId, str, str]],
+                         prompts: Dict[str, dict], model: str, skipped: Dict[str, int]) -> Iterator[dict]:
+    """Prediction documents for the result records, in the shape of 05Prompt/schema.js."""
+    for record in chain.from_iterable(iter_jsonl(path) for path in paths):
+        prompt_id, s_id = record.get('prompt'), record.get('s_id')
+        if prompt_id is None or s_id is None:
+            skipped['incomplete'] += 1
+            continue
+        prompt = prompts.get(str(prompt_id))
+        if prompt is None:
+            skipped['unknown_prompt'] += 1
+            continue
+        if s_id not in papers:
+            skipped['unknown_paper'] += 1
+            continue
+        paper_id, title, decision = papers[s_id]
+        yield {
+            'prompt': prompt['prompt'],
+            'prompt_type': prompt['prompt_type'],
+            'paper_id': paper_id,
+            'paper_title': title,
+            'model': model,
+            'rebuttal': record.get('rebuttal', -1),
+            # Tolerates the "prediciton" typo of the result files
+            'prediction': prediction_label(record.get('prediciton', record.get('prediction'))),
+            'decision': decision_label(decision),
+            '__v': 0,
+        }
+
+
+def stats_documents(paths: List[str], prompts: Dict[str, dict], skipped: Dict[str, int]) -> Iterator[dict]:
+    """Prediction stats documents for prediction_stats.jsonl / prompt_stats.py output (prompts by candidate number)."""
+    for record in chain.from_iterable(iter_jsonl(path) for path in paths):
+        prompt_id = str(record.get('prompt'))
+        if prompt_id not in prompts:
+            skipped['unknown_prompt'] += 1
+            continue
+        yield {
+            'prompt': prompts[prompt_id]['prompt'],
+            'prompt_type': record.get('prompt_type', -1),
+            'predictions': record.get('predictions', []),
+            'comparisons': record.get('comparisons', []),
+            '__v': 0,
+        }
+
+
+class ShadowBulkLoader:
+    """Loads a collection's replacement into a shadow collection and renames it over the original."""
+
+    def __init__(self, db, name: str, batch_size: int = DEFAULT_BATCH_SIZE, workers: int = DEFAULT_WORKERS,
+                 indexes: Optional[List[IndexModel]] = None, key: Optional[List[str]] = None):
+        self.db = db
+        self.name = name
+        self.shadow_name = f"{name}{SHADOW_SUFFIX}"
+        self.batch_size = batch_size
+        self.workers = workers
+        self.indexes = indexes or []
+        self.key = key or []
+        self.lock = threading.Lock()
+        self.inserted = 0
+        self.errors: List[dict] = []
+
+    def write_batch(self, batch: List[dict]) -> int:
+        try:
+            result = self.db[self.shadow_name].bulk_write([InsertOne(document) for document in batch], ordered=False)
+            inserted = result.inserted_count
+        except BulkWriteError as error:
+            inserted = error.details.get('nInserted', 0)
+            with self.lock:
+                self.errors.extend(error.details.get('writeErrors', [])[:10])
+        with self.lock:
+            self.inserted += inserted
+        return inserted
+
+    def tune_batch_size(self, documents: Iterator[dict]) -> int:
+        """Write one batch of each candidate size and keep the fastest (the batches are part of the load)."""
+        rates = {}
+        for size in TUNE_BATCH_SIZES:
+            batch = list(islice(documents, size))
+            if not batch:
+                break
+            started = time.perf_counter()
+            self.write_batch(batch)
+            rates[size] = len(batch) / max(time.perf_counter() - started, 1e-9)
+        return max(rates, key=rates.get) if rates else self.batch_size
+
+    def write_all(self, documents: Iterator[dict]) -> None:
+        """Write documents in batches from the thread pool (at most 2 x workers batches are held)."""
+        pending = set()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for batch in batched(documents, self.batch_size):
+                if len(pending) >= 2 * self.workers:
+                    _, pending = wait(pending, return_when=FIRST_COMPLETED)
+                pending.add(executor.submit(self.write_batch, batch))
+            for future in pending:
+                future.result()
+
+    def document_key(self, document: dict) -> tuple:
+        return tuple(document.get(field) for field in self.key)
+
+    def kept_documents(self) -> Iterator[dict]:
+        """Live documents whose key is not in the shadow, from one projected scan of the shadow."""
+        if not self.key or self.name not in self.db.list_collection_names():
+            return
+        projection = {field: 1 for field in self.key}
+        loaded = {self.document_key(document) for document in self.db[self.shadow_name].find({}, projection)}
+        for document in self.db[self.name].find():
+            if self.document_key(document) not in loaded:
+                yield document
+
+    def live_indexes(self) -> List[IndexModel]:
+        """Secondary indexes of the live collection, so the swap does not lose any."""
+        if self.name not in self.db.list_collection_names():
+            return []
+        models = []
+        for name, spec in self.db[self.name].index_information().items():
+            if name == '_id_':
+                continue
+            options = {option: spec[option] for option in INDEX_OPTIONS if option in spec}
+            models.append(IndexModel(spec['key'], name=name, **options))
+        return models
+
+    def build_indexes(self) -> List[str]:
+        models = {tuple(model.document['key'].items()): model for model in self.indexes}
+        for model in self.live_indexes():
+            models[tuple(model.document['key'].items())] = model
+        if not models:
+            return []
+        return self.db[self.shadow_name].create_indexes(list(models.values()))
+
+    def load(self, documents: Iterable[dict], tune: bool = False, swap: bool = True, replace: bool = False) -> dict:
+        """
+        Load documents into the shadow collection, index it and swap it in.
+
+        Args:
+            documents: Documents to load (streamed; at most 2 x workers batches are held)
+            tune: Pick the batch size from TUNE_BATCH_SIZES on the first documents
+            swap: Rename the shadow over the live collection (otherwise it is left for inspection)
+            replace: Drop the live documents the load does not cover instead of keeping
+                those whose key is not loaded
+
+        Returns:
+            Counts and timings of the load
+        """
+        self.db.drop_collection(self.shadow_name)
+        self.inserted, self.errors = 0, []
+        documents = iter(documents)
+        started = time.perf_counter()
+
+        if tune:
+            self.batch_size = self.tune_batch_size(documents)
+
+        self.write_all(documents)
+        loaded_records = self.inserted
+        if not replace and loaded_records:
+            self.write_all(self.kept_documents())
+        loaded = time.perf_counter()
+
+        if self.errors:
+            self.db.drop_collection(self.shadow_name)
+            raise RuntimeError(f"{len(self.errors)}+ write errors loading {self.name}, e.g. {self.errors[0].get('errmsg')}; "
+                               f"the live collection was left untouched")
+
+        indexes = self.build_indexes()
+        indexed = time.perf_counter()
+
+        if swap and self.inserted:
+            self.db[self.shadow_name].rename(self.name, dropTarget=True)
+        finished = time.perf_counter()
+
+        return {
+            'collection': self.name if swap and self.inserted else self.shadow_name,
+            'records': loaded_records,
+            'kept': self.inserted - loaded_records,
+            'batch_size': self.batch_size,
+            'workers': self.workers,
+            'indexes': indexes,
+            'load_seconds': round(loaded - started, 3),
+            'index_seconds': round(indexed - loaded, 3),
+            'swap_seconds': round(finished - indexed, 3),
+            'records_per_second': round(loaded_records / max(loaded - started, 1e-9)),
+        }
+
+
+def synthetic_predictions(count: int, seed: int = 0) -> List[dict]:
+    """Prediction-shaped documents for the benchmark."""
+    rng = random.Random(seed)
+    paper_ids = [ObjectId() for _ in range(max(count // 8, 1))]
+    prompts = [f"Prompt {i}: " + "Analyze the reviews provided for the submitted manuscript. " * 6 for i in range(8)]
+    return [
+        {
+            'prompt': prompts[i % 8], 'prompt_type': 0, 'paper_id': paper_ids[i // 8 % len(paper_ids)],
+            'paper_title': f"Paper {i // 8}", 'model': 'gpt-4o-mini', 'rebuttal': rng.randint(0, 1),
+            'prediction': rng.choice(['Accept', 'Reject']), 'decision': rng.choice(['Accept', 'Reject']), '__v': 0,
+        }
+        for i in range(count)
+    ]
+
+
+def run_benchmark(db, records: int, configs: List[Tuple[int, int]]) -> List[dict]:
+    """
+    Records/sec of the JS import patterns against the bulk loader on a scratch collection.
+
+    Args:
+        db: Database to benchmark in (scratch collections are dropped afterwards)
+        records: Synthetic prediction documents per run
+        configs: (batch size, workers) pairs for the bulk loader
+
+    Returns:
+        One result per strategy, with its speedup over per-record inserts
+    """
+    documents = synthetic_predictions(records)
+    name = 'bulk_load_benchmark'
+    results = []
+
+    def timed(strategy: str, write) -> None:
+        db.drop_collection(name)
+        copies = [dict(document) for document in documents]
+        started = time.perf_counter()
+        write(copies)
+        elapsed = time.perf_counter() - started
+        results.append({'strategy': strategy, 'records': records, 'seconds': round(elapsed, 3),
+                        'records_per_second': round(records / max(elapsed, 1e-9))})
+
+    # importPredictionStats.js: one save per document
+    timed('insert_one per record', lambda copies: [db[name].insert_one(document) for document in copies])
+    # importPrediction.js: ordered insertMany of 100 (without its findOne per record and 100 ms pauses)
+    timed('ordered insert_many x100',
+          lambda copies: [db[name].insert_many(batch, ordered=True) for batch in batched(copies, 100)])
+    for batch_size, workers in configs:
+        timed(f"bulk loader {batch_size} x {workers} workers",
+              lambda copies: ShadowBulkLoader(db, name, batch_size, workers, PREDICTION_INDEXES).load(copies, replace=True))
+
+    db.drop_collection(name)
+    db.drop_collection(f"{name}{SHADOW_SUFFIX}")
+    baseline = results[0]['records_per_second']
+    for result in results:
+        result['speedup'] = round(result['records_per_second'] / max(baseline, 1), 1)
+    return results
+
+
+def main():
+    """Main function to handle command line arguments."""
+    parser = argparse.ArgumentParser(description="Bulk-load predictions or prediction stats through a shadow collection")
+    parser.add_argument("--uri", default=None,
+                        help="MongoDB connection string (default: DB_CONNECTION_STRING, like the server)")
+    parser.add_argument("--db", help="Database name (default: the one in the connection string)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Writer threads (one connection each)")
+    parser.add_argument("--tune", action="store_true", help=f"Pick the batch size from {TUNE_BATCH_SIZES}")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    predictions = commands.add_parser("predictions", help="Load result_*.jsonl files")
+    predictions.add_argument("--files", nargs="+", required=True, help="result_*.jsonl files (globs allowed)")
+    predictions.add_argument("--year", type=int, default=2024, choices=sorted(PREDICTION_COLLECTIONS))
+    predictions.add_argument("--prompts", default=DEFAULT_PROMPTS,
+                             help="JSON object of result prompt id -> prompt text (or {prompt, prompt_type}) "
+                                  "(default: prompts.json, the importPrediction.js mapping)")
+    predictions.add_argument("--model", default='gpt-4o-mini')
+    predictions.add_argument("--no-swap", action="store_true", help="Leave the loaded shadow collection in place")
+    predictions.add_argument("--replace", action="store_true",
+                             help="Replace the whole collection instead of keeping predictions the files do not cover")
+
+    stats = commands.add_parser("stats", help="Load prediction_stats.jsonl or prompt_stats.py output")
+    stats.add_argument("--files", nargs="+", required=True, help="Prediction stats JSONL files (globs allowed)")
+    stats.add_argument("--prompts", default=DEFAULT_CANDIDATES,
+                       help="JSON object of prompt number -> prompt text "
+                            "(default: prompt_candidates.json, the importPredictionStats.js candidates)")
+    stats.add_argument("--no-swap", action="store_true", help="Leave the loaded shadow collection in place")
+    stats.add_argument("--replace", action="store_true",
+                       help="Replace the whole collection (like importPredictionStats.js) instead of keeping "
+                            "stats of prompts the files do not cover")
+
+    benchmark = commands.add_parser("benchmark", help="Compare records/sec with the JS import patterns")
+    benchmark.add_argument("--records", type=int, default=20000)
+    benchmark.add_argument("--configs", nargs="+", default=["1000x1", "1000x4", "4000x4"],
+                           help="Bulk loader configs as <batch size>x<workers>")
+    args = parser.parse_args()
+
+    uri = args.uri or os.getenv('DB_CONNECTION_STRING', 'mongodb://localhost:27017/iclr')
+    client = MongoClient(uri, maxPoolSize=max(args.workers, 4) + 1)
+    db = client[args.db] if args.db else client.get_default_database()
+
+    try:
+        if args.command == "benchmark":
+            configs = [tuple(int(part) for part in config.split('x')) for config in args.configs]
+            for result in run_benchmark(db, args.records, configs):
+                print(f"{result['strategy']:<32} {result['records_per_second']:>9} records/s "
+                      f"({result['seconds']} s, {result['speedup']}x)")
+            return
+
+        files = sorted(path for pattern in args.files for path in glob.glob(pattern))
+        if not files:
+            print(f"Error: no files match {args.files}")
+            sys.exit(1)
+        try:
+            prompts = load_prompts(args.prompts)
+        except (OSError, ValueError) as error:
+            print(f"Error: {error}")
+            sys.exit(1)
+        skipped = {'incomplete': 0, 'unknown_paper': 0, 'unknown_prompt': 0}
+
+        if args.command == "predictions":
+            papers = load_papers(db[f"iclr_{args.year}"])
+            documents = prediction_documents(files, papers, prompts, args.model, skipped)
+            loader = ShadowBulkLoader(db, PREDICTION_COLLECTIONS[args.year], args.batch_size, args.workers,
+                                      PREDICTION_INDEXES, PREDICTION_KEY)
+        else:
+            documents = stats_documents(files, prompts, skipped)
+            loader = ShadowBulkLoader(db, STATS_COLLECTION, args.batch_size, args.workers, STATS_INDEXES, STATS_KEY)
+
+        try:
+            result = loader.load(documents, tune=args.tune, swap=not args.no_swap, replace=args.replace)
+        except RuntimeError as error:
+            print(f"Error: {error}")
+            sys.exit(1)
+    finally:
+        client.close()
+
+    print(f"Loaded {result['records']} records into {result['collection']} "
+          f"({result['records_per_second']} records/s, batch size {result['batch_size']}, {result['workers']} workers)")
+    if result['kept']:
+        print(f"Kept {result['kept']} live records the files do not cover")
+    print(f"Load {result['load_seconds']} s, indexes {result['index_seconds']} s, swap {result['swap_seconds']} s")
+    for reason, count in skipped.items():
+        if count:
+            print(f"Skipped ({reason}): {count}")
+
+
+if __name__ == "__main__":
+    main()
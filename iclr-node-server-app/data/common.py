@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+"""
+Helpers shared by the data tools in this directory.
+"""
+
+from itertools import islice
+from typing import Iterable, Iterator
+
+# Year collections served by the 02ICLR dao
+DEFAULT_YEARS = [2024, 2025, 2026]
+
+
+def batched(items: Iterable, size: int) -> Iterator[list]:
+    """Consecutive lists of up to size items."""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Batched consistency repair for the submission, like, comment and prediction collections.
+Replaces the one-document-at-a-time fix scripts (fixLikeConsistency.js,
+deleteDuplicates.js): every inconsistency is found with a server-side aggregation,
+and the fixes are applied as unordered bulk_write batches.
+
+Checks:
+    duplicate_s_ids        papers sharing an s_id in a year collection; the copy with the
+                           most metareviews (then the oldest) is kept and predictions,
+                           likes and comments are repointed to it
+    duplicate_likes        several likes by one user on one paper (inflate the like ranking)
+    orphan_likes           likes of papers that no year collection contains
+    orphan_comments        comments on papers that no year collection contains
+    duplicate_predictions  several predictions of one paper, prompt and rebuttal
+
+A scan is saved as JSON: its consistency_metrics section uses the issue model of
+ICLRDataValidator (set CONSISTENCY_SCAN for data-validation.py to report it), and
+its operations are what --apply executes, so validation and repair share one scan.
+Operations delete by _id or repoint one value, so applying a scan twice, or after
+part of it was applied, is harmless. Repointing can expose new duplicate likes;
+run the repair again until the scan comes back empty.
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from bson import json_util
+from pymongo import DeleteOne, MongoClient, UpdateMany
+
+from bulk_load import PREDICTION_COLLECTIONS
+from common import DEFAULT_YEARS
+
+CHECKS = ['duplicate_s_ids', 'duplicate_likes', 'orphan_likes', 'orphan_comments', 'duplicate_predictions']
+
+# Collections of the 03PublicComments dao
+LIKES_COLLECTION = 'likes'
+COMMENTS_COLLECTION = 'comments'
+
+DEFAULT_BATCH_SIZE = 500
+
+# Keys kept per issue
+SAMPLE_SIZE = 10
+
+
+def duplicate_groups(collection, key: dict, sort: dict, prefix: Optional[List[dict]] = None) -> List[dict]:
+    """Groups of _ids sharing a key, each ordered by sort so the first one is the one to keep."""
+    pipeline = (prefix or []) + [
+        {'$sort': sort},
+        {'$group': {'_id': key, 'ids': {'$push': '$_id'}, 'count': {'$sum': 1}}},
+        {'$match': {'count': {'$gt': 1}}},
+    ]
+    return list(collection.aggregate(pipeline, allowDiskUse=True))
+
+
+class ConsistencyRepairEngine:
+    """Scans for inconsistencies and applies the planned fixes in throttled batches."""
+
+    def __init__(self, db, years: Optional[List[int]] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_ops_per_second: Optional[float] = None):
+        self.db = db
+        self.years = years or DEFAULT_YEARS
+        self.batch_size = batch_size
+        self.max_ops_per_second = max_ops_per_second
+
+    def prediction_collections(self) -> List[str]:
+        return [PREDICTION_COLLECTIONS[year] for year in self.years if year in PREDICTION_COLLECTIONS]
+
+    def check_duplicate_s_ids(self) -> Iterable[Tuple[dict, List[dict]]]:
+        for year in self.years:
+            name = f"iclr_{year}"
+            groups = duplicate_groups(
+                self.db[name], '$s_id', {'reviews': -1, '_id': 1},
+                prefix=[{'$project': {'s_id': 1, 'reviews': {'$size': {'$ifNull': ['$metareviews', []]}}}}]
+            )
+            operations = []
+            for group in groups:
+                kept = group['ids'][0]
+                for duplicate in group['ids'][1:]:
+                    for referencing in [LIKES_COLLECTION, COMMENTS_COLLECTION] + self.prediction_collections():
+                        operations.append({'op': 'repoint', 'collection': referencing, 'field': 'paper_id',
+                                           'from': duplicate, 'to': kept})
+                    operations.append({'op': 'delete', 'collection': name, '_id': duplicate,
+                                       'reason': f"duplicate of {kept} (s_id {group['_id']})"})
+            yield {
+                'type': 'duplicate_s_id', 'collection': name, 'count': len(groups),
+                'documents': sum(group['count'] - 1 for group in groups),
+                'sample': [group['_id'] for group in groups[:SAMPLE_SIZE]], 'severity': 'high'
+            }, operations
+
+    def check_duplicates(self, issue_type: str, name: str, fields: List[str]) -> Tuple[dict, List[dict]]:
+        """Duplicates over some fields; the oldest document of each group is kept."""
+        groups = duplicate_groups(self.db[name], {field: f"${field}" for field in fields}, {'_id': 1})
+        operations = [
+            {'op': 'delete', 'collection': name, '_id': duplicate,
+             'reason': f"duplicate of {group['ids'][0]} ({', '.join(f'{k}={v}' for k, v in group['_id'].items())})"}
+            for group in groups for duplicate in group['ids'][1:]
+        ]
+        return {
+            'type': issue_type, 'collection': name, 'count': len(groups), 'documents': len(operations),
+            'sample': [{key: str(value) for key, value in group['_id'].items()} for group in groups[:SAMPLE_SIZE]],
+            'severity': 'medium'
+        }, operations
+
+    def check_orphans(self, issue_type: str, name: str) -> Tuple[dict, List[dict]]:
+        """Documents whose paper_id is in none of the year collections."""
+        pipeline = [{'$group': {'_id': '$paper_id', 'ids': {'$push': '$_id'}}}]
+        for year in self.years:
+            pipeline.append({'$lookup': {'from': f"iclr_{year}", 'localField': '_id', 'foreignField': '_id',
+                                         'as': f"in_{year}"}})
+        pipeline.append({'$match': {f"in_{year}": {'$size': 0} for year in self.years}})
+        pipeline.append({'$project': {'ids': 1}})
+        groups = list(self.db[name].aggregate(pipeline, allowDiskUse=True))
+        operations = [
+            {'op': 'delete', 'collection': name, '_id': orphan, 'reason': f"paper {group['_id']} does not exist"}
+            for group in groups for orphan in group['ids']
+        ]
+        return {
+            'type': issue_type, 'collection': name, 'count': len(groups), 'documents': len(operations),
+            'sample': [str(group['_id']) for group in groups[:SAMPLE_SIZE]], 'severity': 'medium'
+        }, operations
+
+    def scan(self, checks: Optional[List[str]] = None) -> dict:
+        """
+        Run the checks and plan their fixes.
+
+        Args:
+            checks: Subset of CHECKS (default: all)
+
+        Returns:
+            Scan with consistency_metrics (issues in the ICLRDataValidator shape) and operations
+        """
+        checks = checks or CHECKS
+        found: List[Tuple[dict, List[dict]]] = []
+        if 'duplicate_s_ids' in checks:
+            found.extend(self.check_duplicate_s_ids())
+        if 'duplicate_likes' in checks:
+            found.append(self.check_duplicates('duplicate_like', LIKES_COLLECTION, ['paper_id', 'user']))
+        if 'orphan_likes' in checks:
+            found.append(self.check_orphans('orphan_like', LIKES_COLLECTION))
+        if 'orphan_comments' in checks:
+            found.append(self.check_orphans('orphan_comment', COMMENTS_COLLECTION))
+        if 'duplicate_predictions' in checks:
+            for name in self.prediction_collections():
+                found.append(self.check_duplicates('duplicate_prediction', name, ['paper_id', 'prompt', 'rebuttal']))
+
+        scanned = sorted({issue['collection'] for issue, _ in found})
+        operations = [operation for _, planned in found for operation in planned]
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'database': self.db.name,
+            'consistency_metrics': {
+                'checks': checks,
+                'documents_scanned': {name: self.db[name].estimated_document_count() for name in scanned},
+                'planned_operations': len(operations),
+                'issues': [issue for issue, _ in found if issue['count']],
+            },
+            # Repoint references before deleting the duplicates they point at
+            'operations': sorted(operations, key=lambda operation: operation['op'] != 'repoint'),
+        }
+
+    def throttle(self, started: float, applied: int) -> None:
+        if self.max_ops_per_second:
+            ahead = applied / self.max_ops_per_second - (time.perf_counter() - started)
+            if ahead > 0:
+                time.sleep(ahead)
+
+    def apply(self, scan: dict) -> Dict[str, dict]:
+        """Execute a scan's operations in unordered bulk_write batches per collection."""
+        results: Dict[str, dict] = {}
+        started = time.perf_counter()
+        applied = 0
+        batch: List = []
+        batch_collection = None
+
+        def flush():
+            if not batch:
+                return
+            result = self.db[batch_collection].bulk_write(batch, ordered=False)
+            totals = results.setdefault(batch_collection, {'operations': 0, 'modified': 0, 'deleted': 0})
+            totals['operations'] += len(batch)
+            totals['modified'] += result.modified_count
+            totals['deleted'] += result.deleted_count
+            batch.clear()
+
+        for operation in scan['operations']:
+            if operation['collection'] != batch_collection or len(batch) >= self.batch_size:
+                flush()
+                self.throttle(started, applied)
+                batch_collection = operation['collection']
+            if operation['op'] == 'repoint':
+                batch.append(UpdateMany({operation['field']: operation['from']},
+                                        {'$set': {operation['field']: operation['to']}}))
+            else:
+                batch.append(DeleteOne({'_id': operation['_id']}))
+            applied += 1
+        flush()
+        return results
+
+
+def diff_lines(scan: dict) -> Iterable[str]:
+    """Dry-run diff of a scan's operations."""
+    for operation in scan['operations']:
+        if operation['op'] == 'repoint':
+            yield (f"~ {operation['collection']}: {operation['field']} {operation['from']} -> {operation['to']}")
+        else:
+            yield f"- {operation['collection']}: {operation['_id']}  {operation.get('reason', '')}".rstrip()
+
+
+def main():
+    """Main function to handle command line arguments."""
+    parser = argparse.ArgumentParser(description="Find and repair duplicates and orphans in the ICLR collections")
+    parser.add_argument("--uri", default=None,
+                        help="MongoDB connection string (default: DB_CONNECTION_STRING, like the server)")
+    parser.add_argument("--db", help="Database name (default: the one in the connection string)")
+    parser.add_argument("--years", nargs="+", type=int, default=DEFAULT_YEARS)
+    parser.add_argument("--checks", nargs="+", choices=CHECKS, default=CHECKS)
+    parser.add_argument("--from-scan", help="Apply a saved scan instead of scanning again")
+    parser.add_argument("--scan-output", default="consistency_scan.json",
+                        help="Where to save the scan (set CONSISTENCY_SCAN to it for data-validation.py)")
+    parser.add_argument("--diff", help="Write the full dry-run diff to this file")
+    parser.add_argument("--apply", action="store_true", help="Apply the fixes (default: dry run)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--max-ops-per-second", type=float, help="Throttle writes to this many operations per second")
+    args = parser.parse_args()
+
+    uri = args.uri or os.getenv('DB_CONNECTION_STRING', 'mongodb://localhost:27017/iclr')
+    client = MongoClient(uri)
+    db = client[args.db] if args.db else client.get_default_database()
+    engine = ConsistencyRepairEngine(db, args.years, args.batch_size, args.max_ops_per_second)
+
+    try:
+        if args.from_scan:
+            with open(args.from_scan, 'r', encoding='utf-8') as infile:
+                scan = json_util.loads(infile.read())
+            if scan['database'] != db.name:
+                print(f"Error: scan is of database {scan['database']}, not {db.name}")
+                sys.exit(1)
+        else:
+            scan = engine.scan(args.checks)
+            with open(args.scan_output, 'w', encoding='utf-8') as outfile:
+                outfile.write(json_util.dumps(scan, indent=2))
+
+        for issue in scan['consistency_metrics']['issues']:
+            print(f"{issue['type']:<22} {issue['collection']:<16} {issue['count']} groups, "
+                  f"{issue['documents']} documents ({issue['severity']})")
+        if not scan['consistency_metrics']['issues']:
+            print("No inconsistencies found")
+
+        lines = list(diff_lines(scan))
+        if args.diff:
+            with open(args.diff, 'w', encoding='utf-8') as outfile:
+                outfile.write("\n".join(lines) + ("\n" if lines else ""))
+        for line in lines[:20]:
+            print(line)
+        if len(lines) > 20:
+            print(f"... {len(lines) - 20} more operations" + (f" (see {args.diff})" if args.diff else ""))
+
+        if args.apply and lines:
+            for name, totals in engine.apply(scan).items():
+                print(f"Applied {totals['operations']} operations to {name}: "
+                      f"{totals['modified']} modified, {totals['deleted']} deleted")
+        elif lines:
+            print("Dry run; pass --apply to make these changes")
+    finally:
+        client.close()
+
+    if not args.from_scan:
+        print(f"Scan: {args.scan_output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Referential-integrity check between predictions and submissions.
+Finds orphan predictions (s_ids that no year collection contains) and coverage
+gaps (submissions without a prediction) for every prompt x rebuttal x year, for
+the result_*.jsonl files and for predictions already imported into MongoDB.
+
+Submissions are indexed once and the predictions are streamed against the index
+in batches, so memory depends on the number of submissions, not prediction rows:
+    sorted  exact; a sorted fixed-width s_id array plus one coverage bitmap per
+            prompt x rebuttal
+    bloom   approximate and smaller; one Bloom filter per year, and one per
+            prompt x rebuttal of the predicted s_ids that the submissions are
+            streamed back against. Filters never miss a member, so every
+            reported orphan or gap is real, but about the false-positive rate
+            of them can go unreported.
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from common import DEFAULT_YEARS, batched
+from paper_loader import read_dictionary
+from prediction_matrix import iter_jsonl, iter_papers
+
+# The Bloom filter is the one the EMR validation job uses for the same check
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir,
+                             "testing-monitoring-design", "emr", "scripts"))
+from bloom_filter import DEFAULT_FALSE_POSITIVE_RATE, BloomFilter
+
+Key = Tuple[str, int]
+
+# Orphan and gap s_ids kept per report row
+SAMPLE_SIZE = 10
+
+BATCH_SIZE = 10000
+
+
+class SortedIndex:
+    """Exact s_id -> year index as a sorted fixed-width byte array, with one coverage bitmap per key."""
+
+    def __init__(self, submissions: Iterable[Tuple[str, str]]):
+        keys, years = [], []
+        for key, year in submissions:
+            keys.append(key.encode('utf-8'))
+            years.append(year)
+        order = np.argsort(np.array(keys, dtype=bytes), kind='stable')
+        self.keys = np.array(keys, dtype=bytes)[order]
+        self.year_names = sorted(set(years))
+        codes = {year: code for code, year in enumerate(self.year_names)}
+        self.years = np.array([codes[year] for year in years], dtype=np.int16)[order]
+        self.covered: Dict[Key, np.ndarray] = {}
+
+    def year_counts(self) -> Dict[str, int]:
+        return {year: int((self.years == code).sum()) for code, year in enumerate(self.year_names)}
+
+    def lookup(self, keys: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """(found, positions) of a batch of s_ids."""
+        probe = np.array([key.encode('utf-8') for key in keys], dtype=self.keys.dtype if len(self.keys) else bytes)
+        positions = np.searchsorted(self.keys, probe)
+        clipped = np.minimum(positions, max(len(self.keys) - 1, 0))
+        found = (positions < len(self.keys)) & (self.keys[clipped] == probe) if len(self.keys) else \
+            np.zeros(len(keys), dtype=bool)
+        return found, clipped
+
+    def stream(self, predictions: Iterable[Tuple[str, int, str]], tally: "IntegrityTally") -> None:
+        for batch in batched(predictions, BATCH_SIZE):
+            found, positions = self.lookup([s_id for _, _, s_id in batch])
+            for (prompt, rebuttal, s_id), hit, position in zip(batch, found, positions):
+                key = (prompt, rebuttal)
+                if not hit:
+                    tally.orphan(key, s_id)
+                    continue
+                tally.prediction(key, self.year_names[self.years[position]])
+                if key not in self.covered:
+                    self.covered[key] = np.zeros(len(self.keys), dtype=bool)
+                self.covered[key][position] = True
+
+    def gaps(self, keys: List[Key], tally: "IntegrityTally") -> None:
+        for key in keys:
+            covered = self.covered.get(key, np.zeros(len(self.keys), dtype=bool))
+            for code, year in enumerate(self.year_names):
+                missing = np.flatnonzero(~covered & (self.years == code))
+                tally.gap(key, year, len(missing), [key.decode('utf-8') for key in self.keys[missing[:SAMPLE_SIZE]]])
+
+    @property
+    def nbytes(self) -> int:
+        return self.keys.nbytes + self.years.nbytes + sum(bitmap.nbytes for bitmap in self.covered.values())
+
+
+class BloomIndex:
+    """Approximate index: a Bloom filter per year, and per key a filter of the predicted s_ids."""
+
+    def __init__(self, submissions: Callable[[], Iterable[Tuple[str, str]]],
+                 false_positive_rate: float = DEFAULT_FALSE_POSITIVE_RATE):
+        self.submissions = submissions
+        self.false_positive_rate = false_positive_rate
+        self.counts: Dict[str, int] = {}
+        for _, year in submissions():
+            self.counts[year] = self.counts.get(year, 0) + 1
+        self.year_filters = {year: BloomFilter(count, false_positive_rate) for year, count in self.counts.items()}
+        for batch in batched(submissions(), BATCH_SIZE):
+            by_year: Dict[str, List[str]] = {}
+            for key, year in batch:
+                by_year.setdefault(year, []).append(key)
+            for year, keys in by_year.items():
+                self.year_filters[year].add_many(keys)
+        self.covered: Dict[Key, BloomFilter] = {}
+
+    def year_counts(self) -> Dict[str, int]:
+        return dict(self.counts)
+
+    def stream(self, predictions: Iterable[Tuple[str, int, str]], tally: "IntegrityTally") -> None:
+        years = sorted(self.year_filters)
+        for batch in batched(predictions, BATCH_SIZE):
+            s_ids = [s_id for _, _, s_id in batch]
+            # First year whose filter holds the s_id, -1 for orphans
+            matches = np.full(len(batch), -1)
+            for code, year in enumerate(years):
+                hits = self.year_filters[year].contains_many(s_ids) & (matches < 0)
+                matches[hits] = code
+            by_key: Dict[Key, List[str]] = {}
+            for (prompt, rebuttal, s_id), code in zip(batch, matches):
+                key = (prompt, rebuttal)
+                if code < 0:
+                    tally.orphan(key, s_id)
+                    continue
+                tally.prediction(key, years[code])
+                by_key.setdefault(key, []).append(s_id)
+            for key, keys in by_key.items():
+                if key not in self.covered:
+                    self.covered[key] = BloomFilter(sum(self.counts.values()), self.false_positive_rate)
+                self.covered[key].add_many(keys)
+
+    def gaps(self, keys: List[Key], tally: "IntegrityTally") -> None:
+        missing = {(key, year): [0, []] for key in keys for year in self.counts}
+        for batch in batched(self.submissions(), BATCH_SIZE):
+            s_ids = [s_id for s_id, _ in batch]
+            for key in keys:
+                present = self.covered[key].contains_many(s_ids) if key in self.covered else np.zeros(len(batch), bool)
+                for (s_id, year), hit in zip(batch, present):
+                    if not hit:
+                        entry = missing[(key, year)]
+                        entry[0] += 1
+                        if len(entry[1]) < SAMPLE_SIZE:
+                            entry[1].append(s_id)
+        for (key, year), (count, sample) in missing.items():
+            tally.gap(key, year, count, sample)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(bloom.nbytes for bloom in list(self.year_filters.values()) + list(self.covered.values()))
+
+
+class IntegrityTally:
+    """Counts of predictions, orphans and gaps per prompt x rebuttal (x year)."""
+
+    def __init__(self):
+        self.predictions: Dict[Tuple[Key, str], int] = {}
+        self.orphans: Dict[Key, list] = {}
+        self.missing: Dict[Tuple[Key, str], list] = {}
+        self.rows = 0
+
+    def prediction(self, key: Key, year: str) -> None:
+        self.rows += 1
+        self.predictions[(key, year)] = self.predictions.get((key, year), 0) + 1
+
+    def orphan(self, key: Key, s_id: str) -> None:
+        self.rows += 1
+        entry = self.orphans.setdefault(key, [0, []])
+        entry[0] += 1
+        if len(entry[1]) < SAMPLE_SIZE:
+            entry[1].append(s_id)
+
+    def gap(self, key: Key, year: str, count: int, sample: List[str]) -> None:
+        self.missing[(key, year)] = [count, sample]
+
+    def keys(self) -> List[Key]:
+        return sorted({key for key, _ in self.predictions} | set(self.orphans))
+
+
+def check_integrity(submissions: Callable[[], Iterable[Tuple[str, str]]],
+                    predictions: Iterable[Tuple[str, int, str]],
+                    method: str = 'sorted',
+                    false_positive_rate: float = DEFAULT_FALSE_POSITIVE_RATE) -> dict:
+    """
+    Stream predictions against an index of the submissions.
+
+    Args:
+        submissions: Callable returning a fresh iterable of (key, year) per submission;
+            the Bloom method reads it three times
+        predictions: Iterable of (prompt, rebuttal, key)
+        method: "sorted" (exact) or "bloom" (approximate, smaller)
+        false_positive_rate: Target false-positive rate of the Bloom filters
+
+    Returns:
+        Report with per prompt x rebuttal x year coverage and per prompt x rebuttal orphans
+    """
+    index = SortedIndex(submissions()) if method == 'sorted' else BloomIndex(submissions, false_positive_rate)
+    tally = IntegrityTally()
+    index.stream(predictions, tally)
+    keys = tally.keys()
+    index.gaps(keys, tally)
+
+    year_counts = index.year_counts()
+    coverage = []
+    for key in keys:
+        for year in sorted(year_counts):
+            missing, sample = tally.missing.get((key, year), [year_counts[year], []])
+            coverage.append({
+                'prompt': key[0],
+                'rebuttal': key[1],
+                'year': year,
+                'submissions': year_counts[year],
+                'predictions': tally.predictions.get((key, year), 0),
+                'covered': year_counts[year] - missing,
+                'missing': missing,
+                'coverage': round((year_counts[year] - missing) / year_counts[year], 4) if year_counts[year] else None,
+                'missing_sample': sample,
+            })
+    report = {
+        'method': method,
+        'submissions_by_year': year_counts,
+        'prediction_rows': tally.rows,
+        'index_bytes': index.nbytes,
+        'orphans': [
+            {'prompt': key[0], 'rebuttal': key[1], 'count': count, 'sample': sample}
+            for key, (count, sample) in sorted(tally.orphans.items())
+        ],
+        'coverage': coverage,
+    }
+    if method == 'bloom':
+        report['false_positive_rate'] = false_positive_rate
+    return report
+
+
+def file_predictions(paths: List[str]) -> Iterable[Tuple[str, int, str]]:
+    """(prompt, rebuttal, s_id) of result_*.jsonl records."""
+    for path in paths:
+        for record in iter_jsonl(path):
+            yield str(record.get('prompt')), int(record.get('rebuttal', -1)), str(record.get('s_id') or '')
+
+
+def file_submissions(paths: List[str], dictionary: Optional[bytes] = None) -> Callable[[], Iterable[Tuple[str, str]]]:
+    def submissions():
+        for paper in iter_papers(paths, dictionary):
+            if paper.get('s_id'):
+                yield paper['s_id'], str(paper.get('year') or 'unknown')
+    return submissions
+
+
+def mongo_submissions(db, years: List[int], field: str) -> Callable[[], Iterable[Tuple[str, str]]]:
+    """(s_id or _id, year) of the year collections, projected down to the key."""
+    def submissions():
+        for year in years:
+            for paper in db[f"iclr_{year}"].find({}, {field: 1}):
+                if paper.get(field):
+                    yield str(paper[field]), str(year)
+    return submissions
+
+
+def mongo_imported_predictions(db) -> Iterable[Tuple[str, int, str]]:
+    """(prompt, rebuttal, paper_id) of the imported predictions collection."""
+    for prediction in db['predictions'].find({}, {'prompt': 1, 'rebuttal': 1, 'paper_id': 1}):
+        yield str(prediction.get('prompt')), int(prediction.get('rebuttal', -1)), str(prediction.get('paper_id') or '')
+
+
+def print_report(title: str, report: dict) -> None:
+    print(f"\n{title} ({report['method']}, {report['prediction_rows']} prediction rows, "
+          f"{report['index_bytes'] / (1024 * 1024):.1f} MB index)")
+    for orphan in report['orphans']:
+        print(f"  orphans  prompt={orphan['prompt']} rebuttal={orphan['rebuttal']}: {orphan['count']} "
+              f"(e.g. {', '.join(orphan['sample'][:3])})")
+    for row in report['coverage']:
+        if row['missing']:
+            print(f"  gaps     prompt={row['prompt']} rebuttal={row['rebuttal']} year={row['year']}: "
+                  f"{row['missing']} of {row['submissions']} missing (coverage {row['coverage']:.2%})")
+    if not report['orphans'] and not any(row['missing'] for row in report['coverage']):
+        print("  no orphans or coverage gaps")
+
+
+def main():
+    """Main function to handle command line arguments."""
+    parser = argparse.ArgumentParser(description="Orphan and coverage-gap check between predictions and submissions")
+    parser.add_argument("--predictions", nargs="*", default=[],
+                        help="result_*.jsonl files (globs allowed)")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--papers", nargs="+", help="Export chunk files or paper JSONL (globs allowed)")
+    source.add_argument("--uri", help="MongoDB connection string; submissions come from the year collections")
+    parser.add_argument("--dictionary", help="zstd dictionary of the export, for .zpc chunks (with --papers)")
+    parser.add_argument("--db", help="Database name (default: the one in the connection string)")
+    parser.add_argument("--years", nargs="+", type=int, default=DEFAULT_YEARS)
+    parser.add_argument("--imported", action="store_true",
+                        help="Also check the imported predictions collection (needs --uri)")
+    parser.add_argument("--method", choices=["sorted", "bloom"], default="sorted")
+    parser.add_argument("--false-positive-rate", type=float, default=DEFAULT_FALSE_POSITIVE_RATE)
+    parser.add_argument("--output", default="integrity_report.json")
+    args = parser.parse_args()
+
+    prediction_files = sorted(path for pattern in args.predictions for path in glob.glob(pattern))
+    if args.predictions and not prediction_files:
+        print(f"Error: no prediction files match {args.predictions}")
+        sys.exit(1)
+    if args.imported and not args.uri:
+        print("Error: --imported needs --uri")
+        sys.exit(1)
+
+    client = None
+    if args.uri:
+        from pymongo import MongoClient
+        client = MongoClient(args.uri)
+        db = client[args.db] if args.db else client.get_default_database()
+        submissions = mongo_submissions(db, args.years, 's_id')
+    else:
+        paper_files = sorted(path for pattern in args.papers for path in glob.glob(pattern))
+        if not paper_files:
+            print(f"Error: no paper files match {args.papers}")
+            sys.exit(1)
+        submissions = file_submissions(paper_files, read_dictionary(args.dictionary))
+
+    reports = {}
+    try:
+        if prediction_files:
+            reports['result_files'] = check_integrity(
+                submissions, file_predictions(prediction_files), args.method, args.false_positive_rate
+            )
+        if args.imported:
+            # Imported predictions reference submissions by _id, not s_id
+            reports['imported'] = check_integrity(
+                mongo_submissions(db, args.years, '_id'), mongo_imported_predictions(db),
+                args.method, args.false_positive_rate
+            )
+    except (RuntimeError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        if client is not None:
+            client.close()
+
+    with open(args.output, 'w', encoding='utf-8') as outfile:
+        json.dump(reports, outfile, indent=2)
+
+    for name, report in reports.items():
+        print_report(name, report)
+    print(f"\nReport: {args.output}")
+
+    if any(report['orphans'] for report in reports.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Materialize the dashboard aggregates as small versioned JSON documents.
+Computes per year the review-score distributions, the rating leaderboard,
+per-prompt metrics with rebuttal deltas, and the prediction error lists from
+exported papers and the result_*.jsonl predictions. The API can serve these
+views directly instead of aggregating on every request.
+
+Layout of the output directory:
+    index.json                      current version and input hash per year
+    <year>/v<version>/<view>.json   one document per view (errors are split
+                                    into one errors_<prompt> view per prompt)
+
+A year is only rebuilt when the hash of its inputs changes, so refreshing
+after one year's predictions or reviews change leaves the other years alone.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import sys
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from paper_loader import REVIEW_FIELDS, load_paper_table, mean_review_values, read_dictionary, table_labels
+from prediction_matrix import PredictionMatrix, iter_papers, load_labels, popcount
+
+# Bump when the document layout changes so every year is rebuilt
+SCHEMA_VERSION = 1
+
+# Same bins as DistributionChart: [0, 1), [1, 2), ... [9, 10)
+HISTOGRAM_BINS = 10
+
+
+class PaperTable:
+    """Review means and display fields of exported papers, aligned with a matrix index."""
+
+    def __init__(self, matrix: PredictionMatrix):
+        self.matrix = matrix
+        self.values = {field: np.full(matrix.size, np.nan) for field in REVIEW_FIELDS}
+        self.details: Dict[int, dict] = {}
+
+    def load(self, paths: List[str], dictionary: Optional[bytes] = None) -> int:
+        """Fill from export chunk or JSONL files (.zpc chunks need the dictionary); returns the number of papers placed."""
+        placed = 0
+        for paper in iter_papers(paths, dictionary):
+            position = self.matrix.index.get(paper.get('s_id'))
+            if position is None:
+                continue
+            for field, value in mean_review_values(paper).items():
+                self.values[field][position] = value
+            self.details[position] = {
+                '_id': str(paper.get('_id', paper['s_id'])),
+                'title': paper.get('title', ''),
+                'authors': paper.get('authors', []),
+                'url': paper.get('url', ''),
+            }
+            placed += 1
+        return placed
+
+    def load_table(self, table) -> int:
+        """Fill from a paper_loader table; returns the number of papers placed."""
+        index = self.matrix.index
+        positions = np.array([index.get(s_id, -1) for s_id in table.column('s_id').to_pylist()], dtype=np.int64)
+        found = positions >= 0
+        for field in REVIEW_FIELDS:
+            # Papers without values for a field are null, and null reads as NaN
+            column = table.column(field).to_numpy().astype(np.float64)
+            self.values[field][positions[found]] = column[found]
+        ids, titles, authors, urls = (table.column(name).to_pylist() for name in ('_id', 'title', 'authors', 'url'))
+        for row in np.flatnonzero(found):
+            self.details[int(positions[row])] = {
+                '_id': ids[row], 'title': titles[row], 'authors': authors[row], 'url': urls[row],
+            }
+        return int(found.sum())
+
+
+def metrics_from_confusion(counts: Dict[str, int]) -> Dict[str, float]:
+    """ComprehensiveMetricsTable metrics, as percentages rounded to one decimal."""
+    tp, fp, tn, fn = counts['TP'], counts['FP'], counts['TN'], counts['FN']
+    total = tp + fp + tn + fn
+    precision = 100 * tp / (tp + fp) if tp + fp else 0.0
+    recall = 100 * tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {
+        'truePositive': tp,
+        'falsePositive': fp,
+        'trueNegative': tn,
+        'falseNegative': fn,
+        'total': total,
+        'accuracy': round(100 * (tp + tn) / total, 1) if total else 0.0,
+        'precision': round(precision, 1),
+        'recall': round(recall, 1),
+        'f1Score': round(f1, 1),
+    }
+
+
+def bin_counts(values: np.ndarray, selected: np.ndarray) -> List[int]:
+    """Histogram counts of the selected values over HISTOGRAM_BINS unit bins."""
+    picked = values[selected]
+    picked = np.floor(picked[~np.isnan(picked)]).astype(np.int64)
+    picked = picked[(picked >= 0) & (picked < HISTOGRAM_BINS)]
+    return np.bincount(picked, minlength=HISTOGRAM_BINS).tolist()
+
+
+class DashboardMaterializer:
+    """Builds and writes the per-year dashboard documents."""
+
+    def __init__(self, matrix: PredictionMatrix, papers: PaperTable, output_dir: str,
+                 leaderboard_size: int = 50, keep_versions: int = 2):
+        self.matrix = matrix
+        self.papers = papers
+        self.output_dir = output_dir
+        self.leaderboard_size = leaderboard_size
+        self.keep_versions = keep_versions
+        self.index_path = os.path.join(output_dir, 'index.json')
+
+    def load_index(self) -> dict:
+        """Current index.json, or an empty one."""
+        if not os.path.exists(self.index_path):
+            return {'schemaVersion': SCHEMA_VERSION, 'years': {}}
+        with open(self.index_path, 'r', encoding='utf-8') as infile:
+            return json.load(infile)
+
+    def year_flags(self, year: int) -> np.ndarray:
+        """Boolean mask of the papers of one year."""
+        return np.unpackbits(self.matrix.year_masks[year], count=self.matrix.size).astype(bool)
+
+    def input_hash(self, year: int) -> str:
+        """Digest of everything a year's documents are computed from."""
+        digest = hashlib.sha256()
+        digest.update(json.dumps([SCHEMA_VERSION, self.leaderboard_size]).encode('utf-8'))
+
+        mask = self.matrix.year_masks[year]
+        flags = self.year_flags(year)
+        digest.update((self.matrix.truth & mask).tobytes())
+        for key in self.matrix.keys():
+            yes_bits, present = self.matrix.predictions[key]
+            digest.update(json.dumps(key).encode('utf-8'))
+            digest.update((yes_bits & present & mask).tobytes())
+            digest.update((present & mask).tobytes())
+        for field in REVIEW_FIELDS:
+            digest.update(self.papers.values[field][flags].tobytes())
+        for position in np.flatnonzero(flags):
+            digest.update(json.dumps(self.papers.details.get(int(position)), sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+
+    # ------------------------------------------------------------------
+    # Views
+    # ------------------------------------------------------------------
+
+    def build_summary(self, year: int) -> dict:
+        """Paper and decision counts of one year."""
+        flags = self.year_flags(year)
+        accepted = np.unpackbits(self.matrix.truth, count=self.matrix.size).astype(bool)
+        return {
+            'papers': int(flags.sum()),
+            'accepted': int((flags & accepted).sum()),
+            'rejected': int((flags & ~accepted).sum()),
+            'withReviews': int((flags & ~np.isnan(self.papers.values['rating'])).sum()),
+            'predictionKeys': [[prompt, rebuttal] for prompt, rebuttal in self.matrix.keys()],
+        }
+
+    def build_distributions(self, year: int) -> dict:
+        """Histogram per review field, split by the true decision and by each prompt's predictions."""
+        flags = self.year_flags(year)
+        accepted = np.unpackbits(self.matrix.truth, count=self.matrix.size).astype(bool)
+        distributions = {}
+
+        for field in REVIEW_FIELDS:
+            values = self.papers.values[field]
+            scored = values[flags & ~np.isnan(values)]
+            true_accept = bin_counts(values, flags & accepted)
+            true_reject = bin_counts(values, flags & ~accepted)
+
+            predicted = {}
+            for prompt, rebuttal in self.matrix.keys():
+                yes_bits, present = self.matrix.predictions[(prompt, rebuttal)]
+                yes_flags = np.unpackbits(yes_bits & present, count=self.matrix.size).astype(bool)
+                present_flags = np.unpackbits(present, count=self.matrix.size).astype(bool)
+                predicted.setdefault(prompt, {})['rebuttal' if rebuttal else 'nonRebuttal'] = {
+                    'acceptCount': bin_counts(values, flags & yes_flags),
+                    'rejectCount': bin_counts(values, flags & present_flags & ~yes_flags),
+                }
+
+            distributions[field] = {
+                'bins': [
+                    {
+                        'min': i,
+                        'max': i + 1,
+                        'count': true_accept[i] + true_reject[i],
+                        'trueAcceptCount': true_accept[i],
+                        'trueRejectCount': true_reject[i],
+                    }
+                    for i in range(HISTOGRAM_BINS)
+                ],
+                'mean': round(float(scored.mean()), 3) if scored.size else None,
+                'median': round(float(np.median(scored)), 3) if scored.size else None,
+                'predicted': predicted,
+            }
+        return distributions
+
+    def build_leaderboard(self, year: int) -> List[dict]:
+        """Top papers by average rating, as getPapersRankedByRating returns them."""
+        ratings = self.papers.values['rating']
+        candidates = np.flatnonzero(self.year_flags(year) & ~np.isnan(ratings))
+        ranked = candidates[np.argsort(-ratings[candidates], kind='stable')][:self.leaderboard_size]
+        return [
+            {**self.papers.details.get(int(position), {}), 'averageRating': round(float(ratings[position]), 2)}
+            for position in ranked
+        ]
+
+    def build_metrics(self, year: int) -> List[dict]:
+        """Per-prompt metrics with and without rebuttal, their deltas and rebuttal flips."""
+        mask = self.matrix.year_masks[year]
+        rows = {}
+        for prompt, rebuttal in self.matrix.keys():
+            counts = self.matrix.confusion(*self.matrix.predictions[(prompt, rebuttal)], mask)
+            row = rows.setdefault(prompt, {'prompt': prompt})
+            row['rebuttalMetrics' if rebuttal else 'nonRebuttalMetrics'] = metrics_from_confusion(counts)
+
+        for prompt, row in rows.items():
+            if 'rebuttalMetrics' not in row or 'nonRebuttalMetrics' not in row:
+                continue
+            row['rebuttalDelta'] = {
+                metric: round(row['rebuttalMetrics'][metric] - row['nonRebuttalMetrics'][metric], 1)
+                for metric in ('accuracy', 'precision', 'recall', 'f1Score')
+            }
+            flips = self.matrix.rebuttal_flips(prompt)
+            row['flips'] = {
+                'toAccept': popcount(flips['to_yes'] & mask),
+                'toReject': popcount(flips['to_no'] & mask),
+            }
+        return [rows[prompt] for prompt in sorted(rows, key=int)]
+
+    def build_errors(self, year: int) -> Dict[str, List[dict]]:
+        """PredictionMismatchTable rows per prompt, with title, url, rating and confidence."""
+        flags = self.year_flags(year)
+        prompts = sorted({prompt for prompt, _ in self.matrix.keys()}, key=int)
+        errors = {}
+        for prompt in prompts:
+            if (prompt, 0) not in self.matrix.predictions or (prompt, 1) not in self.matrix.predictions:
+                continue
+            rows = []
+            for row in self.matrix.mismatches(prompt):
+                position = self.matrix.index[row['paperId']]
+                if not flags[position]:
+                    continue
+                details = self.papers.details.get(position, {})
+                rating = self.papers.values['rating'][position]
+                confidence = self.papers.values['confidence'][position]
+                rows.append({
+                    **row,
+                    'title': details.get('title', ''),
+                    'url': details.get('url', ''),
+                    'rating': 0 if np.isnan(rating) else round(float(rating), 2),
+                    'confidence': 0 if np.isnan(confidence) else round(float(confidence), 2),
+                })
+            errors[prompt] = rows
+        return errors
+
+    # ------------------------------------------------------------------
+    # Refresh
+    # ------------------------------------------------------------------
+
+    def write_json(self, path: str, document) -> int:
+        """Write compact JSON through a temporary file; returns the bytes written."""
+        body = json.dumps(document, separators=(',', ':')).encode('utf-8')
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'wb') as outfile:
+            outfile.write(body)
+        os.replace(temp_path, path)
+        return len(body)
+
+    def materialize_year(self, year: int, version: int, input_hash: str) -> Dict[str, int]:
+        """Write every view of one year under a new version directory."""
+        version_dir = os.path.join(self.output_dir, str(year), f"v{version}")
+        os.makedirs(version_dir, exist_ok=True)
+        header = {
+            'schemaVersion': SCHEMA_VERSION,
+            'year': year,
+            'version': version,
+            'inputHash': input_hash,
+            'generatedAt': datetime.now().isoformat(),
+        }
+        views = {
+            'summary': self.build_summary(year),
+            'distributions': self.build_distributions(year),
+            'leaderboard': self.build_leaderboard(year),
+            'metrics': self.build_metrics(year),
+        }
+        for prompt, rows in self.build_errors(year).items():
+            views[f"errors_{prompt}"] = rows
+        return {
+            view: self.write_json(os.path.join(version_dir, f"{view}.json"), {**header, 'data': data})
+            for view, data in views.items()
+        }
+
+    def prune_versions(self, year: int, current: int) -> None:
+        """Remove all but the newest keep_versions version directories of a year."""
+        year_dir = os.path.join(self.output_dir, str(year))
+        versions = sorted(
+            int(name[1:]) for name in os.listdir(year_dir)
+            if name.startswith('v') and name[1:].isdigit()
+        )
+        for version in versions[:-self.keep_versions]:
+            if version != current:
+                shutil.rmtree(os.path.join(year_dir, f"v{version}"))
+
+    def refresh(self, years: Optional[List[int]] = None, force: bool = False) -> Dict[int, str]:
+        """
+        Rebuild the years whose inputs changed and update index.json.
+
+        Args:
+            years: Years to consider (default: every labelled year)
+            force: Rebuild even when the input hash is unchanged
+
+        Returns:
+            year -> "built" or "unchanged"
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        index = self.load_index()
+        if index.get('schemaVersion') != SCHEMA_VERSION:
+            index = {'schemaVersion': SCHEMA_VERSION, 'years': index.get('years', {})}
+            force = True
+
+        outcome = {}
+        for year in sorted(years or self.matrix.year_masks):
+            if year not in self.matrix.year_masks:
+                print(f"Warning: no labelled papers for {year}")
+                continue
+
+            input_hash = self.input_hash(year)
+            entry = index['years'].get(str(year))
+            if entry and entry['inputHash'] == input_hash and not force:
+                outcome[year] = 'unchanged'
+                continue
+
+            version = entry['version'] + 1 if entry else 1
+            sizes = self.materialize_year(year, version, input_hash)
+            index['years'][str(year)] = {
+                'version': version,
+                'inputHash': input_hash,
+                'generatedAt': datetime.now().isoformat(),
+                'views': {view: f"{year}/v{version}/{view}.json" for view in sizes},
+                'bytes': sizes,
+            }
+            # Readers follow index.json, so switch it before removing old versions
+            self.write_json(self.index_path, index)
+            self.prune_versions(year, version)
+            outcome[year] = 'built'
+        return outcome
+
+
+def main():
+    """Main function to handle command line arguments."""
+    parser = argparse.ArgumentParser(description="Materialize dashboard aggregates as versioned JSON")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--predictions", nargs="+", help="result_*.jsonl files")
+    source.add_argument("--matrix", help="Prediction matrix (.pmx) written by prediction_matrix.py build")
+    parser.add_argument("--papers", nargs="+", required=True,
+                        help="Export chunk files (with metareviews) or paper JSONL (globs allowed)")
+    parser.add_argument("--output-dir", default="dashboards")
+    parser.add_argument("--years", nargs="+", type=int, help="Only refresh these years")
+    parser.add_argument("--leaderboard-size", type=int, default=50)
+    parser.add_argument("--keep-versions", type=int, default=2)
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the inputs are unchanged")
+    parser.add_argument("--workers", type=int,
+                        help="Parse the paper files in this many processes (0: one per core; needs pyarrow)")
+    parser.add_argument("--dictionary", help="zstd dictionary of the export, for .zpc chunks")
+    args = parser.parse_args()
+
+    paper_files = sorted(path for pattern in args.papers for path in glob.glob(pattern))
+    if not paper_files:
+        print(f"Error: no paper files match {args.papers}")
+        sys.exit(1)
+
+    dictionary = read_dictionary(args.dictionary)
+    try:
+        table = None
+        if args.workers is not None:
+            table = load_paper_table(paper_files, workers=args.workers or None, dictionary=dictionary)
+
+        if args.matrix:
+            matrix = PredictionMatrix.load(args.matrix)
+        else:
+            labels = table_labels(table) if table is not None else load_labels(paper_files, dictionary)
+            matrix = PredictionMatrix.from_files(args.predictions, labels)
+
+        papers = PaperTable(matrix)
+        placed = papers.load_table(table) if table is not None else papers.load(paper_files, dictionary)
+    except (RuntimeError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    # PaperTable keeps copies, so the shared-memory batches can go
+    table = None
+
+    materializer = DashboardMaterializer(
+        matrix, papers, args.output_dir,
+        leaderboard_size=args.leaderboard_size, keep_versions=args.keep_versions
+    )
+    outcome = materializer.refresh(years=args.years, force=args.force)
+
+    print(f"Papers with reviews placed: {placed}")
+    for year, status in outcome.items():
+        entry = materializer.load_index()['years'][str(year)]
+        print(f"{year}: {status} (v{entry['version']}, {sum(entry['bytes'].values())} bytes)")
+    print(f"Index: {materializer.index_path}")
+
+
+if __name__ == "__main__":
+    main()
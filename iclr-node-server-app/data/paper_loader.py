@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Load exported papers into one Arrow table with a process pool.
+Parsing dozens of export chunks in one process is bound by json.loads on a single
+core. Here every worker parses whole chunk files, reduces each paper to the columns
+the prediction tooling uses (labels, display fields and review means) and writes the
+record batch as an Arrow IPC stream straight into a shared-memory segment. The
+parent maps the segments and reads the batches in place, so the only copy between
+processes is the worker's write into shared memory, and concatenating the batches
+into one table copies nothing either.
+
+Reads plain export chunks (.json), gzip chunks (.json.gz), zstd-dict chunks (.zpc,
+with the export's dictionary) and paper JSONL files.
+"""
+
+import argparse
+import ctypes
+import glob
+import gzip
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool, resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import pyarrow as pa
+except ImportError:  # Only the parallel loader needs pyarrow
+    pa = None
+
+# The chunk encodings and review value parsing are defined once, in the EMR helpers
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir,
+                             "testing-monitoring-design", "emr", "scripts"))
+from chunk_reader import CHUNK_SUFFIXES, iter_paper_chunk, paper_decompressor
+from review_values import review_value
+
+REVIEW_FIELDS = ['rating', 'confidence', 'soundness', 'presentation', 'contribution']
+
+# Decompressor of the zstd dictionary, set up once per worker by init_worker
+_decompressor = None
+
+
+def paper_year(raw) -> Optional[int]:
+    """Year of a paper as an int, or None when it is missing, empty or not a number."""
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return None
+
+
+def mean_review_values(paper: dict) -> Dict[str, float]:
+    """Mean of each review field over a paper's metareviews (fields without values are left out)."""
+    totals: Dict[str, List[float]] = {field: [] for field in REVIEW_FIELDS}
+    for review in paper.get('metareviews') or []:
+        values = review.get('values') or {}
+        for field in REVIEW_FIELDS:
+            value = review_value(values.get(field))
+            if value is not None:
+                totals[field].append(value)
+    return {field: sum(values) / len(values) for field, values in totals.items() if values}
+
+
+def paper_schema() -> "pa.Schema":
+    """Columns of the loaded table: one row per exported paper."""
+    return pa.schema(
+        [('s_id', pa.string()), ('_id', pa.string()), ('year', pa.int32()),
+         ('decision', pa.string()), ('accepted', pa.bool_()),
+         ('title', pa.string()), ('authors', pa.list_(pa.string())), ('url', pa.string())]
+        + [(field, pa.float64()) for field in REVIEW_FIELDS]
+    )
+
+
+def init_worker(dictionary: Optional[bytes]) -> None:
+    """Pool initializer: build the zstd decompressor once per worker."""
+    global _decompressor
+    if dictionary is not None:
+        _decompressor = paper_decompressor(dictionary)
+
+
+def read_dictionary(path: Optional[str]) -> Optional[bytes]:
+    """Bytes of a zstd dictionary file written by the exporter, or None without a path."""
+    if not path:
+        return None
+    with open(path, 'rb') as infile:
+        return infile.read()
+
+
+def read_papers(path: str) -> Iterable[dict]:
+    """
+    Yield the papers of one exported file.
+
+    Args:
+        path: Export chunk (.json, .json.gz or .zpc) or JSONL file with one paper per line
+    """
+    if path.endswith(CHUNK_SUFFIXES['zstd-dict']):
+        with open(path, 'rb') as infile:
+            body = infile.read()
+        try:
+            yield from iter_paper_chunk(body, _decompressor)
+        except ValueError as e:
+            raise ValueError(f"{path}: {e}") from e
+        return
+
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as infile:
+        if path.endswith((CHUNK_SUFFIXES['none'], CHUNK_SUFFIXES['gzip'])):
+            yield from json.load(infile).get('papers', [])
+            return
+        for line in infile:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def paper_batch(path: str) -> "pa.RecordBatch":
+    """Record batch of the papers (with an s_id) in one file."""
+    columns: Dict[str, list] = {name: [] for name in paper_schema().names}
+    for paper in read_papers(path):
+        if not paper.get('s_id'):
+            continue
+        decision = paper.get('decision')
+        columns['s_id'].append(paper['s_id'])
+        columns['_id'].append(str(paper.get('_id', paper['s_id'])))
+        columns['year'].append(paper_year(paper.get('year')))
+        columns['decision'].append(decision)
+        columns['accepted'].append(str(decision).lower().startswith('accept') if decision is not None else None)
+        columns['title'].append(paper.get('title', ''))
+        columns['authors'].append(paper.get('authors') or [])
+        columns['url'].append(paper.get('url', ''))
+        means = mean_review_values(paper)
+        for field in REVIEW_FIELDS:
+            columns[field].append(means.get(field))
+    return pa.RecordBatch.from_pydict(columns, schema=paper_schema())
+
+
+def write_stream(batch: "pa.RecordBatch", sink) -> None:
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+
+
+def load_file_shared(path: str) -> Tuple[Optional[str], int]:
+    """
+    Pool worker: parse one file and leave its record batch in a shared-memory segment.
+
+    Returns:
+        (segment name, stream size in bytes); the name is None for files without papers
+    """
+    batch = paper_batch(path)
+    if not batch.num_rows:
+        return None, 0
+
+    sizer = pa.MockOutputStream()
+    write_stream(batch, sizer)
+    size = sizer.size()
+
+    segment = SharedMemory(create=True, size=size)
+    # The parent unlinks the segment once it has mapped it; stop this process's
+    # resource tracker from unlinking it when the worker exits
+    resource_tracker.unregister(segment._name, 'shared_memory')
+    sink = pa.FixedSizeBufferWriter(pa.py_buffer(segment.buf))
+    write_stream(batch, sink)
+    sink.close()
+    del sink
+    segment.close()
+    return segment.name, size
+
+
+def attach_batch(name: str, size: int) -> "pa.RecordBatch":
+    """Map a worker's segment and read its batch in place."""
+    segment = SharedMemory(name=name)
+    # Unlinking only removes the name; the mapping stays until the segment is closed
+    segment.unlink()
+    address = ctypes.addressof(ctypes.c_char.from_buffer(segment.buf))
+    # The Arrow buffer owns the segment, so it is closed with the last array that uses it
+    buffer = pa.foreign_buffer(address, size, base=segment)
+    return pa.ipc.open_stream(buffer).read_next_batch()
+
+
+def load_paper_table(paths: List[str], workers: Optional[int] = None,
+                     dictionary: Optional[bytes] = None) -> "pa.Table":
+    """
+    Load exported papers into one Arrow table.
+
+    Args:
+        paths: Export chunk or JSONL files; each is parsed by one worker
+        workers: Worker processes (default: one per core); 1 parses in this process
+        dictionary: zstd dictionary of the export, needed for .zpc chunks
+
+    Returns:
+        Table with one chunk per non-empty file, in the order of paths
+    """
+    if pa is None:
+        raise RuntimeError("The parallel paper loader needs pyarrow: pip install pyarrow")
+    if dictionary is None and any(path.endswith(CHUNK_SUFFIXES['zstd-dict']) for path in paths):
+        raise ValueError("zstd-dict (.zpc) chunks need the export's dictionary")
+
+    if workers == 1:
+        init_worker(dictionary)
+        batches = [batch for batch in map(paper_batch, paths) if batch.num_rows]
+    else:
+        with Pool(processes=workers, initializer=init_worker, initargs=(dictionary,)) as pool:
+            batches = [
+                attach_batch(name, size)
+                for name, size in pool.imap(load_file_shared, paths) if name is not None
+            ]
+    return pa.Table.from_batches(batches, schema=paper_schema())
+
+
+def table_labels(table: "pa.Table") -> Dict[str, Tuple[int, bool]]:
+    """s_id -> (year, accepted) of papers with a decision and a year, like prediction_matrix.load_labels."""
+    decided = table.filter(table.column('accepted').is_valid())
+    decided = decided.filter(decided.column('year').is_valid())
+    return dict(zip(decided.column('s_id').to_pylist(),
+                    zip(decided.column('year').to_pylist(), decided.column('accepted').to_pylist())))
+
+
+def benchmark(paths: List[str], worker_counts: List[int], dictionary: Optional[bytes] = None,
+              repeat: int = 3) -> List[dict]:
+    """Best-of-repeat load time of the files for each worker count."""
+    results = []
+    for workers in worker_counts:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rows = load_paper_table(paths, workers=workers, dictionary=dictionary).num_rows
+            timings.append(time.perf_counter() - start)
+        results.append({'workers': workers, 'rows': rows, 'seconds': min(timings)})
+    return results
+
+
+def main():
+    """Main function to handle command line arguments."""
+    parser = argparse.ArgumentParser(description="Load exported papers into an Arrow table with a process pool")
+    parser.add_argument("--papers", nargs="+", required=True,
+                        help="Export chunk files (.json, .json.gz, .zpc) or paper JSONL (globs allowed)")
+    parser.add_argument("--dictionary", help="zstd dictionary of the export, for .zpc chunks")
+    parser.add_argument("--workers", nargs="+", type=int, default=[0],
+                        help="Worker processes (0: one per core); several counts run a scaling benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="Benchmark runs per worker count")
+    parser.add_argument("--output", help="Write the table as an Arrow IPC file")
+    args = parser.parse_args()
+
+    paper_files = sorted(path for pattern in args.papers for path in glob.glob(pattern))
+    if not paper_files:
+        print(f"Error: no paper files match {args.papers}")
+        sys.exit(1)
+
+    dictionary = read_dictionary(args.dictionary)
+
+    if len(args.workers) > 1:
+        try:
+            results = benchmark(paper_files, [workers or None for workers in args.workers], dictionary, args.repeat)
+        except (RuntimeError, ValueError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        baseline = results[0]['seconds']
+        for result in results:
+            print(f"{result['workers'] or 'all'} workers: {result['rows']} papers in {result['seconds']:.2f}s "
+                  f"({result['rows'] / result['seconds']:,.0f} papers/s, {baseline / result['seconds']:.2f}x)")
+        return
+
+    start = time.perf_counter()
+    try:
+        table = load_paper_table(paper_files, workers=args.workers[0] or None, dictionary=dictionary)
+    except (RuntimeError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+    print(f"Files: {len(paper_files)}")
+    print(f"Papers: {table.num_rows}")
+    print(f"Table size: {table.nbytes:,} bytes")
+    print(f"Load time: {elapsed:.2f}s")
+    if args.output:
+        with pa.OSFile(args.output, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        print(f"Output file: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+"""
+Bit-packed prediction matrix for the result_*.jsonl prediction files.
+Holds one bitset per (prompt, rebuttal) over a dense s_id index and answers
+agreement, ensemble, all-wrong and rebuttal-flip queries with popcounts.
+Matrices can be saved to a compact .pmx file and queried from the command line,
+e.g. to precompute the PredictionMismatchTable rows for every prompt.
+"""
+
+import argparse
+import glob
+import json
+import os
+import struct
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from paper_loader import init_worker, load_paper_table, paper_year, read_dictionary, read_papers, table_labels
+
+# Prompt metadata is shared with the EMR prediction analysis
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir,
+                             "testing-monitoring-design", "emr", "scripts"))
+from prompt_metadata import prompt_entries
+
+# Popcount of every byte value, for counting bits in packed arrays
+POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+PMX_MAGIC = b"PMX1"
+
+# Prompt map ported from importPrediction.js: result-file prompt id -> text, prompt_type
+# and the prompt's number in importPredictionStats.js PROMPT_CANDIDATES
+DEFAULT_PROMPTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prompts.json')
+
+Key = Tuple[str, int]
+
+
+def popcount(packed: np.ndarray) -> int:
+    """Count set bits in a np.packbits array."""
+    return int(POPCOUNT_TABLE[packed].sum(dtype=np.int64))
+
+
+def iter_jsonl(path: str) -> Iterable[dict]:
+    """Yield the JSON objects of a JSONL file, skipping blank lines."""
+    with open(path, 'r', encoding='utf-8') as infile:
+        for line in infile:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def load_prompts(path: Optional[str]) -> Dict[str, dict]:
+    """
+    Load the prompt id -> text mapping used in place of the JS candidate arrays.
+
+    Args:
+        path: JSON object keyed by the prompt id of the result files; values are the
+            prompt text or {"prompt": text, "prompt_type": n, "stats_prompt": n}, where
+            stats_prompt is the prompt's number in importPredictionStats.js
+
+    Returns:
+        Mapping of prompt id to {"prompt", "prompt_type"[, "stats_prompt"]} (empty without
+        a path); a missing prompt_type comes from stats_prompt, else 0
+    """
+    if not path:
+        return {}
+    with open(path, 'r', encoding='utf-8') as infile:
+        return prompt_entries(json.load(infile))
+
+
+def says_yes(record: dict) -> bool:
+    """Whether a result record predicts acceptance (tolerates the "prediciton" typo and markdown)."""
+    prediction = record.get('prediction', record.get('prediciton', ''))
+    return str(prediction).strip(' *').lower() in ('yes', 'accept')
+
+
+def iter_papers(paths: List[str], dictionary: Optional[bytes] = None) -> Iterable[dict]:
+    """
+    Yield paper documents from exported papers.
+
+    Args:
+        paths: Export chunk files (.json, .json.gz or .zpc documents with a
+            "papers" list) or JSONL files with one paper per line
+        dictionary: zstd dictionary of the export, needed for .zpc chunks
+    """
+    if dictionary is None and any(path.endswith('.zpc') for path in paths):
+        raise ValueError("zstd-dict (.zpc) chunks need the export's dictionary")
+    init_worker(dictionary)
+    for path in paths:
+        yield from read_papers(path)
+
+
+def load_labels(paths: List[str], dictionary: Optional[bytes] = None) -> Dict[str, Tuple[int, bool]]:
+    """
+    Load s_id -> (year, accepted) from exported papers.
+
+    Args:
+        paths: Export chunk files (documents with a "papers" list, e.g. an
+            analytics-lite export) or JSONL files with s_id, year and decision
+        dictionary: zstd dictionary of the export, needed for .zpc chunks
+
+    Returns:
+        Mapping of s_id to its year and whether the decision is an accept;
+        papers without a usable year are left out, like those without a decision
+    """
+    labels = {}
+    for paper in iter_papers(paths, dictionary):
+        year = paper_year(paper.get('year'))
+        if not paper.get('s_id') or paper.get('decision') is None or year is None:
+            continue
+        accepted = str(paper['decision']).lower().startswith('accept')
+        labels[paper['s_id']] = (year, accepted)
+    return labels
+
+
+class PredictionMatrix:
+    """Predictions per (prompt, rebuttal) as bitsets over a dense s_id index."""
+
+    def __init__(self, s_ids: List[str]):
+        self.s_ids = s_ids
+        self.size = len(s_ids)
+        self._index: Optional[Dict[str, int]] = None
+
+        # Ground truth: accepted bits and "has a decision" bits
+        self.truth = self.empty()
+        self.known = self.empty()
+        self.year_masks: Dict[int, np.ndarray] = {}
+
+        # (prompt, rebuttal) -> (packed "Yes" bits, packed "has a prediction" bits)
+        self.predictions: Dict[Key, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def empty(self) -> np.ndarray:
+        """All-zero packed bitset of the matrix width."""
+        return np.zeros((self.size + 7) // 8, dtype=np.uint8)
+
+    @property
+    def index(self) -> Dict[str, int]:
+        """s_id -> bit position (built on first use)."""
+        if self._index is None:
+            self._index = {s_id: i for i, s_id in enumerate(self.s_ids)}
+        return self._index
+
+    @classmethod
+    def from_files(cls, prediction_paths: List[str],
+                   labels: Optional[Dict[str, Tuple[int, bool]]] = None) -> "PredictionMatrix":
+        """
+        Build a matrix from result_*.jsonl files in two streaming passes.
+
+        Args:
+            prediction_paths: result_*.jsonl files
+            labels: Optional s_id -> (year, accepted) from load_labels
+        """
+        labels = labels or {}
+        s_ids = set(labels)
+        for path in prediction_paths:
+            s_ids.update(record['s_id'] for record in iter_jsonl(path))
+
+        matrix = cls(sorted(s_ids))
+        matrix.set_labels(labels)
+
+        staged: Dict[Key, Tuple[np.ndarray, np.ndarray]] = {}
+        for path in prediction_paths:
+            for record in iter_jsonl(path):
+                key = (str(record['prompt']), int(record['rebuttal']))
+                if key not in staged:
+                    staged[key] = (np.zeros(matrix.size, dtype=bool), np.zeros(matrix.size, dtype=bool))
+                yes_bits, present = staged[key]
+                position = matrix.index[record['s_id']]
+                yes_bits[position] = says_yes(record)
+                present[position] = True
+
+        for key, (yes_bits, present) in staged.items():
+            matrix.predictions[key] = (np.packbits(yes_bits), np.packbits(present))
+        return matrix
+
+    def set_labels(self, labels: Dict[str, Tuple[int, bool]]) -> None:
+        """Set ground truth and year masks from s_id -> (year, accepted)."""
+        accepted = np.zeros(self.size, dtype=bool)
+        known = np.zeros(self.size, dtype=bool)
+        years = np.zeros(self.size, dtype=np.int32)
+        for s_id, (year, is_accept) in labels.items():
+            position = self.index.get(s_id)
+            if position is None:
+                continue
+            accepted[position] = is_accept
+            known[position] = True
+            years[position] = year
+
+        self.truth = np.packbits(accepted)
+        self.known = np.packbits(known)
+        self.year_masks = {
+            int(year): np.packbits(known & (years == year))
+            for year in np.unique(years[known])
+        }
+
+    # ------------------------------------------------------------------
+    # File format: magic, uint32 header length, JSON header, newline-joined
+    # s_ids, then packed bitsets (truth, known, year masks, yes/present per key)
+    # ------------------------------------------------------------------
+
+    def save(self, path: str) -> None:
+        """Write the matrix to a .pmx file."""
+        s_id_block = "\n".join(self.s_ids).encode('utf-8')
+        keys = self.keys()
+        header = json.dumps({
+            "size": self.size,
+            "keys": [[prompt, rebuttal] for prompt, rebuttal in keys],
+            "years": sorted(self.year_masks),
+            "s_id_bytes": len(s_id_block),
+        }).encode('utf-8')
+
+        with open(path, 'wb') as outfile:
+            outfile.write(PMX_MAGIC)
+            outfile.write(struct.pack('<I', len(header)))
+            outfile.write(header)
+            outfile.write(s_id_block)
+            outfile.write(self.truth.tobytes())
+            outfile.write(self.known.tobytes())
+            for year in sorted(self.year_masks):
+                outfile.write(self.year_masks[year].tobytes())
+            for key in keys:
+                yes_bits, present = self.predictions[key]
+                outfile.write(yes_bits.tobytes())
+                outfile.write(present.tobytes())
+
+    @classmethod
+    def load(cls, path: str) -> "PredictionMatrix":
+        """Read a matrix written by save()."""
+        with open(path, 'rb') as infile:
+            data = infile.read()
+        if data[:4] != PMX_MAGIC:
+            raise ValueError(f"{path} is not a prediction matrix file")
+
+        (header_length,) = struct.unpack_from('<I', data, 4)
+        offset = 8
+        header = json.loads(data[offset:offset + header_length])
+        offset += header_length
+        s_id_block = data[offset:offset + header["s_id_bytes"]].decode('utf-8')
+        offset += header["s_id_bytes"]
+
+        matrix = cls(s_id_block.split("\n") if s_id_block else [])
+        width = (matrix.size + 7) // 8
+
+        def take() -> np.ndarray:
+            nonlocal offset
+            bits = np.frombuffer(data, dtype=np.uint8, count=width, offset=offset).copy()
+            offset += width
+            return bits
+
+        matrix.truth = take()
+        matrix.known = take()
+        matrix.year_masks = {int(year): take() for year in header["years"]}
+        for prompt, rebuttal in header["keys"]:
+            matrix.predictions[(str(prompt), int(rebuttal))] = (take(), take())
+        return matrix
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def keys(self) -> List[Key]:
+        """All (prompt, rebuttal) pairs, in numeric prompt order."""
+        return sorted(self.predictions, key=lambda key: (int(key[0]), key[1]))
+
+    def nbytes(self) -> int:
+        """Bytes held by the bitsets and the s_id table."""
+        bitsets = self.truth.nbytes + self.known.nbytes
+        bitsets += sum(mask.nbytes for mask in self.year_masks.values())
+        bitsets += sum(yes.nbytes + present.nbytes for yes, present in self.predictions.values())
+        return bitsets + sum(len(s_id) for s_id in self.s_ids)
+
+    def ids_of(self, packed: np.ndarray) -> List[str]:
+        """s_ids whose bit is set."""
+        positions = np.flatnonzero(np.unpackbits(packed, count=self.size))
+        return [self.s_ids[i] for i in positions]
+
+    def correct(self, key: Key) -> np.ndarray:
+        """Packed bits set where a prediction exists and matches a known decision."""
+        yes_bits, present = self.predictions[key]
+        return ~(yes_bits ^ self.truth) & present & self.known
+
+    def scope(self, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Labelled papers, optionally narrowed by another packed mask."""
+        return self.known if mask is None else self.known & mask
+
+    def agreement(self, first: Key, second: Key) -> Dict[str, float]:
+        """Share of papers predicted by both keys on which they agree."""
+        first_yes, first_present = self.predictions[first]
+        second_yes, second_present = self.predictions[second]
+        both = first_present & second_present
+        papers = popcount(both)
+        agree = popcount(~(first_yes ^ second_yes) & both)
+        return {"papers": papers, "agree": agree, "rate": round(agree / papers, 4) if papers else 0.0}
+
+    def agreement_matrix(self, rebuttal: int) -> Dict[str, Dict[str, float]]:
+        """Pairwise agreement rates between all prompts under one rebuttal flag."""
+        prompts = [prompt for prompt, flag in self.keys() if flag == rebuttal]
+        return {
+            first: {second: self.agreement((first, rebuttal), (second, rebuttal))["rate"] for second in prompts}
+            for first in prompts
+        }
+
+    def majority_vote(self, keys: List[Key]) -> Tuple[np.ndarray, np.ndarray]:
+        """Ensemble "Yes" bits (strict majority of voting prompts) and the papers with any vote."""
+        yes_votes = np.zeros(self.size, dtype=np.uint16)
+        voters = np.zeros(self.size, dtype=np.uint16)
+        for key in keys:
+            yes_bits, present = self.predictions[key]
+            yes_votes += np.unpackbits(yes_bits & present, count=self.size)
+            voters += np.unpackbits(present, count=self.size)
+        return np.packbits(2 * yes_votes > voters), np.packbits(voters > 0)
+
+    def confusion(self, yes_bits: np.ndarray, present: np.ndarray,
+                  mask: Optional[np.ndarray] = None) -> Dict[str, int]:
+        """TP/FP/TN/FN of a prediction bitset against the known decisions."""
+        scope = present & self.scope(mask)
+        return {
+            "TP": popcount(yes_bits & self.truth & scope),
+            "FP": popcount(yes_bits & ~self.truth & scope),
+            "TN": popcount(~yes_bits & ~self.truth & scope),
+            "FN": popcount(~yes_bits & self.truth & scope),
+        }
+
+    def all_wrong(self, keys: List[Key]) -> np.ndarray:
+        """Packed bits of labelled papers every given key predicts, and gets wrong."""
+        result = self.known.copy()
+        for key in keys:
+            yes_bits, present = self.predictions[key]
+            result &= present & (yes_bits ^ self.truth)
+        return result
+
+    def rebuttal_flips(self, prompt: str) -> Dict[str, np.ndarray]:
+        """Papers whose prediction changes once the rebuttal is included."""
+        without_yes, without_present = self.predictions[(prompt, 0)]
+        with_yes, with_present = self.predictions[(prompt, 1)]
+        both = without_present & with_present
+        return {
+            "to_yes": ~without_yes & with_yes & both,
+            "to_no": without_yes & ~with_yes & both,
+        }
+
+    def mismatches(self, prompt: str) -> List[Dict[str, str]]:
+        """PredictionMismatchTable rows: both predictions exist and at least one is wrong."""
+        without_yes, without_present = self.predictions[(prompt, 0)]
+        with_yes, with_present = self.predictions[(prompt, 1)]
+        wrong = ((without_yes ^ self.truth) | (with_yes ^ self.truth)) & without_present & with_present & self.known
+
+        label = {True: 'Accept', False: 'Reject'}
+        without_flags = np.unpackbits(without_yes, count=self.size)
+        with_flags = np.unpackbits(with_yes, count=self.size)
+        truth_flags = np.unpackbits(self.truth, count=self.size)
+        return [
+            {
+                "paperId": self.s_ids[i],
+                "nonRebuttalPrediction": label[bool(without_flags[i])],
+                "rebuttalPrediction": label[bool(with_flags[i])],
+                "decision": label[bool(truth_flags[i])],
+            }
+            for i in np.flatnonzero(np.unpackbits(wrong, count=self.size))
+        ]
+
+
+def parse_key(value: str) -> Key:
+    """Parse "prompt:rebuttal" (e.g. "3:1")."""
+    prompt, rebuttal = value.split(':')
+    return prompt, int(rebuttal)
+
+
+def main():
+    """Main function to handle command line arguments."""
+    parser = argparse.ArgumentParser(description="Bit-packed prediction matrix queries")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Build a .pmx file from result_*.jsonl files")
+    build.add_argument("--predictions", nargs="+", required=True)
+    build.add_argument("--papers", nargs="*", default=[],
+                       help="Export chunk files or JSONL with s_id, year and decision (globs allowed)")
+    build.add_argument("--output", default="predictions.pmx")
+    build.add_argument("--workers", type=int,
+                       help="Parse the paper files in this many processes (0: one per core; needs pyarrow)")
+    build.add_argument("--dictionary", help="zstd dictionary of the export, for .zpc chunks")
+
+    for name, help_text in [
+        ("info", "Keys, sizes and memory footprint"),
+        ("agreement", "Pairwise prompt agreement for one rebuttal flag"),
+        ("ensemble", "Majority-vote ensemble confusion counts"),
+        ("all-wrong", "Papers every selected prompt gets wrong"),
+        ("flips", "Papers whose prediction changes with the rebuttal"),
+        ("mismatches", "Precompute PredictionMismatchTable rows per prompt"),
+    ]:
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("matrix", help=".pmx file written by build")
+        command.add_argument("--rebuttal", type=int, default=1)
+        command.add_argument("--keys", nargs="*", default=[], help='"prompt:rebuttal" pairs, default all')
+        command.add_argument("--prompt", help="Prompt id for flips and mismatches, default all")
+        command.add_argument("--output", help="Write JSON here instead of stdout")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        paper_files = sorted(path for pattern in args.papers for path in glob.glob(pattern))
+        dictionary = read_dictionary(args.dictionary)
+        try:
+            if args.workers is not None:
+                labels = table_labels(load_paper_table(paper_files, workers=args.workers or None,
+                                                       dictionary=dictionary))
+            else:
+                labels = load_labels(paper_files, dictionary)
+        except (RuntimeError, ValueError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        matrix = PredictionMatrix.from_files(args.predictions, labels)
+        matrix.save(args.output)
+        print(f"Papers: {matrix.size}")
+        print(f"Prompt/rebuttal combinations: {len(matrix.predictions)}")
+        print(f"Matrix size: {matrix.nbytes():,} bytes")
+        print(f"Output file: {args.output}")
+        return
+
+    try:
+        matrix = PredictionMatrix.load(args.matrix)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    keys = [parse_key(value) for value in args.keys] or matrix.keys()
+    # flips and mismatches need both rebuttal flags of a prompt
+    prompts = [args.prompt] if args.prompt else sorted(
+        {prompt for prompt, _ in matrix.keys() if (prompt, 0) in matrix.predictions and (prompt, 1) in matrix.predictions},
+        key=int
+    )
+
+    if args.command == "info":
+        result = {
+            "papers": matrix.size,
+            "labelled_papers": popcount(matrix.known),
+            "years": sorted(matrix.year_masks),
+            "keys": [f"{prompt}:{rebuttal}" for prompt, rebuttal in matrix.keys()],
+            "bytes": matrix.nbytes(),
+        }
+    elif args.command == "agreement":
+        result = matrix.agreement_matrix(args.rebuttal)
+    elif args.command == "ensemble":
+        yes_bits, present = matrix.majority_vote(keys)
+        result = {"keys": [f"{p}:{r}" for p, r in keys], **matrix.confusion(yes_bits, present)}
+        result["years"] = {
+            year: matrix.confusion(yes_bits, present, mask) for year, mask in sorted(matrix.year_masks.items())
+        }
+    elif args.command == "all-wrong":
+        result = matrix.ids_of(matrix.all_wrong(keys))
+    elif args.command == "flips":
+        result = {
+            prompt: {direction: matrix.ids_of(bits) for direction, bits in matrix.rebuttal_flips(prompt).items()}
+            for prompt in prompts
+        }
+    else:
+        result = {prompt: matrix.mismatches(prompt) for prompt in prompts}
+
+    output = json.dumps(result, separators=(',', ':'))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as outfile:
+            outfile.write(output)
+        print(f"Output file: {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
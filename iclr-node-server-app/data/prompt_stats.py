@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Prompt-comparison statistics for the result_*.jsonl prediction files.
+Aligns predictions per s_id across every prompt and both rebuttal flags,
+then computes confusion counts, bootstrap confidence intervals for accuracy
+and F1, and paired McNemar tests between prompts. The output has the shape
+of prediction_stats.jsonl so importPredictionStats.js can load it.
+
+Result files number their prompts differently from importPredictionStats.js
+(importPrediction.js reads ids 10-12 as PROMPT_CANDIDATES 3, 12 and 7), so the
+prompt numbers and prompt_types come from a prompts file (default prompts.json).
+"""
+
+import argparse
+import glob
+import json
+import math
+import sys
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from paper_loader import read_dictionary
+from prediction_matrix import DEFAULT_PROMPTS, PredictionMatrix, load_labels, load_prompts, popcount
+
+# Below this many discordant pairs McNemar uses the exact binomial test
+EXACT_MCNEMAR_LIMIT = 25
+
+
+def f1_from_counts(tp, fp, fn):
+    """F1 for scalars or arrays of counts (0 where undefined)."""
+    denominator = 2 * tp + fp + fn
+    return np.where(denominator > 0, 2 * tp / np.maximum(denominator, 1), 0.0)
+
+
+def bootstrap_metric_ci(counts: Dict[str, int], replicates: int, rng: np.random.Generator,
+                        alpha: float) -> Dict[str, List[float]]:
+    """
+    Percentile bootstrap CIs for accuracy and F1.
+
+    Accuracy and F1 only depend on the four confusion cells, so resampling
+    papers with replacement is the same as drawing the cell counts from a
+    multinomial. All replicates are drawn in one vectorized call.
+    """
+    n = sum(counts.values())
+    if n == 0:
+        return {"accuracy_ci": [0.0, 0.0], "f1_ci": [0.0, 0.0]}
+
+    cells = np.array([counts["TP"], counts["FP"], counts["TN"], counts["FN"]], dtype=np.float64)
+    draws = rng.multinomial(n, cells / n, size=replicates)
+    tp, fp, tn, fn = draws.T
+
+    accuracy = (tp + tn) / n
+    f1 = f1_from_counts(tp, fp, fn)
+    bounds = [100 * alpha / 2, 100 * (1 - alpha / 2)]
+    return {
+        "accuracy_ci": [round(float(v), 4) for v in np.percentile(accuracy, bounds)],
+        "f1_ci": [round(float(v), 4) for v in np.percentile(f1, bounds)],
+    }
+
+
+def mcnemar_test(b: int, c: int) -> Tuple[float, float]:
+    """
+    Paired McNemar test on the discordant counts.
+
+    Args:
+        b: Papers only the first prompt gets right
+        c: Papers only the second prompt gets right
+
+    Returns:
+        (statistic, two-sided p-value); exact binomial below EXACT_MCNEMAR_LIMIT
+    """
+    n = b + c
+    if n == 0:
+        return 0.0, 1.0
+    if n < EXACT_MCNEMAR_LIMIT:
+        tail = sum(math.comb(n, k) for k in range(min(b, c) + 1)) / 2 ** n
+        return float(min(b, c)), min(1.0, 2 * tail)
+
+    statistic = (abs(b - c) - 1) ** 2 / n
+    # Survival function of chi-square with one degree of freedom
+    return statistic, math.erfc(math.sqrt(statistic / 2))
+
+
+def compare_prompts(bits: PredictionMatrix, first: Tuple[str, int], second: Tuple[str, int],
+                    mask: np.ndarray, replicates: int, rng: np.random.Generator,
+                    alpha: float) -> Dict[str, object]:
+    """McNemar test and bootstrap CI of the accuracy difference on papers both predicted."""
+    _, first_present = bits.predictions[first]
+    _, second_present = bits.predictions[second]
+    scope = first_present & second_present & mask
+    first_correct = bits.correct(first)
+    second_correct = bits.correct(second)
+
+    # Joint cells of (first correct, second correct)
+    n11 = popcount(first_correct & second_correct & scope)
+    n10 = popcount(first_correct & ~second_correct & scope)
+    n01 = popcount(~first_correct & second_correct & scope)
+    n00 = popcount(~first_correct & ~second_correct & scope)
+    n = n11 + n10 + n01 + n00
+
+    statistic, p_value = mcnemar_test(n10, n01)
+    comparison = {
+        "papers": n,
+        "only_this_correct": n10,
+        "only_other_correct": n01,
+        "mcnemar_statistic": round(statistic, 4),
+        "mcnemar_p": float(f"{p_value:.4g}"),
+        "accuracy_delta": round((n10 - n01) / n, 4) if n else 0.0,
+        "accuracy_delta_ci": [0.0, 0.0],
+    }
+    if n:
+        draws = rng.multinomial(n, np.array([n11, n10, n01, n00], dtype=np.float64) / n, size=replicates)
+        deltas = (draws[:, 1] - draws[:, 2]) / n
+        bounds = [100 * alpha / 2, 100 * (1 - alpha / 2)]
+        comparison["accuracy_delta_ci"] = [round(float(v), 4) for v in np.percentile(deltas, bounds)]
+    return comparison
+
+
+def stats_numbers(bits: PredictionMatrix, prompts: Dict[str, dict]) -> Dict[str, Tuple[str, int]]:
+    """
+    Result-file prompt id -> (PROMPT_CANDIDATES number, prompt_type) for every predicted prompt.
+
+    Raises:
+        ValueError: A predicted prompt id has no stats_prompt in the prompts map
+    """
+    numbers = {}
+    missing = []
+    for prompt in sorted({prompt for prompt, _ in bits.keys()}, key=int):
+        entry = prompts.get(prompt, {})
+        if 'stats_prompt' not in entry:
+            missing.append(prompt)
+            continue
+        numbers[prompt] = (str(entry['stats_prompt']), entry['prompt_type'])
+    if missing:
+        raise ValueError(f"prompt ids {', '.join(missing)} have no stats_prompt in the prompts file")
+    return numbers
+
+
+def compute_prompt_stats(bits: PredictionMatrix, prompts: Dict[str, dict], replicates: int = 2000,
+                         alpha: float = 0.05, seed: int = 0) -> List[dict]:
+    """
+    Build one prediction_stats document per prompt.
+
+    Args:
+        bits: Loaded predictions and labels
+        prompts: Prompt map from load_prompts; its stats_prompt and prompt_type
+            become the document's prompt number and prompt_type
+        replicates: Bootstrap replicates per interval
+        alpha: 1 - confidence level of the intervals
+        seed: Seed for reproducible resampling
+    """
+    numbers = stats_numbers(bits, prompts)
+    rng = np.random.default_rng(seed)
+    keys = bits.keys()
+    documents = {}
+
+    for prompt, rebuttal in keys:
+        document = documents.setdefault(prompt, {
+            "prompt": numbers[prompt][0],
+            "prompt_type": numbers[prompt][1],
+            "predictions": [],
+            "comparisons": [],
+        })
+
+        for year, year_mask in sorted(bits.year_masks.items()):
+            counts = bits.confusion(*bits.predictions[(prompt, rebuttal)], year_mask)
+            total = sum(counts.values())
+            if total == 0:
+                continue
+            entry = {
+                "year": year,
+                "conference": "ICLR",
+                "number_of_predictions": total,
+                "rebuttal_in_review": rebuttal,
+                **counts,
+                "accuracy": round((counts["TP"] + counts["TN"]) / total, 4),
+                "f1": round(float(f1_from_counts(counts["TP"], counts["FP"], counts["FN"])), 4),
+            }
+            entry.update(bootstrap_metric_ci(counts, replicates, rng, alpha))
+            document["predictions"].append(entry)
+
+            # Paired tests against every other prompt under the same rebuttal flag
+            for other_prompt, other_rebuttal in keys:
+                if other_rebuttal != rebuttal or other_prompt == prompt:
+                    continue
+                comparison = compare_prompts(
+                    bits, (prompt, rebuttal), (other_prompt, other_rebuttal),
+                    year_mask, replicates, rng, alpha
+                )
+                if comparison["papers"]:
+                    document["comparisons"].append({
+                        "against_prompt": numbers[other_prompt][0],
+                        "year": year,
+                        "rebuttal_in_review": rebuttal,
+                        **comparison,
+                    })
+
+    return sorted(documents.values(), key=lambda document: int(document["prompt"]))
+
+
+def main():
+    """Main function to handle command line arguments."""
+    parser = argparse.ArgumentParser(description="Paired significance statistics for prompt predictions")
+    parser.add_argument("--predictions", nargs="+", required=True,
+                        help="result_*.jsonl files (e.g. result_rebut.jsonl result_no_rebut.jsonl)")
+    parser.add_argument("--papers", nargs="+", required=True,
+                        help="Export chunk files or JSONL with s_id, year and decision (globs allowed)")
+    parser.add_argument("--dictionary", help="zstd dictionary of the export, for .zpc chunks")
+    parser.add_argument("--prompts", default=DEFAULT_PROMPTS,
+                        help="JSON object of result prompt id -> {prompt, prompt_type, stats_prompt} "
+                             "(default: prompts.json, the importPrediction.js mapping)")
+    parser.add_argument("--output", default="prediction_stats_significance.jsonl")
+    parser.add_argument("--replicates", type=int, default=2000)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    paper_files = sorted(path for pattern in args.papers for path in glob.glob(pattern))
+    if not paper_files:
+        print(f"Error: no paper files match {args.papers}")
+        sys.exit(1)
+
+    try:
+        labels = load_labels(paper_files, read_dictionary(args.dictionary))
+    except (RuntimeError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    bits = PredictionMatrix.from_files(args.predictions, labels)
+
+    try:
+        documents = compute_prompt_stats(bits, load_prompts(args.prompts), replicates=args.replicates,
+                                         alpha=args.alpha, seed=args.seed)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    with open(args.output, 'w', encoding='utf-8') as outfile:
+        for document in documents:
+            outfile.write(json.dumps(document, separators=(',', ':')) + '\n')
+
+    print(f"Labelled papers: {len(labels)}")
+    print(f"Prompt/rebuttal combinations: {len(bits.predictions)}")
+    print(f"Papers predicted but not labelled: {bits.size - popcount(bits.known)}")
+    print(f"Output file: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Precompute shuffled s_id pools, stratified by year and decision, for random paper picks.
+getRandomSubmission used to run $sample on every request, which turns into a collection
+scan once the sample is more than a handful of papers. The API now claims the next n
+positions of a pool with one $inc on its cursor, reads them with a $slice projection and
+looks the papers up through the unique s_id index.
+
+One document per stratum in the sample_pools collection:
+    {_id: "2024|Reject", year, decision, s_ids: [...shuffled...], size, cursor,
+     cycle, version, inputHash, updatedAt}
+
+Refreshes are incremental: papers that left a stratum are dropped without disturbing the
+order of the rest, new papers are spliced into random unserved positions, and a stratum
+is only reshuffled from scratch when it is new, its cursor has gone all the way round,
+or most of it changed.
+"""
+
+import argparse
+import hashlib
+import os
+import random
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import MongoClient
+
+from common import DEFAULT_YEARS
+
+POOL_COLLECTION = 'sample_pools'
+
+# Share of a stratum that may change before it is reshuffled instead of patched
+RESHUFFLE_CHURN = 0.5
+
+# Attempts at writing a pool while the API keeps moving its cursor
+WRITE_ATTEMPTS = 5
+
+
+def stratum_id(year: int, decision: str) -> str:
+    return f"{year}|{decision}"
+
+
+def input_hash(s_ids: List[str]) -> str:
+    """Order-independent hash of a stratum's members."""
+    digest = hashlib.sha1()
+    for s_id in sorted(s_ids):
+        digest.update(s_id.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def load_strata(collection) -> Dict[str, List[str]]:
+    """s_ids of a year collection grouped by decision (papers without one go to "unknown")."""
+    strata: Dict[str, List[str]] = {}
+    for paper in collection.find({}, {'_id': 0, 's_id': 1, 'decision': 1}):
+        if paper.get('s_id'):
+            strata.setdefault(paper.get('decision') or 'unknown', []).append(paper['s_id'])
+    return strata
+
+
+def shuffled(s_ids: List[str], rng: random.Random) -> List[str]:
+    pool = list(s_ids)
+    rng.shuffle(pool)
+    return pool
+
+
+def patch_pool(pool: List[str], position: int, members: List[str],
+               rng: random.Random) -> Tuple[List[str], int, int, int]:
+    """
+    Bring a shuffled pool in line with a stratum's current members.
+
+    Args:
+        pool: The stored shuffled s_ids
+        position: Next position the API will serve (cursor modulo size)
+        members: Current s_ids of the stratum
+        rng: Random source for the positions of new papers
+
+    Returns:
+        (new pool, new position, papers added, papers removed)
+    """
+    current = set(members)
+    served = [s_id for s_id in pool[:position] if s_id in current]
+    unserved = [s_id for s_id in pool[position:] if s_id in current]
+    known = set(pool)
+    added = shuffled([s_id for s_id in members if s_id not in known], rng)
+    removed = len(pool) - len(served) - len(unserved)
+
+    # New papers go to random slots of the unserved part, so they come up in this cycle
+    slots = set(rng.sample(range(len(unserved) + len(added)), len(added)))
+    new_ids = iter(added)
+    old_ids = iter(unserved)
+    merged = [next(new_ids) if slot in slots else next(old_ids) for slot in range(len(unserved) + len(added))]
+    return served + merged, len(served), len(added), removed
+
+
+class SamplePoolBuilder:
+    """Creates and incrementally refreshes the stratified pools of some year collections."""
+
+    def __init__(self, db, seed: Optional[int] = None):
+        self.db = db
+        self.pools = db[POOL_COLLECTION]
+        self.rng = random.Random(seed)
+
+    def refresh_stratum(self, year: int, decision: str, members: List[str], reshuffle: bool = False) -> dict:
+        """Create, patch or reshuffle one stratum's pool; returns what was done."""
+        pool_id = stratum_id(year, decision)
+        members_hash = input_hash(members)
+
+        for _ in range(WRITE_ATTEMPTS):
+            existing = self.pools.find_one({'_id': pool_id})
+            if existing is None:
+                document = {
+                    '_id': pool_id, 'year': str(year), 'decision': decision,
+                    's_ids': shuffled(members, self.rng), 'size': len(members),
+                    'cursor': 0, 'cycle': 0, 'version': 1,
+                    'inputHash': members_hash, 'updatedAt': datetime.now()
+                }
+                self.pools.insert_one(document)
+                return {'stratum': pool_id, 'action': 'created', 'size': len(members), 'added': len(members), 'removed': 0}
+
+            size = existing['size']
+            cursor = existing['cursor']
+            exhausted = size and cursor >= size
+            if existing['inputHash'] == members_hash and not exhausted and not reshuffle:
+                return {'stratum': pool_id, 'action': 'unchanged', 'size': size, 'added': 0, 'removed': 0}
+
+            position = cursor % size if size else 0
+            s_ids, position, added, removed = patch_pool(existing['s_ids'], position, members, self.rng)
+            action = 'patched'
+            if reshuffle or exhausted or added + removed > RESHUFFLE_CHURN * max(size, 1):
+                s_ids, position, action = shuffled(members, self.rng), 0, 'reshuffled'
+
+            # Only write if the API has not claimed picks since the read; otherwise retry
+            result = self.pools.update_one(
+                {'_id': pool_id, 'cursor': cursor},
+                {'$set': {
+                    's_ids': s_ids, 'size': len(s_ids), 'cursor': position,
+                    'cycle': existing.get('cycle', 0) + (1 if action == 'reshuffled' else 0),
+                    'version': existing.get('version', 0) + 1,
+                    'inputHash': members_hash, 'updatedAt': datetime.now()
+                }}
+            )
+            if result.matched_count:
+                return {'stratum': pool_id, 'action': action, 'size': len(s_ids), 'added': added, 'removed': removed}
+
+        raise RuntimeError(f"Pool {pool_id} kept changing under the refresh; try again")
+
+    def refresh_year(self, year: int, reshuffle: bool = False) -> List[dict]:
+        """Refresh every decision stratum of a year and drop strata that no longer exist."""
+        strata = load_strata(self.db[f"iclr_{year}"])
+        outcome = [
+            self.refresh_stratum(year, decision, members, reshuffle)
+            for decision, members in sorted(strata.items())
+        ]
+        stale = self.pools.delete_many({
+            'year': str(year),
+            '_id': {'$nin': [stratum_id(year, decision) for decision in strata]}
+        })
+        if stale.deleted_count:
+            outcome.append({'stratum': f"{year}|*", 'action': 'dropped', 'size': 0, 'added': 0,
+                            'removed': stale.deleted_count})
+        return outcome
+
+    def refresh(self, years: List[int], reshuffle: bool = False) -> List[dict]:
+        self.pools.create_index('year')
+        outcome = []
+        for year in years:
+            outcome.extend(self.refresh_year(year, reshuffle))
+        return outcome
+
+
+def main():
+    """Main function to handle command line arguments."""
+    parser = argparse.ArgumentParser(description="Refresh the stratified random-pick pools of s_ids")
+    parser.add_argument("--uri", default=None,
+                        help="MongoDB connection string (default: DB_CONNECTION_STRING, like the server)")
+    parser.add_argument("--db", help="Database name (default: the one in the connection string)")
+    parser.add_argument("--years", nargs="+", type=int, default=DEFAULT_YEARS)
+    parser.add_argument("--reshuffle", action="store_true", help="Reshuffle every pool from scratch")
+    parser.add_argument("--seed", type=int, help="Seed for reproducible shuffles")
+    args = parser.parse_args()
+
+    uri = args.uri or os.getenv('DB_CONNECTION_STRING', 'mongodb://localhost:27017/iclr')
+    client = MongoClient(uri)
+    db = client[args.db] if args.db else client.get_default_database()
+
+    try:
+        outcome = SamplePoolBuilder(db, seed=args.seed).refresh(args.years, reshuffle=args.reshuffle)
+    finally:
+        client.close()
+
+    for entry in outcome:
+        print(f"{entry['stratum']}: {entry['action']} ({entry['size']} papers, "
+              f"+{entry['added']} -{entry['removed']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -56,7 +56,8 @@ async function importPredictionStats() {
         console.log('Starting import of prediction stats...');
         
         // Read the JSONL file
-        const filePath = path.join(process.cwd(), 'prediction_stats.jsonl');
+        // Defaults to prediction_stats.jsonl; pass the output of data/prompt_stats.py to load significance stats
+        const filePath = path.join(process.cwd(), process.argv[2] || 'prediction_stats.jsonl');
         
         if (!fs.existsSync(filePath)) {
             throw new Error(`File not found: ${filePath}`);
@@ -93,7 +94,8 @@ async function importPredictionStats() {
                 const predictionStatsDoc = new PredictionStats({
                     prompt: PROMPT_CANDIDATES[promptIndex],
                     prompt_type: data.prompt_type,
-                    predictions: data.predictions
+                    predictions: data.predictions,
+                    comparisons: data.comparisons || []
                 });
                 
                 await predictionStatsDoc.save();
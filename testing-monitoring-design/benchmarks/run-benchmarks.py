@@ -0,0 +1,579 @@
+#!/usr/bin/env python3
+"""
+ICLR Pipeline Benchmark Suite
+Benchmarks every Python pipeline stage against synthetic local fixtures
+(mongomock, local filesystem storage and Spark local[*]), measuring throughput,
+peak RSS and peak traced allocations, and compares the results with the
+committed baseline.json. Exits non-zero when a stage regresses beyond the
+tolerance. Each stage baseline records the Python version and CPU count it was
+measured on; stages measured elsewhere are skipped with a warning.
+
+Usage:
+    python run-benchmarks.py                       # compare against baseline.json
+    python run-benchmarks.py --update-baseline     # record a new baseline
+    python run-benchmarks.py --stages export_chunk --tolerance 0.25
+    python run-benchmarks.py --ignore-environment  # compare across Python versions / CPU counts
+    python run-benchmarks.py --compare-compression  # chunk encodings: size and decode speed
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(os.path.dirname(BENCHMARK_DIR))
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, "baseline.json")
+
+SCRIPT_PATHS = {
+    "update_prompt_values": os.path.join(REPO_DIR, "iclr-node-server-app", "data", "update_prompt_values.py"),
+    "export": os.path.join(REPO_DIR, "testing-monitoring-design", "scripts", "export-20000-papers.py"),
+    "processor": os.path.join(REPO_DIR, "testing-monitoring-design", "scripts", "emr-process-20000-papers.py"),
+    "validator": os.path.join(REPO_DIR, "testing-monitoring-design", "emr", "scripts", "data-validation.py"),
+}
+
+# Modules spark-submit ships with --py-files (emr-cluster-config.json); local sessions add them the same way
+EMR_HELPER_DIR = os.path.join(REPO_DIR, "testing-monitoring-design", "emr", "scripts")
+EMR_HELPERS = ["quantile_sketch.py", "bloom_filter.py", "report_history.py", "chunk_reader.py",
+               "review_values.py", "prompt_metadata.py"]
+
+# Environment fields a stage baseline is only comparable under (throughput and RSS depend on them)
+COMPARABLE_ENVIRONMENT = ["python", "cpu_count"]
+
+# Metric -> True when higher is better
+METRICS = {
+    "throughput_per_s": True,
+    "peak_rss_mb": False,
+    "alloc_peak_mb": False,
+}
+
+DECISIONS = ["Accept (poster)", "Accept (spotlight)", "Accept (oral)", "Reject", "Reject", "Reject"]
+WORDS = ["learning", "neural", "graph", "diffusion", "transformer", "robust", "policy", "language",
+         "model", "representation", "optimization", "contrastive", "sparse", "attention", "data"]
+
+
+def load_script(name):
+    """Import one of the hyphenated pipeline scripts as a module"""
+    spec = importlib.util.spec_from_file_location(f"bench_{name}", SCRIPT_PATHS[name])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process (ru_maxrss is KB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+# ----------------------------------------------------------------------
+# Synthetic fixtures (deterministic, shaped like the iclr_* collections)
+# ----------------------------------------------------------------------
+
+def synthetic_papers(count, year="2024", seed=0):
+    rng = random.Random(seed)
+
+    def text(words):
+        return " ".join(rng.choice(WORDS) for _ in range(words))
+
+    papers = []
+    for i in range(count):
+        reviews = []
+        for r in range(rng.randint(3, 5)):
+            reviews.append({
+                "id": f"review_{i}_{r}",
+                "values": {
+                    "summary": text(rng.randint(60, 200)),
+                    "soundness": f"{rng.randint(1, 4)} good",
+                    "presentation": f"{rng.randint(1, 4)} fair",
+                    "contribution": f"{rng.randint(1, 4)} good",
+                    "strengths": text(rng.randint(40, 150)),
+                    "weaknesses": text(rng.randint(40, 150)),
+                    "questions": text(rng.randint(10, 60)),
+                    "limitations": text(rng.randint(5, 30)),
+                    "rating": f"{rng.choice([1, 3, 5, 6, 8, 10])}: rating",
+                    "confidence": f"{rng.randint(1, 5)}: confidence",
+                },
+                "rebuttal": [
+                    {"r_id": f"rebuttal_{i}_{r}_{k}", "comment": text(rng.randint(20, 120)), "comments": []}
+                    for k in range(rng.randint(0, 3))
+                ],
+            })
+        papers.append({
+            "s_id": f"bench{year}{i:06d}",
+            "title": text(rng.randint(5, 12)).title(),
+            "authors": [f"Author {rng.randint(1, 5000)}" for _ in range(rng.randint(1, 8))],
+            "abstract": text(rng.randint(120, 250)),
+            "year": year,
+            "url": f"https://openreview.net/forum?id=bench{year}{i:06d}",
+            "decision": rng.choice(DECISIONS),
+            "metareviews": reviews,
+        })
+    return papers
+
+
+def write_result_lines(path, papers, prompts=8, seed=0):
+    """result_*.jsonl lines for every paper and prompt"""
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as outfile:
+        for paper in papers:
+            for prompt in range(prompts):
+                outfile.write(json.dumps({
+                    "prompt": str(prompt),
+                    "rebuttal": rng.randint(0, 1),
+                    "s_id": paper["s_id"],
+                    "prediction": rng.choice(["Yes", "No"]),
+                }) + "\n")
+    return len(papers) * prompts
+
+
+def write_export_chunks(directory, papers, chunk_size, timestamp):
+    """Export chunk files in the layout export-20000-papers.py writes"""
+    export = load_script("export")
+    os.makedirs(directory, exist_ok=True)
+    for chunk_num, start in enumerate(range(0, len(papers), chunk_size)):
+        chunk = [
+            dict(paper, _id=f"{start + offset:024x}")
+            for offset, paper in enumerate(papers[start:start + chunk_size])
+        ]
+        with open(os.path.join(directory, f"chunk_{chunk_num:04d}_{timestamp}.json"), "w") as f:
+            f.write(export.serialize_chunk(chunk, chunk_num, timestamp))
+
+
+class LocalFileStorage:
+    """Filesystem-backed stand-in for the S3 client calls the exporter makes"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, bucket, key):
+        return os.path.join(self.root, bucket, key)
+
+    def put_object(self, Bucket, Key, Body, ContentType=None, Metadata=None):
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(Body.encode("utf-8") if isinstance(Body, str) else Body)
+        with open(f"{path}.metadata", "w") as f:
+            json.dump(Metadata or {}, f)
+        return {}
+
+    def head_object(self, Bucket, Key):
+        path = self._path(Bucket, Key)
+        with open(f"{path}.metadata") as f:
+            return {"ContentLength": os.path.getsize(path), "Metadata": json.load(f)}
+
+    def get_object(self, Bucket, Key):
+        return {"Body": open(self._path(Bucket, Key), "rb")}
+
+
+# ----------------------------------------------------------------------
+# Stages: setup(workdir, papers) returns (run, items); run() is timed
+# ----------------------------------------------------------------------
+
+def setup_update_prompt_values(workdir, papers):
+    module = load_script("update_prompt_values")
+    input_path = os.path.join(workdir, "result_bench.jsonl")
+    output_path = os.path.join(workdir, "result_bench_updated.jsonl")
+    lines = write_result_lines(input_path, papers)
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            module.update_prompt_values(input_path, output_path)
+
+    return run, lines
+
+
+def setup_export_chunk(workdir, papers, chunk_size=500):
+    import mongomock
+    export = load_script("export")
+    logging.getLogger(export.__name__).setLevel(logging.WARNING)
+
+    client = mongomock.MongoClient()
+    collection = client["iclr_bench"]["iclr_2024"]
+    collection.insert_many([dict(paper) for paper in papers])
+
+    exporter = export.MongoDBToS3Exporter(
+        "mongodb://localhost:27017", "iclr_bench", "iclr_2024", "bench-bucket", "iclr-data"
+    )
+    exporter.s3_client = LocalFileStorage(os.path.join(workdir, "storage"))
+    plan = exporter.plan_chunks(collection, chunk_size)
+
+    def run():
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        journal = exporter.journal_for(timestamp)
+        for chunk in plan["chunks"]:
+            exporter.export_chunk(collection, chunk, timestamp, journal)
+
+    return run, len(papers)
+
+
+def local_spark_session(app_name):
+    from pyspark.sql import SparkSession
+    spark = SparkSession.builder \
+        .appName(app_name) \
+        .master("local[*]") \
+        .config("spark.sql.adaptive.enabled", "true") \
+        .config("spark.ui.enabled", "false") \
+        .getOrCreate()
+    # Like --py-files: importable on the driver and in the Python workers
+    for helper in EMR_HELPERS:
+        spark.sparkContext.addPyFile(os.path.join(EMR_HELPER_DIR, helper))
+    return spark
+
+
+def setup_process_papers(workdir, papers):
+    spark = local_spark_session("ICLR-Benchmark-Processing")
+    processor_module = load_script("processor")
+    root = os.path.join(workdir, "iclr-data")
+    write_export_chunks(os.path.join(root, "papers"), papers, 500, "20240101_000000")
+
+    class LocalPaperProcessor(processor_module.ICLRPaperProcessor):
+        def papers_root(self):
+            return f"file://{root}"
+
+    def run():
+        # saveAsTextFile refuses existing directories, and runs can share a timestamp second
+        shutil.rmtree(os.path.join(root, "analytics"), ignore_errors=True)
+        LocalPaperProcessor(spark, "local", "iclr-data").process_papers(timestamp="20240101_000000")
+
+    return run, len(papers)
+
+
+def setup_data_validator(workdir, papers):
+    spark = local_spark_session("ICLR-Benchmark-Validation")
+    validator_module = load_script("validator")
+    from pyspark.sql.functions import explode
+    chunk_dir = os.path.join(workdir, "papers")
+    write_export_chunks(chunk_dir, papers, 500, "20240101_000000")
+
+    def run():
+        raw_df = spark.read.option("multiLine", "true").json(f"file://{chunk_dir}/chunk_*.json")
+        papers_df = raw_df.select(explode("papers").alias("paper")).select("paper.*").cache()
+        validator = validator_module.ICLRDataValidator(spark)
+        validator.validate_paper_schema(papers_df)
+        validator.validate_data_quality(papers_df)
+        validator.validate_metareviews(papers_df)
+        validator.validate_year_consistency(papers_df)
+        papers_df.unpersist()
+
+    return run, len(papers)
+
+
+STAGES = {
+    "update_prompt_values": (setup_update_prompt_values, []),
+    "export_chunk": (setup_export_chunk, ["mongomock", "pymongo", "boto3"]),
+    # Spark stages write their fixtures with the exporter's serialize_chunk
+    "process_papers": (setup_process_papers, ["pyspark", "pymongo", "boto3"]),
+    "data_validator": (setup_data_validator, ["pyspark", "pymongo", "boto3"]),
+}
+
+
+def compare_chunk_compression(paper_count, chunk_size=500, random_reads=500, seed=0):
+    """Size, encode speed, decode speed and single-paper access time of the exporter's chunk encodings"""
+    export = load_script("export")
+    # The exporter puts EMR_HELPER_DIR on sys.path for the chunk encodings
+    from chunk_reader import read_paper_chunk_header
+    rng = random.Random(seed)
+    timestamp = "20240101_000000"
+    chunks = [
+        [dict(paper, _id=f"{start + offset:024x}") for offset, paper in enumerate(papers)]
+        for start, papers in (
+            (start, synthetic_papers(paper_count, seed=seed)[start:start + chunk_size])
+            for start in range(0, paper_count, chunk_size)
+        )
+    ]
+    all_papers = [paper for chunk in chunks for paper in chunk]
+    raw_bytes = sum(len(export.dump_chunk(chunk, n, timestamp).encode("utf-8")) for n, chunk in enumerate(chunks))
+
+    # Trained the way the exporter does: on a sample of the collection
+    start_time = time.perf_counter()
+    dictionary = export.train_paper_dictionary(rng.sample(all_papers, min(len(all_papers), export.ZSTD_DICT_SAMPLE_PAPERS)))
+    train_s = time.perf_counter() - start_time
+    reads = [(rng.randrange(len(chunks)), rng.random()) for _ in range(random_reads)]
+
+    results = {}
+    for compression in export.CHUNK_COMPRESSIONS:
+        start_time = time.perf_counter()
+        bodies = [export.encode_chunk(chunk, n, timestamp, compression, dictionary) for n, chunk in enumerate(chunks)]
+        encode_s = time.perf_counter() - start_time
+        bodies = [body.encode("utf-8") if isinstance(body, str) else body for body in bodies]
+
+        start_time = time.perf_counter()
+        for body in bodies:
+            export.decode_chunk(body, compression, dictionary)
+        decode_s = time.perf_counter() - start_time
+
+        # One paper out of a stored chunk: per-paper frames decode alone, other encodings decode the chunk
+        start_time = time.perf_counter()
+        for chunk_index, position in reads:
+            body = bodies[chunk_index]
+            if compression == "zstd-dict":
+                header, data_offset = read_paper_chunk_header(body)
+                _, offset, length = header["papers"][int(position * len(header["papers"]))]
+                export.decode_paper(body[data_offset + offset:data_offset + offset + length], dictionary)
+            else:
+                papers = export.decode_chunk(body, compression)["papers"]
+                papers[int(position * len(papers))]
+        random_s = time.perf_counter() - start_time
+
+        size = sum(len(body) for body in bodies)
+        results[compression] = {
+            "bytes": size,
+            "ratio": round(raw_bytes / size, 2),
+            "encode_papers_per_s": round(paper_count / encode_s),
+            "decode_papers_per_s": round(paper_count / decode_s),
+            "single_paper_ms": round(1000 * random_s / random_reads, 3),
+        }
+    results["zstd-dict"]["dictionary_bytes"] = len(dictionary)
+    results["zstd-dict"]["train_s"] = round(train_s, 3)
+    return {"papers": paper_count, "chunk_size": chunk_size, "raw_bytes": raw_bytes, "encodings": results}
+
+
+def missing_dependencies(stage):
+    return [name for name in STAGES[stage][1] if importlib.util.find_spec(name) is None]
+
+
+def run_stage(stage, paper_count, repeat):
+    """Run one stage in this process and return its measurements"""
+    setup, _ = STAGES[stage]
+    papers = synthetic_papers(paper_count)
+    with tempfile.TemporaryDirectory(prefix=f"bench_{stage}_") as workdir:
+        run, items = setup(workdir, papers)
+        del papers
+
+        # Warm-up run, then best of `repeat` untraced runs for throughput
+        run()
+        timings = []
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start_time)
+
+        # One traced run for allocations (tracemalloc slows execution, so it is not timed)
+        tracemalloc.start()
+        run()
+        _, alloc_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    best = min(timings)
+    return {
+        "items": items,
+        "best_seconds": round(best, 4),
+        "throughput_per_s": round(items / best, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "alloc_peak_mb": round(alloc_peak / (1024 * 1024), 2),
+    }
+
+
+def run_stage_isolated(stage, paper_count, repeat):
+    """Run a stage in a fresh interpreter so its peak RSS is its own"""
+    missing = missing_dependencies(stage)
+    if missing:
+        return {"skipped": f"missing {', '.join(missing)}"}
+
+    command = [sys.executable, os.path.abspath(__file__), "--run-stage", stage,
+               "--papers", str(paper_count), "--repeat", str(repeat)]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        logger.error(f"Stage {stage} failed:\n{completed.stderr[-2000:]}")
+        return {"failed": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "unknown error"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def environment_mismatch(reference, environment):
+    """Comparable environment fields that differ, as "field baseline -> current" strings"""
+    return [
+        f"{field} {reference.get(field)} -> {environment.get(field)}"
+        for field in COMPARABLE_ENVIRONMENT
+        if reference.get(field) != environment.get(field)
+    ]
+
+
+def compare_with_baseline(results, baseline, tolerance, environment, ignore_environment=False):
+    """List metrics that are worse than the baseline by more than the tolerance"""
+    regressions = []
+    for stage, current in results.items():
+        if "throughput_per_s" not in current:
+            continue
+        reference = baseline.get("stages", {}).get(stage)
+        if not reference:
+            logger.warning(f"{stage}: no baseline, record one with --update-baseline")
+            continue
+        if reference.get("papers") != current.get("papers"):
+            logger.warning(f"{stage}: baseline used {reference.get('papers')} papers, skipping comparison")
+            continue
+        # Stages recorded before environments were kept per stage fall back to the file's
+        mismatch = environment_mismatch(reference.get("environment", baseline.get("environment", {})), environment)
+        if mismatch and not ignore_environment:
+            logger.warning(f"{stage}: baseline recorded on another environment ({', '.join(mismatch)}), "
+                           f"skipping comparison")
+            continue
+        if mismatch:
+            logger.warning(f"{stage}: comparing across environments ({', '.join(mismatch)})")
+        for metric, higher_is_better in METRICS.items():
+            if not reference.get(metric):
+                continue
+            change = (current[metric] - reference[metric]) / reference[metric]
+            worse = -change if higher_is_better else change
+            if worse > tolerance:
+                regressions.append({
+                    "stage": stage,
+                    "metric": metric,
+                    "baseline": reference[metric],
+                    "current": current[metric],
+                    "change_percent": round(100 * change, 1),
+                })
+    return regressions
+
+
+def environment_info():
+    return {
+        # Minor version only: patch releases do not move the numbers
+        "python": ".".join(platform.python_version_tuple()[:2]),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description="Benchmark the ICLR Python pipeline stages")
+    parser.add_argument("--stages", nargs="+", choices=sorted(STAGES), default=list(STAGES))
+    parser.add_argument("--papers", type=int, default=2000, help="Synthetic papers per stage")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage (best is kept)")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help="Allowed relative regression (default: baseline's tolerance or 0.2)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--ignore-environment", action="store_true",
+                        help="Compare with baselines recorded on another Python version or CPU count")
+    parser.add_argument("--output", help="Write the results JSON here as well")
+    parser.add_argument("--compare-compression", action="store_true",
+                        help="Compare the exporter's chunk encodings instead of running the stages")
+    parser.add_argument("--run-stage", choices=sorted(STAGES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare_compression:
+        missing = [name for name in ["zstandard", "pymongo", "boto3"] if importlib.util.find_spec(name) is None]
+        if missing:
+            logger.error(f"Compression comparison needs {', '.join(missing)}")
+            exit(1)
+        comparison = compare_chunk_compression(args.papers)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(comparison, f, indent=2)
+        encoding_lines = "\n".join(
+            f"    - {name}: {result['bytes'] / (1024 * 1024):.2f} MB ({result['ratio']}x), "
+            f"encode {result['encode_papers_per_s']:,} papers/s, decode {result['decode_papers_per_s']:,} papers/s, "
+            f"one paper {result['single_paper_ms']} ms"
+            for name, result in comparison["encodings"].items()
+        )
+        logger.info(f"""
+    🗜️ Chunk Compression ({comparison['papers']} papers, {comparison['raw_bytes'] / (1024 * 1024):.2f} MB as JSON):
+{encoding_lines}
+    - zstd dictionary: {comparison['encodings']['zstd-dict']['dictionary_bytes'] / 1024:.0f} KB, trained in {comparison['encodings']['zstd-dict']['train_s']} s
+    """)
+        return
+
+    if args.run_stage:
+        # Child mode: quiet logs, one JSON line on stdout
+        logging.disable(logging.INFO)
+        print(json.dumps(run_stage(args.run_stage, args.papers, args.repeat)))
+        return
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    tolerance = args.tolerance if args.tolerance is not None else baseline.get("tolerance", 0.2)
+
+    results = {}
+    for stage in args.stages:
+        logger.info(f"Benchmarking {stage} with {args.papers} papers...")
+        results[stage] = {"papers": args.papers, **run_stage_isolated(stage, args.papers, args.repeat)}
+        logger.info(f"{stage}: {results[stage]}")
+
+    environment = environment_info()
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "environment": environment,
+        "tolerance": tolerance,
+        "stages": results,
+        "regressions": compare_with_baseline(results, baseline, tolerance, environment, args.ignore_environment),
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.update_baseline:
+        # Every stage keeps the environment it was measured on; stages this run could not
+        # measure keep their previous entry
+        stages = {
+            stage: dict(result, environment=result.get("environment", baseline.get("environment", {})))
+            for stage, result in baseline.get("stages", {}).items()
+        }
+        stages.update({
+            stage: dict(result, environment=environment)
+            for stage, result in results.items() if "throughput_per_s" in result
+        })
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "timestamp": report["timestamp"],
+                "tolerance": tolerance,
+                "stages": stages,
+            }, f, indent=2)
+            f.write("\n")
+        logger.info(f"Baseline updated: {args.baseline}")
+        unrecorded = {stage: result.get("skipped") or result.get("failed")
+                      for stage, result in results.items() if "throughput_per_s" not in result}
+        for stage, reason in unrecorded.items():
+            logger.error(f"Baseline for {stage} not recorded: {reason}")
+        if unrecorded:
+            exit(1)
+        return
+
+    summary_lines = "\n".join(
+        f"    - {stage}: " + (
+            f"{result['throughput_per_s']:,.0f} items/s, {result['peak_rss_mb']} MB RSS, "
+            f"{result['alloc_peak_mb']} MB allocated"
+            if "throughput_per_s" in result else result.get("skipped") or f"FAILED ({result.get('failed')})"
+        )
+        for stage, result in results.items()
+    )
+    logger.info(f"""
+    🏁 Benchmark Summary (tolerance {tolerance:.0%}):
+{summary_lines}
+    - Regressions: {len(report['regressions'])}
+    """)
+
+    failed = [stage for stage, result in results.items() if "failed" in result]
+    for regression in report["regressions"]:
+        logger.error(
+            f"Regression in {regression['stage']}.{regression['metric']}: "
+            f"{regression['baseline']} -> {regression['current']} ({regression['change_percent']:+.1f}%)"
+        )
+    if report["regressions"] or failed:
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1025 @@
+#!/usr/bin/env python3
+"""
+Local S3 Stand-in with Latency, Bandwidth and Throttling Shaping
+A loopback HTTP endpoint speaking the S3 REST calls the exporter makes (buckets,
+put/get/head/delete, ListObjectsV2 and multipart uploads), so boto3 can target it
+with endpoint_url. Every request can be shaped with a fixed latency plus jitter, a
+link bandwidth shared by all connections, a per-request bandwidth cap, a request
+rate limit and random SlowDown throttling.
+
+The sweep mode runs export-20000-papers.py against the stand-in across shaping
+profiles, chunk sizes and worker counts, attributes every run to Mongo, CPU or S3,
+and reports where max_workers and chunk size stop scaling.
+
+Usage:
+    python s3-standin.py serve --port 9000 --latency-ms 20 --per-request-mb-s 80
+    S3_ENDPOINT_URL=http://127.0.0.1:9000 python ../scripts/export-20000-papers.py
+    python s3-standin.py sweep --profiles unshaped same-region throttled --papers 4000
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+from datetime import datetime, timezone
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MB = 1024 * 1024
+# Bytes charged to the bandwidth budgets at a time, so concurrent transfers interleave
+IO_BLOCK = 64 * 1024
+S3_XMLNS = "http://s3.amazonaws.com/doc/2006-03-01/"
+# S3 rejects multipart parts below 5 MiB unless they are the last part
+MIN_PART_SIZE = 5 * MB
+LIST_MAX_KEYS = 1000
+
+# Named shaping settings for the sweep (bandwidths in MB/s)
+SHAPING_PROFILES = {
+    "unshaped": {},
+    "same-region": {"latency_ms": 15, "jitter_ms": 5, "per_request_mb_s": 80},
+    "cross-region": {"latency_ms": 80, "jitter_ms": 20, "per_request_mb_s": 25, "bandwidth_mb_s": 200},
+    "narrow-link": {"latency_ms": 5, "bandwidth_mb_s": 20},
+    "throttled": {"latency_ms": 15, "per_request_mb_s": 80, "requests_per_s": 40, "throttle_rate": 0.02},
+}
+
+SWEEP_WORKERS = [1, 2, 4, 8, 16, 32]
+SWEEP_CHUNK_SIZES = [250, 500, 1000, 2000]
+# Share of the best throughput at which more workers or larger chunks stop counting as scaling
+SWEEP_SATURATION = 0.9
+# Cores of process CPU per second of chunk time above which a run counts as CPU bound
+# (the GIL keeps serialization on roughly one core)
+CPU_BOUND_UTILIZATION = 0.85
+# Share of the shaped link bandwidth above which an S3-bound run counts as bandwidth bound
+LINK_SATURATION = 0.8
+
+
+class S3Error(Exception):
+    """An S3 error response: HTTP status plus the S3 error code"""
+
+    def __init__(self, status, code, message):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.message = message
+
+
+class TokenBucket:
+    """Rate shared by every connection; a rate of None or 0 never waits"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, amount):
+        """Reserve amount, sleeping until the bucket covers it; returns the seconds waited"""
+        if not self.rate:
+            return 0.0
+        with self.lock:
+            self._refill()
+            # Reservations may overdraw, so waiting callers queue up in arrival order
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def try_take(self, amount=1):
+        """Take amount only if it is available right now"""
+        if not self.rate:
+            return True
+        with self.lock:
+            self._refill()
+            if self.tokens < amount:
+                return False
+            self.tokens -= amount
+            return True
+
+
+class Shaping:
+    """Latency, bandwidth and throttling applied to every request of the stand-in"""
+
+    def __init__(self, latency_ms=0, jitter_ms=0, bandwidth_mb_s=None, per_request_mb_s=None,
+                 requests_per_s=None, throttle_rate=0.0, min_part_size=MIN_PART_SIZE, seed=None):
+        self.settings = {
+            "latency_ms": latency_ms,
+            "jitter_ms": jitter_ms,
+            "bandwidth_mb_s": bandwidth_mb_s,
+            "per_request_mb_s": per_request_mb_s,
+            "requests_per_s": requests_per_s,
+            "throttle_rate": throttle_rate,
+        }
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.per_request_rate = per_request_mb_s * MB if per_request_mb_s else None
+        link_rate = bandwidth_mb_s * MB if bandwidth_mb_s else None
+        # One budget per direction, like a full-duplex link; bursts of at most 100 ms
+        self.ingress = TokenBucket(link_rate, burst=link_rate and link_rate / 10)
+        self.egress = TokenBucket(link_rate, burst=link_rate and link_rate / 10)
+        # S3 limits request rates per prefix; the stand-in applies one limit to everything
+        self.requests = TokenBucket(requests_per_s, burst=requests_per_s)
+        self.throttle_rate = throttle_rate
+        self.min_part_size = min_part_size
+        self.random = random.Random(seed)
+
+    def delay(self):
+        """Sleep for the request latency; returns the seconds slept"""
+        wait = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def should_throttle(self):
+        if not self.requests.try_take():
+            return True
+        return bool(self.throttle_rate) and self.random.random() < self.throttle_rate
+
+    def pace(self, size, link):
+        """Hold a transfer of size bytes to the link and per-request caps; returns the seconds waited"""
+        started = time.monotonic()
+        waited = 0.0
+        for offset in range(0, size, IO_BLOCK):
+            waited += link.take(min(IO_BLOCK, size - offset))
+        if self.per_request_rate:
+            remaining = size / self.per_request_rate - (time.monotonic() - started)
+            if remaining > 0:
+                time.sleep(remaining)
+                waited += remaining
+        return waited
+
+
+class ObjectStore:
+    """In-memory buckets, objects and in-progress multipart uploads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.uploads = {}
+
+    def bucket(self, name):
+        objects = self.buckets.get(name)
+        if objects is None:
+            raise S3Error(404, "NoSuchBucket", f"The specified bucket does not exist: {name}")
+        return objects
+
+    def object(self, bucket, key):
+        with self.lock:
+            obj = self.bucket(bucket).get(key)
+        if obj is None:
+            raise S3Error(404, "NoSuchKey", f"The specified key does not exist: {key}")
+        return obj
+
+    def put(self, bucket, key, body, metadata, content_type, etag=None):
+        obj = {
+            "body": body,
+            "etag": etag or f'"{hashlib.md5(body).hexdigest()}"',
+            "metadata": metadata,
+            "content_type": content_type or "binary/octet-stream",
+            "last_modified": time.time(),
+        }
+        with self.lock:
+            self.bucket(bucket)[key] = obj
+        return obj
+
+    def upload(self, upload_id):
+        upload = self.uploads.get(upload_id)
+        if upload is None:
+            raise S3Error(404, "NoSuchUpload", f"The specified upload does not exist: {upload_id}")
+        return upload
+
+
+class StandInStats:
+    """Request, byte and shaping counters, reset between sweep runs"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = {}
+            self.errors = {}
+            self.throttled = 0
+            self.bytes_in = 0
+            self.bytes_out = 0
+            self.busy_seconds = 0.0
+            self.shaping_seconds = 0.0
+            self.in_flight = 0
+            self.peak_in_flight = 0
+            self.started = time.monotonic()
+
+    def begin(self):
+        with self.lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def end(self, operation, error_code, bytes_in, bytes_out, seconds, shaping_seconds):
+        with self.lock:
+            self.in_flight -= 1
+            self.requests[operation] = self.requests.get(operation, 0) + 1
+            if error_code:
+                self.errors[error_code] = self.errors.get(error_code, 0) + 1
+                if error_code == "SlowDown":
+                    self.throttled += 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            self.busy_seconds += seconds
+            self.shaping_seconds += shaping_seconds
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "requests": dict(self.requests),
+                "errors": dict(self.errors),
+                "throttled": self.throttled,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "busy_seconds": round(self.busy_seconds, 4),
+                "shaping_seconds": round(self.shaping_seconds, 4),
+                "peak_in_flight": self.peak_in_flight,
+                "elapsed_seconds": round(time.monotonic() - self.started, 4),
+            }
+
+
+def decode_aws_chunked(raw):
+    """Payload of an aws-chunked body (hex-size[;chunk-signature=...] CRLF data CRLF ... 0 CRLF trailers)"""
+    payload = bytearray()
+    position = 0
+    while True:
+        line_end = raw.index(b"\r\n", position)
+        size = int(raw[position:line_end].split(b";")[0], 16)
+        position = line_end + 2
+        if size == 0:
+            return bytes(payload)
+        payload += raw[position:position + size]
+        position += size + 2
+
+
+def iso_timestamp(seconds):
+    return datetime.fromtimestamp(seconds, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def xml_document(root, children):
+    """S3-style XML response body from (tag, text) pairs; nested lists become child elements"""
+    def render(items):
+        parts = []
+        for tag, value in items:
+            inner = render(value) if isinstance(value, list) else escape(str(value))
+            parts.append(f"<{tag}>{inner}</{tag}>")
+        return "".join(parts)
+    return f'<?xml version="1.0" encoding="UTF-8"?>\n<{root} xmlns="{S3_XMLNS}">{render(children)}</{root}>'.encode()
+
+
+def parse_range(header, total):
+    """(start, end) of a single "bytes=" range, end inclusive"""
+    unit, _, spec = header.partition("=")
+    start, _, end = spec.partition("-")
+    try:
+        if unit.strip() != "bytes" or "," in spec:
+            raise ValueError(header)
+        if start:
+            first, last = int(start), min(int(end), total - 1) if end else total - 1
+        else:
+            first, last = max(total - int(end), 0), total - 1
+    except ValueError:
+        raise S3Error(416, "InvalidRange", f"Unsupported range: {header}")
+    if first > last or first >= total:
+        raise S3Error(416, "InvalidRange", "The requested range is not satisfiable")
+    return first, last
+
+
+class S3RequestHandler(BaseHTTPRequestHandler):
+    """Path-style S3 REST requests against the server's ObjectStore"""
+
+    # Keep-alive, so boto3's connection pool is exercised the way it is against S3
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def do_GET(self):
+        self.handle_s3("GET")
+
+    def do_HEAD(self):
+        self.handle_s3("HEAD")
+
+    def do_PUT(self):
+        self.handle_s3("PUT")
+
+    def do_POST(self):
+        self.handle_s3("POST")
+
+    def do_DELETE(self):
+        self.handle_s3("DELETE")
+
+    def read_raw_body(self):
+        if "chunked" in (self.headers.get("Transfer-Encoding") or "").lower():
+            body = bytearray()
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                if not size:
+                    break
+                body += self.rfile.read(size)
+                self.rfile.readline()
+            # Skip trailers up to the blank line
+            while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                pass
+            return bytes(body)
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def read_body(self):
+        body = self.read_raw_body()
+        self.bytes_in = len(body)
+        self.shaping_seconds += self.server.shaping.pace(len(body), self.server.shaping.ingress)
+        # botocore streams checksummed uploads as aws-chunked with the checksum in a trailer
+        if ("aws-chunked" in (self.headers.get("Content-Encoding") or "")
+                or (self.headers.get("x-amz-content-sha256") or "").startswith("STREAMING-")):
+            body = decode_aws_chunked(body)
+        return body
+
+    def send(self, status, headers=None, body=b"", head=False):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("x-amz-request-id", self.request_id)
+        if "Content-Length" not in (headers or {}):
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and not head:
+            self.shaping_seconds += self.server.shaping.pace(len(body), self.server.shaping.egress)
+            self.wfile.write(body)
+            self.bytes_out = len(body)
+
+    def send_error_response(self, error, head):
+        self.error_code = error.code
+        body = b"" if head else (
+            f'<?xml version="1.0" encoding="UTF-8"?>\n<Error><Code>{error.code}</Code>'
+            f'<Message>{escape(error.message)}</Message><RequestId>{self.request_id}</RequestId></Error>'
+        ).encode()
+        headers = {"Content-Type": "application/xml"}
+        if head:
+            headers["Content-Length"] = "0"
+        self.send(error.status, headers, body, head=head)
+
+    def handle_s3(self, method):
+        parsed = urlsplit(self.path)
+        if parsed.path.startswith("/_standin/"):
+            return self.handle_control(parsed.path)
+
+        server = self.server
+        self.request_id = uuid.uuid4().hex[:16].upper()
+        self.operation = "Unknown"
+        self.error_code = None
+        self.bytes_in = self.bytes_out = 0
+        self.shaping_seconds = 0.0
+        started = time.monotonic()
+        server.stats.begin()
+        try:
+            query = parse_qs(parsed.query, keep_blank_values=True)
+            bucket, _, key = unquote(parsed.path.lstrip("/")).partition("/")
+            body = self.read_body() if method in ("PUT", "POST") else b""
+            self.shaping_seconds += server.shaping.delay()
+            try:
+                self.operation, handler = self.route(method, bucket, key, query)
+                if server.shaping.should_throttle():
+                    raise S3Error(503, "SlowDown", "Please reduce your request rate.")
+                handler(bucket, key, query, body)
+            except S3Error as error:
+                self.send_error_response(error, head=method == "HEAD")
+            except Exception as e:
+                logger.exception(f"Stand-in failed on {method} {parsed.path}")
+                self.send_error_response(S3Error(500, "InternalError", str(e)), head=method == "HEAD")
+        finally:
+            server.stats.end(self.operation, self.error_code, self.bytes_in, self.bytes_out,
+                             time.monotonic() - started, self.shaping_seconds)
+
+    def route(self, method, bucket, key, query):
+        """(S3 operation name, handler) of a request"""
+        if not bucket:
+            if method != "GET":
+                raise S3Error(405, "MethodNotAllowed", "Only ListBuckets is supported on the service")
+            return "ListBuckets", self.list_buckets
+        if not key:
+            return {
+                "PUT": ("CreateBucket", self.create_bucket),
+                "HEAD": ("HeadBucket", self.head_bucket),
+                "DELETE": ("DeleteBucket", self.delete_bucket),
+                "GET": ("ListObjectsV2", self.list_objects_v2),
+                "POST": ("DeleteObjects", self.delete_objects),
+            }[method]
+        if "uploads" in query and method == "POST":
+            return "CreateMultipartUpload", self.create_multipart_upload
+        if "uploadId" in query and method in ("PUT", "POST", "DELETE"):
+            return {
+                "PUT": ("UploadPart", self.upload_part),
+                "POST": ("CompleteMultipartUpload", self.complete_multipart_upload),
+                "DELETE": ("AbortMultipartUpload", self.abort_multipart_upload),
+            }[method]
+        routes = {
+            "PUT": ("PutObject", self.put_object),
+            "GET": ("GetObject", self.get_object),
+            "HEAD": ("HeadObject", self.head_object),
+            "DELETE": ("DeleteObject", self.delete_object),
+        }
+        if method not in routes:
+            raise S3Error(405, "MethodNotAllowed", f"{method} is not supported on objects")
+        return routes[method]
+
+    # Service and bucket operations
+
+    def list_buckets(self, bucket, key, query, body):
+        with self.server.store.lock:
+            names = sorted(self.server.store.buckets)
+        buckets = [("Bucket", [("Name", name), ("CreationDate", iso_timestamp(0))]) for name in names]
+        self.send(200, {"Content-Type": "application/xml"},
+                  xml_document("ListAllMyBucketsResult", [("Buckets", buckets)]))
+
+    def create_bucket(self, bucket, key, query, body):
+        with self.server.store.lock:
+            self.server.store.buckets.setdefault(bucket, {})
+        self.send(200, {"Location": f"/{bucket}"})
+
+    def head_bucket(self, bucket, key, query, body):
+        with self.server.store.lock:
+            self.server.store.bucket(bucket)
+        self.send(200, head=True)
+
+    def delete_bucket(self, bucket, key, query, body):
+        store = self.server.store
+        with store.lock:
+            if store.bucket(bucket):
+                raise S3Error(409, "BucketNotEmpty", "The bucket you tried to delete is not empty")
+            del store.buckets[bucket]
+        self.send(204)
+
+    def list_objects_v2(self, bucket, key, query, body):
+        if query.get("list-type", [""])[0] != "2" or query.get("delimiter"):
+            raise S3Error(501, "NotImplemented", "Only ListObjectsV2 without a delimiter is supported")
+        prefix = query.get("prefix", [""])[0]
+        max_keys = min(int(query.get("max-keys", [LIST_MAX_KEYS])[0]), LIST_MAX_KEYS)
+        token = query.get("continuation-token", [None])[0]
+        after = token or query.get("start-after", [""])[0]
+
+        with self.server.store.lock:
+            objects = self.server.store.bucket(bucket)
+            keys = sorted(key for key in objects if key.startswith(prefix) and key > after)
+            page = [(key, objects[key]) for key in keys[:max_keys]]
+        truncated = len(keys) > max_keys
+
+        children = [("Name", bucket), ("Prefix", prefix), ("KeyCount", len(page)),
+                    ("MaxKeys", max_keys), ("IsTruncated", str(truncated).lower())]
+        if token:
+            children.append(("ContinuationToken", token))
+        if truncated:
+            # The last key doubles as the token; the next page lists keys after it
+            children.append(("NextContinuationToken", page[-1][0]))
+        children += [
+            ("Contents", [("Key", key), ("LastModified", iso_timestamp(obj["last_modified"])),
+                          ("ETag", obj["etag"]), ("Size", len(obj["body"])), ("StorageClass", "STANDARD")])
+            for key, obj in page
+        ]
+        self.send(200, {"Content-Type": "application/xml"}, xml_document("ListBucketResult", children))
+
+    def delete_objects(self, bucket, key, query, body):
+        if "delete" not in query:
+            raise S3Error(405, "MethodNotAllowed", "POST on a bucket only supports DeleteObjects")
+        keys = [element.text for element in ElementTree.fromstring(body).iter() if element.tag.endswith("Key")]
+        with self.server.store.lock:
+            objects = self.server.store.bucket(bucket)
+            for key in keys:
+                objects.pop(key, None)
+        self.send(200, {"Content-Type": "application/xml"},
+                  xml_document("DeleteResult", [("Deleted", [("Key", key)]) for key in keys]))
+
+    # Object operations
+
+    def request_metadata(self):
+        return {
+            name.lower()[len("x-amz-meta-"):]: value
+            for name, value in self.headers.items()
+            if name.lower().startswith("x-amz-meta-")
+        }
+
+    def object_headers(self, obj):
+        headers = {
+            "Content-Type": obj["content_type"],
+            "ETag": obj["etag"],
+            "Last-Modified": formatdate(obj["last_modified"], usegmt=True),
+            "Accept-Ranges": "bytes",
+        }
+        headers.update({f"x-amz-meta-{name}": value for name, value in obj["metadata"].items()})
+        return headers
+
+    def put_object(self, bucket, key, query, body):
+        obj = self.server.store.put(bucket, key, body, self.request_metadata(), self.headers.get("Content-Type"))
+        self.send(200, {"ETag": obj["etag"]})
+
+    def get_object(self, bucket, key, query, body):
+        obj = self.server.store.object(bucket, key)
+        headers = self.object_headers(obj)
+        if self.headers.get("Range"):
+            first, last = parse_range(self.headers["Range"], len(obj["body"]))
+            headers["Content-Range"] = f"bytes {first}-{last}/{len(obj['body'])}"
+            return self.send(206, headers, obj["body"][first:last + 1])
+        self.send(200, headers, obj["body"])
+
+    def head_object(self, bucket, key, query, body):
+        obj = self.server.store.object(bucket, key)
+        headers = self.object_headers(obj)
+        headers["Content-Length"] = str(len(obj["body"]))
+        self.send(200, headers, head=True)
+
+    def delete_object(self, bucket, key, query, body):
+        with self.server.store.lock:
+            self.server.store.bucket(bucket).pop(key, None)
+        self.send(204)
+
+    # Multipart uploads
+
+    def create_multipart_upload(self, bucket, key, query, body):
+        store = self.server.store
+        upload_id = uuid.uuid4().hex
+        with store.lock:
+            store.bucket(bucket)
+            store.uploads[upload_id] = {
+                "bucket": bucket,
+                "key": key,
+                "metadata": self.request_metadata(),
+                "content_type": self.headers.get("Content-Type"),
+                "parts": {},
+            }
+        self.send(200, {"Content-Type": "application/xml"}, xml_document(
+            "InitiateMultipartUploadResult", [("Bucket", bucket), ("Key", key), ("UploadId", upload_id)]
+        ))
+
+    def upload_part(self, bucket, key, query, body):
+        upload = self.server.store.upload(query["uploadId"][0])
+        part_number = int(query["partNumber"][0])
+        if not 1 <= part_number <= 10000:
+            raise S3Error(400, "InvalidArgument", "Part number must be between 1 and 10000")
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        with self.server.store.lock:
+            upload["parts"][part_number] = (etag, body)
+        self.send(200, {"ETag": etag})
+
+    def complete_multipart_upload(self, bucket, key, query, body):
+        upload_id = query["uploadId"][0]
+        store = self.server.store
+        requested = []
+        for part in ElementTree.fromstring(body):
+            fields = {child.tag.rsplit("}", 1)[-1]: child.text for child in part}
+            requested.append((int(fields["PartNumber"]), fields.get("ETag")))
+        if not requested:
+            raise S3Error(400, "MalformedXML", "The multipart upload lists no parts")
+        if [number for number, _ in requested] != sorted({number for number, _ in requested}):
+            raise S3Error(400, "InvalidPartOrder", "Parts must be listed in ascending order")
+
+        with store.lock:
+            upload = store.upload(upload_id)
+            parts = []
+            for number, etag in requested:
+                stored = upload["parts"].get(number)
+                if stored is None or (etag and etag.strip('"') != stored[0].strip('"')):
+                    raise S3Error(400, "InvalidPart", f"Part {number} was not uploaded or its ETag differs")
+                parts.append(stored)
+        for stored_etag, part_body in parts[:-1]:
+            if len(part_body) < self.server.shaping.min_part_size:
+                raise S3Error(400, "EntityTooSmall", "Every part but the last must be at least 5 MiB")
+
+        # S3's multipart ETag: MD5 of the concatenated part MD5s, suffixed with the part count
+        digests = b"".join(bytes.fromhex(etag.strip('"')) for etag, _ in parts)
+        etag = f'"{hashlib.md5(digests).hexdigest()}-{len(parts)}"'
+        store.put(bucket, key, b"".join(part_body for _, part_body in parts),
+                  upload["metadata"], upload["content_type"], etag=etag)
+        with store.lock:
+            store.uploads.pop(upload_id, None)
+        self.send(200, {"Content-Type": "application/xml"}, xml_document(
+            "CompleteMultipartUploadResult",
+            [("Location", f"/{bucket}/{key}"), ("Bucket", bucket), ("Key", key), ("ETag", etag)]
+        ))
+
+    def abort_multipart_upload(self, bucket, key, query, body):
+        upload_id = query["uploadId"][0]
+        store = self.server.store
+        with store.lock:
+            store.upload(upload_id)
+            del store.uploads[upload_id]
+        self.send(204)
+
+    # Control endpoints (not part of S3; bucket names cannot start with "_")
+
+    def handle_control(self, path):
+        if path == "/_standin/stats":
+            body = json.dumps({"settings": self.server.shaping.settings, **self.server.stats.snapshot()}).encode()
+        elif path == "/_standin/reset":
+            self.server.stats.reset()
+            body = b"{}"
+        else:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.read_raw_body()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StandInHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    # More queued connects than the default 5, for sweeps with many workers
+    request_queue_size = 128
+
+
+class S3StandIn:
+    """Loopback S3 endpoint; start() serves it from a daemon thread of this process"""
+
+    def __init__(self, host="127.0.0.1", port=0, shaping=None):
+        self.httpd = StandInHTTPServer((host, port), S3RequestHandler)
+        self.httpd.shaping = shaping or Shaping()
+        self.httpd.store = ObjectStore()
+        self.httpd.stats = StandInStats()
+        self.thread = None
+
+    @property
+    def endpoint_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def stats(self):
+        return self.httpd.stats
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="s3-standin", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# ----------------------------------------------------------------------
+# Sweep: the exporter against shaped stand-ins
+# ----------------------------------------------------------------------
+
+def load_benchmarks():
+    """run-benchmarks.py as a module, for its fixtures and script loader"""
+    spec = importlib.util.spec_from_file_location("bench_suite", os.path.join(BENCHMARK_DIR, "run-benchmarks.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def shaping_arguments(settings):
+    return [argument for name, value in settings.items() if value is not None
+            for argument in (f"--{name.replace('_', '-')}", str(value))]
+
+
+def launch_standin(settings):
+    """Serve a shaped stand-in from a child process, so its CPU is not charged to the exporter"""
+    command = [sys.executable, os.path.abspath(__file__), "serve", "--port", "0"] + shaping_arguments(settings)
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    endpoint = process.stdout.readline().strip()
+    if not endpoint.startswith("http://"):
+        process.kill()
+        raise RuntimeError(f"S3 stand-in did not start (exit code {process.wait()})")
+    return process, endpoint
+
+
+def standin_control(endpoint, action):
+    method = "GET" if action == "stats" else "POST"
+    request = urllib.request.Request(f"{endpoint}/_standin/{action}", data=b"" if method == "POST" else None,
+                                     method=method)
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+class TimedJournal:
+    """Journal wrapper that charges record_chunk's S3 write to the chunk's S3 time"""
+
+    def __init__(self, journal, record):
+        self.journal = journal
+        self.record = record
+
+    def record_chunk(self, entry):
+        start = time.perf_counter()
+        try:
+            return self.journal.record_chunk(entry)
+        finally:
+            self.record("s3", time.perf_counter() - start)
+
+
+def timed_exporter_class(export, collection_summary=True):
+    """MongoDBToS3Exporter that splits every chunk's time into Mongo, S3 and CPU"""
+
+    class TimedExporter(export.MongoDBToS3Exporter):
+        def collect_collection_summary(self, collection):
+            # mongomock has neither $bsonSize nor collStats, and the summary is outside the timed phase
+            return super().collect_collection_summary(collection) if collection_summary else None
+
+        def reset_timings(self):
+            self.timing_lock = threading.Lock()
+            self.timings = {"mongo": 0.0, "s3": 0.0, "chunks": 0.0}
+            self.window = {"start": None, "end": None, "cpu_start": None, "cpu_end": None}
+
+        def record(self, phase, seconds):
+            with self.timing_lock:
+                self.timings[phase] += seconds
+
+        def fetch_chunk(self, collection, chunk):
+            start = time.perf_counter()
+            try:
+                return super().fetch_chunk(collection, chunk)
+            finally:
+                self.record("mongo", time.perf_counter() - start)
+
+        def upload_chunk(self, body, chunk_num, timestamp):
+            start = time.perf_counter()
+            try:
+                return super().upload_chunk(body, chunk_num, timestamp)
+            finally:
+                self.record("s3", time.perf_counter() - start)
+
+        def export_chunk(self, collection, chunk, timestamp, journal):
+            # Only the chunk phase is timed; planning is the same for every worker count
+            with self.timing_lock:
+                if self.window["start"] is None:
+                    self.window["start"] = time.perf_counter()
+                    self.window["cpu_start"] = time.process_time()
+            start = time.perf_counter()
+            try:
+                return super().export_chunk(collection, chunk, timestamp, TimedJournal(journal, self.record))
+            finally:
+                end = time.perf_counter()
+                self.record("chunks", end - start)
+                with self.timing_lock:
+                    self.window["end"] = end
+                    self.window["cpu_end"] = time.process_time()
+
+    return TimedExporter
+
+
+def classify_bound(run, settings):
+    """What held a run back: cpu, mongo, or s3-throttling / s3-bandwidth / s3-latency"""
+    if run["cpu_utilization"] >= CPU_BOUND_UTILIZATION:
+        return "cpu"
+    phase = max(run["phase_share"], key=run["phase_share"].get)
+    if phase != "s3":
+        return phase
+    if run["s3"]["throttled"]:
+        return "s3-throttling"
+    if settings.get("bandwidth_mb_s") and run["upload_mb_per_s"] >= LINK_SATURATION * settings["bandwidth_mb_s"]:
+        return "s3-bandwidth"
+    return "s3-latency"
+
+
+def run_config(exporter, endpoint, settings, profile, chunk_size, workers):
+    """One timed export through the stand-in"""
+    standin_control(endpoint, "reset")
+    exporter.reset_timings()
+    exporter.export_papers_in_chunks(
+        chunk_size=chunk_size,
+        max_workers=workers,
+        timestamp=f"sweep_{profile}_{chunk_size}_{workers}_{uuid.uuid4().hex[:6]}",
+        write_manifest=False
+    )
+    s3 = standin_control(endpoint, "stats")
+
+    window = exporter.window
+    seconds = window["end"] - window["start"]
+    papers = exporter.last_export["total_papers"]
+    chunk_seconds = exporter.timings["chunks"] or 1e-9
+    mongo_share = exporter.timings["mongo"] / chunk_seconds
+    s3_share = exporter.timings["s3"] / chunk_seconds
+    run = {
+        "profile": profile,
+        "chunk_size": chunk_size,
+        "max_workers": workers,
+        "papers": papers,
+        "seconds": round(seconds, 4),
+        "papers_per_s": round(papers / seconds, 1),
+        "upload_mb_per_s": round(s3["bytes_in"] / MB / seconds, 2),
+        "cpu_utilization": round((window["cpu_end"] - window["cpu_start"]) / seconds, 3),
+        "phase_share": {
+            "mongo": round(mongo_share, 3),
+            "s3": round(s3_share, 3),
+            "cpu": round(max(0.0, 1 - mongo_share - s3_share), 3),
+        },
+        "s3": {
+            "requests": sum(s3["requests"].values()),
+            "throttled": s3["throttled"],
+            "peak_in_flight": s3["peak_in_flight"],
+        },
+    }
+    run["bound"] = classify_bound(run, settings)
+    return run
+
+
+def scaling_knees(runs):
+    """
+    Per profile: the fewest workers within SWEEP_SATURATION of each chunk size's best
+    throughput, the smallest chunk size within it of the profile's best, and the bound
+    at those points.
+    """
+    summary = {}
+    for profile in dict.fromkeys(run["profile"] for run in runs):
+        profile_runs = [run for run in runs if run["profile"] == profile]
+        best = max(profile_runs, key=lambda run: run["papers_per_s"])
+
+        workers_knees = {}
+        for chunk_size in sorted({run["chunk_size"] for run in profile_runs}):
+            chunk_runs = sorted((run for run in profile_runs if run["chunk_size"] == chunk_size),
+                                key=lambda run: run["max_workers"])
+            top = max(run["papers_per_s"] for run in chunk_runs)
+            knee = next(run for run in chunk_runs if run["papers_per_s"] >= SWEEP_SATURATION * top)
+            workers_knees[chunk_size] = {
+                "max_workers": knee["max_workers"],
+                "papers_per_s": knee["papers_per_s"],
+                "bound": knee["bound"],
+            }
+
+        chunk_size_knee = min(
+            chunk_size for chunk_size, knee in workers_knees.items()
+            if max(run["papers_per_s"] for run in profile_runs if run["chunk_size"] == chunk_size)
+            >= SWEEP_SATURATION * best["papers_per_s"]
+        )
+        summary[profile] = {
+            "best": {key: best[key] for key in ("chunk_size", "max_workers", "papers_per_s", "bound")},
+            "workers_knee_by_chunk_size": workers_knees,
+            "chunk_size_knee": chunk_size_knee,
+        }
+    return summary
+
+
+def run_sweep(args):
+    """Export the same papers through every profile x chunk size x worker count"""
+    benchmarks = load_benchmarks()
+    export = benchmarks.load_script("export")
+    logging.getLogger(export.__name__).setLevel(logging.WARNING)
+    TimedExporter = timed_exporter_class(export, collection_summary=bool(args.mongo_uri))
+
+    if args.mongo_uri:
+        from pymongo import MongoClient
+        mongo_client = MongoClient(args.mongo_uri, maxPoolSize=max(args.workers) + 4)
+    else:
+        # mongomock runs in this process, so its queries count as exporter CPU
+        import mongomock
+        mongo_client = mongomock.MongoClient()
+        mongo_client[args.db][args.collection].insert_many(benchmarks.synthetic_papers(args.papers))
+        logger.info(f"Seeded mongomock with {args.papers:,} synthetic papers")
+
+    # The stand-in ignores signatures, but botocore still needs credentials to sign with
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "standin")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "standin")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+    runs = []
+    for profile in args.profiles:
+        settings = SHAPING_PROFILES[profile]
+        process, endpoint = launch_standin(settings)
+        os.environ["S3_ENDPOINT_URL"] = endpoint
+        try:
+            exporter = TimedExporter(args.mongo_uri or "mongodb://localhost:27017", args.db, args.collection,
+                                     args.bucket, "iclr-data", client=mongo_client)
+            exporter.s3_client.create_bucket(Bucket=args.bucket)
+            for chunk_size in args.chunk_sizes:
+                for workers in args.workers:
+                    run = run_config(exporter, endpoint, settings, profile, chunk_size, workers)
+                    logger.info(
+                        f"{profile}: chunk_size={chunk_size} max_workers={workers} -> "
+                        f"{run['papers_per_s']:,.0f} papers/s, {run['upload_mb_per_s']} MB/s, "
+                        f"cpu {run['cpu_utilization']:.2f}, bound by {run['bound']}"
+                    )
+                    runs.append(run)
+        finally:
+            process.terminate()
+            process.wait()
+            os.environ.pop("S3_ENDPOINT_URL", None)
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "environment": benchmarks.environment_info(),
+        "papers": args.papers,
+        "mongo": "mongodb" if args.mongo_uri else "mongomock",
+        "profiles": {profile: SHAPING_PROFILES[profile] for profile in args.profiles},
+        "runs": runs,
+        "knees": scaling_knees(runs),
+    }
+
+
+def add_shaping_arguments(parser):
+    parser.add_argument("--latency-ms", type=float, default=0, help="Latency added to every request")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Uniform random extra latency")
+    parser.add_argument("--bandwidth-mb-s", type=float, help="Link bandwidth shared by all requests, per direction")
+    parser.add_argument("--per-request-mb-s", type=float, help="Bandwidth cap of a single request")
+    parser.add_argument("--requests-per-s", type=float, help="Request rate above which SlowDown is returned")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of requests answered with SlowDown")
+    parser.add_argument("--min-part-size-mb", type=float, default=MIN_PART_SIZE / MB,
+                        help="Smallest non-final multipart part accepted")
+    parser.add_argument("--seed", type=int, help="Seed for jitter and random throttling")
+
+
+def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description="Shaped local S3 stand-in and exporter scaling sweep")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="Serve the stand-in until interrupted")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=9000, help="0 picks a free port")
+    add_shaping_arguments(serve)
+
+    sweep = commands.add_parser("sweep", help="Find where the exporter stops scaling")
+    sweep.add_argument("--profiles", nargs="+", choices=sorted(SHAPING_PROFILES), default=list(SHAPING_PROFILES))
+    sweep.add_argument("--papers", type=int, default=4000, help="Synthetic papers (mongomock only)")
+    sweep.add_argument("--workers", type=int, nargs="+", default=SWEEP_WORKERS)
+    sweep.add_argument("--chunk-sizes", type=int, nargs="+", default=SWEEP_CHUNK_SIZES)
+    sweep.add_argument("--mongo-uri", help="Export from this MongoDB instead of a seeded mongomock")
+    sweep.add_argument("--db", default="iclr_bench")
+    sweep.add_argument("--collection", default="iclr_2024")
+    sweep.add_argument("--bucket", default="bench-bucket")
+    sweep.add_argument("--output", help="Write the sweep JSON here")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        shaping = Shaping(
+            latency_ms=args.latency_ms,
+            jitter_ms=args.jitter_ms,
+            bandwidth_mb_s=args.bandwidth_mb_s,
+            per_request_mb_s=args.per_request_mb_s,
+            requests_per_s=args.requests_per_s,
+            throttle_rate=args.throttle_rate,
+            min_part_size=int(args.min_part_size_mb * MB),
+            seed=args.seed
+        )
+        standin = S3StandIn(args.host, args.port, shaping)
+        # First stdout line is the endpoint; the sweep reads it to find the port
+        print(standin.endpoint_url, flush=True)
+        logger.info(f"S3 stand-in listening on {standin.endpoint_url} with {shaping.settings}")
+        try:
+            standin.httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            standin.httpd.server_close()
+        return
+
+    report = run_sweep(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    summary_lines = "\n".join(
+        f"    - {profile}: best {knee['best']['papers_per_s']:,.0f} papers/s at chunk_size="
+        f"{knee['best']['chunk_size']}, max_workers={knee['best']['max_workers']} ({knee['best']['bound']}); "
+        f"workers stop scaling at " + ", ".join(
+            f"{entry['max_workers']} (chunk {chunk_size}, {entry['bound']})"
+            for chunk_size, entry in knee["workers_knee_by_chunk_size"].items()
+        ) + f"; chunk size stops scaling at {knee['chunk_size_knee']}"
+        for profile, knee in report["knees"].items()
+    )
+    logger.info(f"""
+    🪣 S3 Stand-in Sweep ({report['papers']:,} papers, {report['mongo']}):
+{summary_lines}
+    """)
+
+
+if __name__ == "__main__":
+    main()
@@ -26,6 +26,8 @@ sudo pip3 install \
     boto3 \
     requests \
     pyspark \
+    pyarrow \
+    zstandard \
     pymongo[srv] \
     dnspython
 
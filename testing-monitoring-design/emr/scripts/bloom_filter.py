@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Mergeable Bloom filters for referential-integrity checks
+Lets the validation job test which prediction s_ids exist in the submissions (and
+which submissions have predictions) with memory fixed by the number of keys and the
+false-positive rate instead of a join shuffle. Filters built on different
+partitions OR together into one, and a filter never misses a key it holds, so
+everything it reports as absent really is absent.
+
+Ship with the Spark jobs that import it:
+    spark-submit --py-files s3://your-bucket/scripts/bloom_filter.py data-validation.py
+"""
+
+import base64
+import hashlib
+import math
+
+try:
+    import numpy as np
+except ImportError:  # Batch methods fall back to one key at a time
+    np = None
+
+# Share of absent keys a filter wrongly reports as present
+DEFAULT_FALSE_POSITIVE_RATE = 0.001
+
+
+class BloomFilter:
+    """
+    Bloom filter over a bytearray.
+
+    Sized for capacity keys at the target false-positive rate:
+    m = -n ln p / (ln 2)^2 bits and k = m / n ln 2 hash functions, whose
+    positions come from double hashing of one 128-bit blake2b digest.
+    """
+
+    def __init__(self, capacity, false_positive_rate=DEFAULT_FALSE_POSITIVE_RATE):
+        capacity = max(int(capacity), 1)
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        self.num_bits = max(64, int(math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2)))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def positions(self, key):
+        digest = hashlib.blake2b(str(key).encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        for position in self.positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(key))
+
+    def batch_positions(self, keys):
+        """positions() of a list of keys as a (keys, hashes) uint64 array"""
+        digests = b"".join(hashlib.blake2b(str(key).encode("utf-8"), digest_size=16).digest() for key in keys)
+        halves = np.frombuffer(digests, dtype="<u8").reshape(-1, 2)
+        # Reduced before combining so uint64 never wraps and positions match positions()
+        num_bits = np.uint64(self.num_bits)
+        first = halves[:, :1] % num_bits
+        second = (halves[:, 1:] | np.uint64(1)) % num_bits
+        return (first + np.arange(self.num_hashes, dtype=np.uint64)[None, :] * second) % num_bits
+
+    def add_many(self, keys):
+        """add() for a list of keys, vectorised with numpy"""
+        if np is None:
+            for key in keys:
+                self.add(key)
+            return
+        if not keys:
+            return
+        positions = self.batch_positions(keys).ravel()
+        bits = np.frombuffer(self.bits, dtype=np.uint8)
+        np.bitwise_or.at(bits, positions >> np.uint64(3), np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8))
+        self.count += len(keys)
+
+    def contains_many(self, keys):
+        """Membership of each key in a list (a bool array with numpy)"""
+        if np is None:
+            return [key in self for key in keys]
+        if not keys:
+            return np.zeros(0, dtype=bool)
+        positions = self.batch_positions(keys)
+        bits = np.frombuffer(self.bits, dtype=np.uint8)
+        return ((bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1).all(axis=1)
+
+    def merge(self, other):
+        """OR another filter of the same shape into this one; returns self"""
+        if (self.num_bits, self.num_hashes) != (other.num_bits, other.num_hashes):
+            raise ValueError("Bloom filters of different sizes cannot be merged")
+        merged = int.from_bytes(self.bits, "little") | int.from_bytes(other.bits, "little")
+        self.bits = bytearray(merged.to_bytes(len(self.bits), "little"))
+        self.count += other.count
+        return self
+
+    @property
+    def nbytes(self):
+        return len(self.bits)
+
+    def fill_ratio(self):
+        return sum(bin(byte).count("1") for byte in self.bits) / self.num_bits
+
+    def estimated_false_positive_rate(self):
+        """False-positive rate implied by the bits actually set"""
+        return self.fill_ratio() ** self.num_hashes
+
+    def to_dict(self):
+        return {
+            "capacity": self.capacity,
+            "false_positive_rate": self.false_positive_rate,
+            "count": self.count,
+            "bits": base64.b64encode(bytes(self.bits)).decode("ascii")
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        bloom = cls(data["capacity"], data["false_positive_rate"])
+        bloom.count = data["count"]
+        bloom.bits = bytearray(base64.b64decode(data["bits"]))
+        return bloom
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Read exported paper chunks of every encoding into Spark
+The exporter writes chunks as plain JSON (.json), gzip (.json.gz) or zstd-dict
+(.zpc: one dictionary-compressed frame per paper behind an index header). Spark
+reads the first two natively; zstd-dict chunks are decoded on the executors with
+the dictionary the export manifest records, and come back as the same chunk
+documents ({chunk_number, total_papers, export_timestamp, papers}).
+
+The chunk encodings are defined here only: the exporter and the local paper
+loader import the suffixes, the zstd-dict layout and the decoders from this module.
+
+Ship with the Spark jobs that import it:
+    spark-submit --py-files s3://your-bucket/scripts/chunk_reader.py emr-process-20000-papers.py
+"""
+
+import gzip
+import hashlib
+import json
+import struct
+
+try:
+    import zstandard
+except ImportError:  # Only zstd-dict chunks need zstandard
+    zstandard = None
+
+# Chunk file suffixes of the exporter's encodings
+CHUNK_SUFFIXES = {"none": ".json", "gzip": ".json.gz", "zstd-dict": ".zpc"}
+
+# zstd-dict chunk layout: magic, u32 header length, JSON header with the chunk metadata and
+# one [s_id, offset, length] per paper (offsets from the end of the header), then the frames
+PAPER_CHUNK_MAGIC = b"ZPC1"
+
+
+def chunk_glob(pattern):
+    """Glob of a chunk name pattern under every encoding ("chunk_*" -> "chunk_*{.json,.json.gz,.zpc}")"""
+    return f"{pattern}{{{','.join(CHUNK_SUFFIXES.values())}}}"
+
+
+def list_chunks(spark, path_glob):
+    """Paths matched by a chunk glob, via the Hadoop FileSystem API"""
+    jvm = spark.sparkContext._jvm
+    path = jvm.org.apache.hadoop.fs.Path(path_glob)
+    fs = path.getFileSystem(spark.sparkContext._jsc.hadoopConfiguration())
+    return sorted(status.getPath().toString() for status in (fs.globStatus(path) or []))
+
+
+def chunk_directory(path):
+    """Name of the directory a chunk sits in ("papers", or "export_year=<year>" in a multi-year export)"""
+    return path.rstrip("/").rsplit("/", 2)[-2]
+
+
+def read_dictionary(spark, path, sha256=None):
+    """Bytes of a zstd dictionary, checked against the checksum the manifest records"""
+    body = bytes(spark.sparkContext.binaryFiles(path).collect()[0][1])
+    if sha256 and hashlib.sha256(body).hexdigest() != sha256:
+        raise RuntimeError(f"Dictionary {path} does not match its checksum")
+    return body
+
+
+def manifest_dictionaries(spark, manifest, root):
+    """
+    zstd dictionaries of an export, keyed by the directory their chunks sit in.
+
+    Args:
+        spark: Spark session
+        manifest: Export manifest (single collection or multi-year)
+        root: Location of the manifest's s3_prefix (e.g. s3://bucket/iclr-data)
+
+    Returns:
+        Mapping of chunk directory to dictionary bytes; empty for exports without zstd-dict chunks
+    """
+    if not manifest:
+        return {}
+    prefix = manifest.get("s3_prefix", "")
+    if "years" in manifest:
+        exports = [(info.get("compression"), info.get("papers_prefix", "")) for info in manifest["years"].values()]
+    else:
+        exports = [(manifest.get("compression"), f"{prefix}/papers")]
+
+    dictionaries = {}
+    for compression, papers_prefix in exports:
+        if not isinstance(compression, dict) or compression.get("codec") != "zstd-dict":
+            continue
+        info = compression["dictionary"]
+        key = info["s3_key"][len(prefix):].lstrip("/") if info["s3_key"].startswith(prefix) else info["s3_key"]
+        dictionaries[papers_prefix.rstrip("/").rsplit("/", 1)[-1]] = read_dictionary(
+            spark, f"{root}/{key}", info.get("sha256")
+        )
+    return dictionaries
+
+
+def paper_decompressor(dictionary):
+    """zstd decompressor for the paper frames of an export's dictionary"""
+    if zstandard is None:
+        raise RuntimeError("zstd-dict chunks need the zstandard package")
+    return zstandard.ZstdDecompressor(dict_data=zstandard.ZstdCompressionDict(dictionary))
+
+
+def read_paper_chunk_header(body):
+    """(header, data offset) of a zstd-dict chunk; the first 8 bytes tell how much header to fetch"""
+    if body[:4] != PAPER_CHUNK_MAGIC:
+        raise ValueError("Not a zstd-dict paper chunk")
+    header_length = struct.unpack('<I', body[4:8])[0]
+    return json.loads(body[8:8 + header_length]), 8 + header_length
+
+
+def iter_paper_chunk(body, decompressor):
+    """Papers of a zstd-dict chunk, decoded one frame at a time"""
+    header, data_offset = read_paper_chunk_header(body)
+    for _, offset, length in header["papers"]:
+        yield json.loads(decompressor.decompress(body[data_offset + offset:data_offset + offset + length]))
+
+
+def decode_paper_chunk(body, decompressor):
+    """Chunk document of a zstd-dict chunk"""
+    header, _ = read_paper_chunk_header(body)
+    header.pop("dict_id", None)
+    header.pop("papers")
+    return dict(header, papers=list(iter_paper_chunk(body, decompressor)))
+
+
+def decode_chunk(body, compression="none", dictionary=None):
+    """Chunk document ({chunk_number, total_papers, export_timestamp, papers}) of any encoding"""
+    if compression == "gzip":
+        return json.loads(gzip.decompress(body))
+    if compression != "zstd-dict":
+        return json.loads(body)
+    return decode_paper_chunk(body, paper_decompressor(dictionary))
+
+
+def read_chunks(spark, path_glob, dictionaries=None, base_path=None):
+    """
+    Chunk documents of every chunk a glob matches, one row per chunk.
+
+    Args:
+        spark: Spark session
+        path_glob: Chunk glob, usually from chunk_glob
+        dictionaries: zstd dictionaries by chunk directory (manifest_dictionaries), for .zpc chunks
+        base_path: Root for partition discovery (keeps export_year as a column)
+
+    Returns:
+        DataFrame with the chunk documents' columns, plus any partition columns
+    """
+    paths = list_chunks(spark, path_glob)
+    if not paths:
+        raise FileNotFoundError(f"No paper chunks match {path_glob}")
+    json_paths = [path for path in paths if not path.endswith(CHUNK_SUFFIXES["zstd-dict"])]
+    zpc_paths = [path for path in paths if path.endswith(CHUNK_SUFFIXES["zstd-dict"])]
+
+    frames = []
+    if json_paths:
+        # Each chunk is a single pretty-printed document; Hadoop decompresses .gz by extension
+        reader = spark.read.option("multiLine", "true")
+        if base_path:
+            reader = reader.option("basePath", base_path)
+        frames.append(reader.json(json_paths))
+
+    if zpc_paths:
+        dictionaries = dictionaries or {}
+        missing = sorted({chunk_directory(path) for path in zpc_paths} - set(dictionaries))
+        if missing:
+            raise ValueError(
+                f"zstd-dict chunks in {', '.join(missing)} need their export's dictionary "
+                f"(read from the export manifest, so pass the export timestamp)"
+            )
+        if zstandard is None:
+            raise RuntimeError("zstd-dict chunks need the zstandard package")
+        reader = spark.read.format("binaryFile")
+        if base_path:
+            reader = reader.option("basePath", base_path)
+        files = reader.load(zpc_paths)
+        partition_columns = [name for name in files.columns if name not in ("path", "modificationTime", "length", "content")]
+        shared = spark.sparkContext.broadcast(dictionaries)
+
+        def decode(rows):
+            decompressors = {}
+            for row in rows:
+                directory = chunk_directory(row["path"])
+                if directory not in decompressors:
+                    decompressors[directory] = paper_decompressor(shared.value[directory])
+                document = decode_paper_chunk(bytes(row["content"]), decompressors[directory])
+                document.update({name: row[name] for name in partition_columns})
+                yield json.dumps(document)
+
+        frames.append(spark.read.json(files.rdd.mapPartitions(decode)))
+
+    chunks_df = frames[0]
+    for frame in frames[1:]:
+        chunks_df = chunks_df.unionByName(frame, allowMissingColumns=True)
+    return chunks_df
+
+
+def export_papers(spark, root, manifest=None):
+    """
+    Papers of an export, one row per paper.
+
+    Args:
+        spark: Spark session
+        root: Location of the export's s3_prefix (e.g. s3://bucket/iclr-data)
+        manifest: Export manifest; limits the read to its export and supplies its zstd
+            dictionaries (without one every chunk under root/papers is read)
+
+    Returns:
+        DataFrame of the papers, with export_year for a multi-year export
+    """
+    timestamp = (manifest or {}).get("export_timestamp")
+    chunk_name = f"chunk_*_{timestamp}" if timestamp else "chunk_*"
+    dictionaries = manifest_dictionaries(spark, manifest, root)
+    if manifest and "years" in manifest:
+        chunks_df = read_chunks(
+            spark, chunk_glob(f"{root}/papers/export_year=*/{chunk_name}"), dictionaries, base_path=f"{root}/papers/"
+        )
+        return chunks_df.selectExpr("export_year", "explode(papers) AS paper").select("export_year", "paper.*")
+    chunks_df = read_chunks(spark, chunk_glob(f"{root}/papers/{chunk_name}"), dictionaries)
+    return chunks_df.selectExpr("explode(papers) AS paper").select("paper.*")
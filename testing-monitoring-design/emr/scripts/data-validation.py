@@ -5,16 +5,25 @@ Validates 20,000+ papers for data integrity, schema compliance, and quality metr
 """
 
 from pyspark.sql import SparkSession
-from pyspark.sql.functions import col, count, isnan, isnull, when, udf
+from pyspark.sql.functions import col, count, isnan, isnull, length, regexp_extract, when, udf, size, explode
 from pyspark.sql.types import StructType, StructField, StringType, ArrayType, DoubleType
 import json
 import logging
+import os
 from datetime import datetime
 
+from bloom_filter import BloomFilter, DEFAULT_FALSE_POSITIVE_RATE
+from chunk_reader import export_papers
+from report_history import ReportHistory
+from review_values import REVIEW_NUMBER
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Orphan and gap s_ids kept per issue
+INTEGRITY_SAMPLE_SIZE = 10
+
 class ICLRDataValidator:
     def __init__(self, spark_session):
         self.spark = spark_session
@@ -162,6 +171,12 @@ class ICLRDataValidator:
             "issues": []
         }
         
+        # Profiled exports (analytics-lite) leave metareviews out
+        if "metareviews" not in papers_df.columns:
+            logger.info("No metareviews in this export, skipping metareview validation")
+            self.validation_results["metareview_metrics"] = metareview_metrics
+            return metareview_metrics
+        
         # Count papers with metareviews
         papers_with_reviews = papers_df.filter(
             col("metareviews").isNotNull() & 
@@ -177,19 +192,24 @@ class ICLRDataValidator:
                 col("_id").alias("paper_id"),
                 explode(col("metareviews")).alias("review")
             )
+            # Ratings are strings like "6: marginally above the acceptance threshold"
+            reviews_df = reviews_df.withColumn(
+                "rating",
+                regexp_extract(col("review.values.rating"), REVIEW_NUMBER, 1).cast("double")
+            )
             
             # Count total reviews
             metareview_metrics["total_metareviews"] = reviews_df.count()
             
             # Calculate average rating
-            avg_rating = reviews_df.agg({"review.rating": "avg"}).collect()[0]["avg(review.rating)"]
+            avg_rating = reviews_df.agg({"rating": "avg"}).collect()[0]["avg(rating)"]
             metareview_metrics["average_rating"] = avg_rating if avg_rating else 0.0
             
             # Check for invalid ratings
             invalid_ratings = reviews_df.filter(
-                (col("review.rating").isNull()) |
-                (col("review.rating") < 0) |
-                (col("review.rating") > 10)
+                (col("rating").isNull()) |
+                (col("rating") < 0) |
+                (col("rating") > 10)
             ).count()
             
             if invalid_ratings > 0:
@@ -239,6 +259,211 @@ class ICLRDataValidator:
         
         return year_metrics
     
+    def validate_manifest_consistency(self, papers_df, manifest):
+        """Cross-check loaded papers against the counts the exporter aggregated at export time"""
+        logger.info("Starting manifest consistency validation...")
+        
+        summary = manifest.get("collection_summary", {})
+        manifest_metrics = {
+            "manifest_total_papers": manifest.get("total_papers"),
+            "collection_total_papers": summary.get("total_papers"),
+            "loaded_papers": papers_df.count(),
+            "issues": []
+        }
+        
+        for source in ("manifest_total_papers", "collection_total_papers"):
+            expected = manifest_metrics[source]
+            if expected is not None and expected != manifest_metrics["loaded_papers"]:
+                manifest_metrics["issues"].append({
+                    "type": "count_mismatch",
+                    "source": source,
+                    "expected": expected,
+                    "actual": manifest_metrics["loaded_papers"],
+                    "severity": "high"
+                })
+        
+        # Per-year counts, compared as strings since the manifest keys are JSON strings; the
+        # exporter counts papers with a null or empty year under "unknown"
+        if summary.get("by_year") and "year" in papers_df.columns:
+            loaded_years = papers_df.selectExpr("coalesce(nullif(CAST(year AS STRING), ''), 'unknown') AS year")
+            loaded_by_year = {
+                row["year"]: row["count"] for row in loaded_years.groupBy("year").count().collect()
+            }
+            for year in sorted(set(summary["by_year"]) | set(loaded_by_year)):
+                expected = summary["by_year"].get(year, 0)
+                actual = loaded_by_year.get(year, 0)
+                if expected != actual:
+                    manifest_metrics["issues"].append({
+                        "type": "year_count_mismatch",
+                        "year": year,
+                        "expected": expected,
+                        "actual": actual,
+                        "severity": "high"
+                    })
+        
+        self.validation_results["manifest_metrics"] = manifest_metrics
+        logger.info(f"Manifest consistency validation completed. Issues: {len(manifest_metrics['issues'])}")
+        
+        return manifest_metrics
+    
+    def validate_referential_integrity(self, papers_df, predictions_df,
+                                       false_positive_rate=DEFAULT_FALSE_POSITIVE_RATE):
+        """Find orphan predictions and per prompt x rebuttal x year coverage gaps with Bloom filters"""
+        logger.info("Starting referential integrity validation...")
+        
+        year_expr = "CAST(year AS STRING) AS year" if "year" in papers_df.columns else "'unknown' AS year"
+        submissions = papers_df.selectExpr("CAST(s_id AS STRING) AS s_id", year_expr).filter(col("s_id").isNotNull())
+        predictions = predictions_df.selectExpr(
+            "CAST(prompt AS STRING) AS prompt", "CAST(rebuttal AS INT) AS rebuttal", "CAST(s_id AS STRING) AS s_id"
+        )
+        year_counts = {str(row["year"]): row["count"] for row in submissions.groupBy("year").count().collect()}
+        total_submissions = sum(year_counts.values())
+        
+        # Pass 1: one filter per year, built per partition and OR-merged on the executors
+        def year_filters(rows):
+            filters = {year: BloomFilter(n, false_positive_rate) for year, n in year_counts.items()}
+            for row in rows:
+                filters[str(row["year"])].add(row["s_id"])
+            yield filters
+        
+        def merge_filters(left, right):
+            for key, bloom in right.items():
+                if key in left:
+                    left[key].merge(bloom)
+                else:
+                    left[key] = bloom
+            return left
+        
+        submission_filters = self.spark.sparkContext.broadcast(
+            submissions.rdd.mapPartitions(year_filters).treeReduce(merge_filters) if year_counts else {}
+        )
+        
+        # Pass 2: stream predictions; tally them per key and year, and collect the s_ids each key covers
+        def prediction_tally(rows):
+            filters = submission_filters.value
+            tally = {"predictions": {}, "orphans": {}, "covered": {}}
+            for row in rows:
+                key = (row["prompt"], row["rebuttal"] if row["rebuttal"] is not None else -1)
+                year = next((year for year in sorted(filters) if row["s_id"] in filters[year]), None)
+                if year is None:
+                    hits, sample = tally["orphans"].get(key, (0, []))
+                    if len(sample) < INTEGRITY_SAMPLE_SIZE:
+                        sample.append(row["s_id"])
+                    tally["orphans"][key] = (hits + 1, sample)
+                    continue
+                tally["predictions"][(key, year)] = tally["predictions"].get((key, year), 0) + 1
+                if key not in tally["covered"]:
+                    tally["covered"][key] = BloomFilter(total_submissions, false_positive_rate)
+                tally["covered"][key].add(row["s_id"])
+            yield tally
+        
+        def merge_tallies(left, right):
+            for key, right_count in right["predictions"].items():
+                left["predictions"][key] = left["predictions"].get(key, 0) + right_count
+            for key, (right_count, sample) in right["orphans"].items():
+                left_count, left_sample = left["orphans"].get(key, (0, []))
+                left["orphans"][key] = (left_count + right_count, (left_sample + sample)[:INTEGRITY_SAMPLE_SIZE])
+            merge_filters(left["covered"], right["covered"])
+            return left
+        
+        tally = predictions.rdd.mapPartitions(prediction_tally).treeReduce(merge_tallies)
+        keys = sorted({key for key, _ in tally["predictions"]} | set(tally["orphans"]))
+        covered_filters = self.spark.sparkContext.broadcast(tally["covered"])
+        
+        # Pass 3: stream submissions back against each key's filter to count the gaps
+        def gap_tally(rows):
+            covered = covered_filters.value
+            gaps = {}
+            for row in rows:
+                for key in keys:
+                    if key in covered and row["s_id"] in covered[key]:
+                        continue
+                    hits, sample = gaps.get((key, str(row["year"])), (0, []))
+                    if len(sample) < INTEGRITY_SAMPLE_SIZE:
+                        sample.append(row["s_id"])
+                    gaps[(key, str(row["year"]))] = (hits + 1, sample)
+            yield gaps
+        
+        def merge_gaps(left, right):
+            for key, (right_count, sample) in right.items():
+                left_count, left_sample = left.get(key, (0, []))
+                left[key] = (left_count + right_count, (left_sample + sample)[:INTEGRITY_SAMPLE_SIZE])
+            return left
+        
+        gaps = submissions.rdd.mapPartitions(gap_tally).treeReduce(merge_gaps) if keys and year_counts else {}
+        
+        integrity_metrics = {
+            "method": "bloom",
+            "false_positive_rate": false_positive_rate,
+            "submissions_by_year": year_counts,
+            "prediction_rows": sum(tally["predictions"].values()) + sum(orphan_count for orphan_count, _ in tally["orphans"].values()),
+            "coverage": [],
+            "orphans": [],
+            "issues": []
+        }
+        
+        for (prompt, rebuttal), (orphan_count, sample) in sorted(tally["orphans"].items()):
+            integrity_metrics["orphans"].append({"prompt": prompt, "rebuttal": rebuttal, "count": orphan_count, "sample": sample})
+            integrity_metrics["issues"].append({
+                "type": "orphan_predictions",
+                "prompt": prompt,
+                "rebuttal": rebuttal,
+                "count": orphan_count,
+                "sample": sample,
+                "severity": "high"
+            })
+        
+        for key in keys:
+            for year in sorted(year_counts):
+                missing, sample = gaps.get((key, year), (0, []))
+                integrity_metrics["coverage"].append({
+                    "prompt": key[0],
+                    "rebuttal": key[1],
+                    "year": year,
+                    "submissions": year_counts[year],
+                    "predictions": tally["predictions"].get((key, year), 0),
+                    "covered": year_counts[year] - missing,
+                    "missing": missing,
+                    "coverage": round((year_counts[year] - missing) / year_counts[year], 4),
+                    "missing_sample": sample
+                })
+                if missing:
+                    integrity_metrics["issues"].append({
+                        "type": "coverage_gap",
+                        "prompt": key[0],
+                        "rebuttal": key[1],
+                        "year": year,
+                        "count": missing,
+                        "sample": sample,
+                        "severity": "medium"
+                    })
+        
+        self.validation_results["integrity_metrics"] = integrity_metrics
+        logger.info(f"Referential integrity validation completed. Orphan groups: {len(integrity_metrics['orphans'])}, "
+                    f"coverage gaps: {sum(1 for row in integrity_metrics['coverage'] if row['missing'])}")
+        
+        return integrity_metrics
+    
+    def validate_consistency(self, scan):
+        """Report the issues of a consistency_repair.py scan of MongoDB (the repair applies the same scan)"""
+        logger.info("Starting consistency validation...")
+        
+        metrics = scan.get("consistency_metrics", {})
+        consistency_metrics = {
+            "scan_timestamp": scan.get("timestamp"),
+            "database": scan.get("database"),
+            "checks": metrics.get("checks", []),
+            "documents_scanned": metrics.get("documents_scanned", {}),
+            "planned_operations": metrics.get("planned_operations", 0),
+            "issues": metrics.get("issues", [])
+        }
+        
+        self.validation_results["consistency_metrics"] = consistency_metrics
+        logger.info(f"Consistency validation completed. Issues: {len(consistency_metrics['issues'])}, "
+                    f"planned repair operations: {consistency_metrics['planned_operations']}")
+        
+        return consistency_metrics
+    
     def generate_validation_report(self):
         """Generate comprehensive validation report"""
         logger.info("Generating validation report...")
@@ -253,10 +478,9 @@ class ICLRDataValidator:
             "detailed_results": self.validation_results
         }
         
-        # Save report to S3
-        report_json = json.dumps(report, indent=2)
-        self.spark.sparkContext.parallelize([report_json]).saveAsTextFile(
-            "s3://your-bucket/validation-reports/iclr-validation-report.json"
+        # Append to the report history (one row per run, never overwritten)
+        ReportHistory(self.spark).append(
+            "validation", report, status=report["validation_summary"]["overall_status"]
         )
         
         logger.info(f"Validation report generated and saved to S3")
@@ -272,6 +496,21 @@ class ICLRDataValidator:
             if self.validation_results["quality_metrics"]["quality_score"] < 95:
                 return False
         
+        if "manifest_metrics" in self.validation_results:
+            # Loaded data must match what was in MongoDB at export time
+            if self.validation_results["manifest_metrics"]["issues"]:
+                return False
+        
+        if "integrity_metrics" in self.validation_results:
+            # Every prediction must point at an exported submission
+            if self.validation_results["integrity_metrics"]["orphans"]:
+                return False
+        
+        if "consistency_metrics" in self.validation_results:
+            # Duplicate s_ids break the unique index the API relies on
+            if any(issue.get("severity") == "high" for issue in self.validation_results["consistency_metrics"]["issues"]):
+                return False
+        
         return True
     
     def count_total_issues(self):
@@ -291,6 +530,15 @@ class ICLRDataValidator:
         if "year_metrics" in self.validation_results:
             total += len(self.validation_results["year_metrics"]["issues"])
         
+        if "manifest_metrics" in self.validation_results:
+            total += len(self.validation_results["manifest_metrics"]["issues"])
+        
+        if "integrity_metrics" in self.validation_results:
+            total += len(self.validation_results["integrity_metrics"]["issues"])
+        
+        if "consistency_metrics" in self.validation_results:
+            total += len(self.validation_results["consistency_metrics"]["issues"])
+        
         return total
     
     def count_critical_issues(self):
@@ -317,9 +565,15 @@ def main():
         .getOrCreate()
     
     try:
-        # Read papers data from MongoDB or exported JSON
-        # For this example, we'll assume data is exported to S3 as JSON
-        papers_df = spark.read.json("s3://your-bucket/iclr-data/papers/*.json")
+        # EXPORT_MANIFEST points at the exporter's manifest; it selects the export's chunks and
+        # carries the dictionaries of zstd-dict chunks
+        manifest_path = os.getenv('EXPORT_MANIFEST')
+        manifest = None
+        if manifest_path:
+            manifest = json.loads("\n".join(spark.sparkContext.textFile(manifest_path).collect()))
+        
+        # Read the exported paper chunks (any encoding) into one row per paper
+        papers_df = export_papers(spark, os.getenv('PAPERS_ROOT', "s3://your-bucket/iclr-data"), manifest)
         
         logger.info(f"Loaded {papers_df.count()} papers for validation")
         
@@ -332,6 +586,20 @@ def main():
         validator.validate_metareviews(papers_df)
         validator.validate_year_consistency(papers_df)
         
+        if manifest:
+            validator.validate_manifest_consistency(papers_df, manifest)
+        
+        # PREDICTIONS_PATH points at the result_*.jsonl prediction files to check against the papers
+        predictions_path = os.getenv('PREDICTIONS_PATH')
+        if predictions_path:
+            validator.validate_referential_integrity(papers_df, spark.read.json(predictions_path))
+        
+        # CONSISTENCY_SCAN points at the scan consistency_repair.py saved for the same database
+        scan_path = os.getenv('CONSISTENCY_SCAN')
+        if scan_path:
+            scan = json.loads("\n".join(spark.sparkContext.textFile(scan_path).collect()))
+            validator.validate_consistency(scan)
+        
         # Generate and save report
         report = validator.generate_validation_report()
         
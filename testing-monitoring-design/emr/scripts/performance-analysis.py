@@ -4,29 +4,225 @@ ICLR Performance Analysis Script
 Analyzes performance metrics for 20,000+ papers processing and database operations.
 """
 
+from pyspark import StorageLevel
 from pyspark.sql import SparkSession
 from pyspark.sql.functions import col, count, avg, min, max, stddev, expr
 from pyspark.sql.types import StructType, StructField, StringType, DoubleType, TimestampType
 import json
 import logging
+import os
 from datetime import datetime, timedelta
 import time
 
+from chunk_reader import export_papers
+from quantile_sketch import DistributionSketches, PAPER_METRICS, REVIEW_METRICS, sketch_papers
+from report_history import ReportHistory
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Abstract length categories the reports have always used (characters)
+ABSTRACT_LENGTH_BOUNDS = [100, 500, 1000]
+ABSTRACT_LENGTH_CATEGORIES = ["short", "medium", "long", "very_long"]
+
+# Derived DataFrames each analysis reads, used to plan what is worth persisting
+ANALYSIS_INPUTS = {
+    "query_performance": ["papers", "reviews"],
+    "data_distribution": ["papers"],
+    "index_efficiency": ["papers"],
+    "scalability_patterns": ["papers"]
+}
+
+class DataFrameReuseManager:
+    """
+    Persists derived DataFrames that a run reads more than once, and only those.
+
+    Each DataFrame is registered with the function that derives it from its parent.
+    plan() counts how often every DataFrame will be read, including reads made
+    while deriving children that are not persisted themselves. acquire() persists
+    and materializes a multiply-read DataFrame on its first read, timing that
+    separately from any query, and release() unpersists it after its last planned
+    read. Reads past the plan get a recomputed DataFrame that is not persisted.
+    """
+    
+    def __init__(self, spark_session):
+        self.spark = spark_session
+        self.frames = {}
+        self.planned = {}
+        self.held = {}
+        self.row_counts = {}
+    
+    def register(self, name, build, parent=None, storage_level=StorageLevel.MEMORY_AND_DISK):
+        """build() returns the root DataFrame, build(parent_df) a derived one"""
+        self.frames[name] = {
+            "build": build,
+            "parent": parent,
+            "storage_level": storage_level,
+            "planned_reads": 0,
+            "remaining_reads": 0,
+            "df": None,
+            "persisted": False,
+            "reads": 0,
+            "cache_hits": 0,
+            "materialize_ms": 0.0,
+            "unpersisted": False
+        }
+    
+    def plan(self, consumers):
+        """consumers maps each consumer to the frames it reads; frames read more than once are persisted"""
+        self.planned = {consumer: list(names) for consumer, names in consumers.items()}
+        for frame in self.frames.values():
+            frame["planned_reads"] = 0
+        for names in self.planned.values():
+            for name in names:
+                self.frames[name]["planned_reads"] += 1
+        
+        # Children before parents: a persisted child reads its parent once, an unpersisted one per read
+        for name in reversed(self.lineage_order()):
+            frame = self.frames[name]
+            if frame["parent"] and frame["planned_reads"]:
+                reads = 1 if frame["planned_reads"] > 1 else frame["planned_reads"]
+                self.frames[frame["parent"]]["planned_reads"] += reads
+        
+        for name, frame in self.frames.items():
+            frame["remaining_reads"] = frame["planned_reads"]
+        logger.info(
+            "DataFrame reuse plan: " +
+            ", ".join(f"{name}={frame['planned_reads']} reads" for name, frame in self.frames.items())
+        )
+    
+    def lineage_order(self):
+        """Frame names with every parent before its children"""
+        order = []
+        
+        def visit(name):
+            if name in order:
+                return
+            parent = self.frames[name]["parent"]
+            if parent:
+                visit(parent)
+            order.append(name)
+        
+        for name in self.frames:
+            visit(name)
+        return order
+    
+    def acquire(self, name, consumer):
+        """DataFrame for one read by consumer; call release(consumer) once the consumer is done"""
+        frame = self.frames[name]
+        frame["reads"] += 1
+        self.held.setdefault(consumer, []).append(name)
+        
+        if frame["df"] is not None:
+            if frame["persisted"]:
+                frame["cache_hits"] += 1
+            return frame["df"]
+        
+        if frame["parent"]:
+            df = frame["build"](self.acquire(frame["parent"], consumer))
+        else:
+            df = frame["build"]()
+        
+        # Reads past the last planned release recompute instead of caching again,
+        # since nothing would unpersist the new cache
+        if frame["planned_reads"] > 1 and frame["remaining_reads"] > 0:
+            # Materialize now so the first consumer's timings do not include the cache fill
+            start_time = time.time()
+            df.persist(frame["storage_level"])
+            self.row_counts[name] = df.count()
+            frame["materialize_ms"] = (time.time() - start_time) * 1000
+            frame["persisted"] = True
+            frame["unpersisted"] = False
+            frame["df"] = df
+            # The parent was only needed to fill this cache
+            if frame["parent"]:
+                self.release_one(frame["parent"])
+                self.held[consumer].remove(frame["parent"])
+        return df
+    
+    def read_count(self, name, consumer):
+        """Row count of a frame, counted once per run"""
+        if name not in self.row_counts:
+            df = self.acquire(name, consumer)
+            # Materializing a persisted frame already counted it
+            if name not in self.row_counts:
+                self.row_counts[name] = df.count()
+        return self.row_counts[name]
+    
+    def release_one(self, name):
+        frame = self.frames[name]
+        frame["remaining_reads"] -= 1
+        if frame["persisted"] and frame["remaining_reads"] <= 0 and not frame["unpersisted"]:
+            frame["df"].unpersist()
+            frame["df"] = None
+            frame["unpersisted"] = True
+            logger.info(f"Unpersisted {name} after its last planned read")
+    
+    def release(self, consumer):
+        """Release every read consumer has made (reads outside the plan never unpersist anything)"""
+        held = self.held.pop(consumer, [])
+        if consumer in self.planned:
+            for name in held:
+                self.release_one(name)
+    
+    def report(self):
+        return {
+            name: {
+                "planned_reads": frame["planned_reads"],
+                "reads": frame["reads"],
+                "persisted": frame["persisted"],
+                "storage_level": str(frame["storage_level"]) if frame["persisted"] else None,
+                "cache_hits": frame["cache_hits"],
+                "materialize_ms": frame["materialize_ms"],
+                "unpersisted": frame["unpersisted"]
+            }
+            for name, frame in self.frames.items()
+        }
+
 class ICLRPerformanceAnalyzer:
     def __init__(self, spark_session):
         self.spark = spark_session
         self.performance_results = {}
+        self.distribution_sketches = None
+        self.reuse = None
+        self.reuse_root = None
+    
+    def dataframes(self, papers_df):
+        """Reuse manager for papers_df and the DataFrames derived from it"""
+        if self.reuse is None or self.reuse_root is not papers_df:
+            reuse = DataFrameReuseManager(self.spark)
+            reuse.register("papers", lambda: papers_df)
+            # A cheap filter over cached papers: recomputing beats spilling it to disk
+            reuse.register(
+                "papers_with_reviews",
+                lambda df: df.filter(col("metareviews").isNotNull() & (expr("size(metareviews)") > 0)),
+                parent="papers",
+                storage_level=StorageLevel.MEMORY_ONLY
+            )
+            reuse.register("reviews", lambda df: df.select(expr("explode(metareviews) as review")), parent="papers_with_reviews")
+            self.reuse, self.reuse_root = reuse, papers_df
+        return self.reuse
+    
+    def plan_reuse(self, papers_df, analyses):
+        """Plan which DataFrames to persist for the analyses this run will call"""
+        # Without metareviews (analytics-lite exports) nothing reads the reviews frame
+        has_reviews = "metareviews" in papers_df.columns
+        self.dataframes(papers_df).plan({
+            analysis: [name for name in ANALYSIS_INPUTS[analysis] if has_reviews or name != "reviews"]
+            for analysis in analyses
+        })
         
     def analyze_query_performance(self, papers_df):
         """Analyze performance of common queries"""
         logger.info("Starting query performance analysis...")
         
+        # Frames are acquired (and cached if reused) before any timer starts
+        frames = self.dataframes(papers_df)
+        papers_df = frames.acquire("papers", "query_performance")
+        
         query_metrics = {
-            "total_papers": papers_df.count(),
+            "total_papers": frames.read_count("papers", "query_performance"),
             "queries": {}
         }
         
@@ -78,103 +274,98 @@ class ICLRPerformanceAnalyzer:
             "performance_rating": "excellent" if group_time < 2 else "good" if group_time < 10 else "poor"
         }
         
-        # Test 5: Complex aggregation with metareviews
-        start_time = time.time()
-        papers_with_reviews = papers_df.filter(
-            col("metareviews").isNotNull() & 
-            (expr("size(metareviews)") > 0)
-        )
-        
-        avg_rating = papers_with_reviews.select(
-            expr("explode(metareviews) as review")
-        ).select(
-            avg("review.rating").alias("avg_rating")
-        ).collect()[0]["avg_rating"]
-        
-        complex_time = time.time() - start_time
-        
-        query_metrics["queries"]["complex_aggregation"] = {
-            "operation": "Complex aggregation (avg rating)",
-            "execution_time_ms": complex_time * 1000,
-            "result_count": 1,
-            "avg_rating": avg_rating,
-            "performance_rating": "excellent" if complex_time < 5 else "good" if complex_time < 20 else "poor"
-        }
+        # Test 5: Complex aggregation with metareviews (not in analytics-lite exports)
+        if "metareviews" in papers_df.columns:
+            reviews_df = frames.acquire("reviews", "query_performance")
+            start_time = time.time()
+            avg_rating = reviews_df.select(
+                avg("review.rating").alias("avg_rating")
+            ).collect()[0]["avg_rating"]
+            
+            complex_time = time.time() - start_time
+            
+            query_metrics["queries"]["complex_aggregation"] = {
+                "operation": "Complex aggregation (avg rating)",
+                "execution_time_ms": complex_time * 1000,
+                "result_count": 1,
+                "avg_rating": avg_rating,
+                "performance_rating": "excellent" if complex_time < 5 else "good" if complex_time < 20 else "poor"
+            }
         
+        frames.release("query_performance")
         self.performance_results["query_performance"] = query_metrics
         logger.info(f"Query performance analysis completed")
         
         return query_metrics
     
-    def analyze_data_distribution(self, papers_df):
-        """Analyze data distribution and patterns"""
+    def analyze_data_distribution(self, papers_df, previous_sketches=None):
+        """Analyze data distribution and patterns from one pass of quantile sketches"""
         logger.info("Starting data distribution analysis...")
         
+        frames = self.dataframes(papers_df)
+        papers_df = frames.acquire("papers", "data_distribution")
+        
+        # One scan builds every sketch per year and decision; everything below reads them
+        start_time = time.time()
+        sketches = sketch_papers(papers_df)
+        sketch_time = time.time() - start_time
+        frames.release("data_distribution")
+        if previous_sketches:
+            # Sketches of other exports (e.g. earlier years) merge into the same distributions
+            sketches.merge(previous_sketches)
+        self.distribution_sketches = sketches
+        
+        # Every paper adds exactly one abstract length, so its counts are paper counts
         distribution_metrics = {
-            "total_papers": papers_df.count(),
-            "distributions": {}
+            "total_papers": sketches.select("abstract_length").n,
+            "sketch_time_ms": sketch_time * 1000,
+            "distributions": {
+                "year": sketches.counts_by("abstract_length", "year"),
+                "decision": sketches.counts_by("abstract_length", "decision"),
+                "authors_per_paper": sketches.select("authors_per_paper").value_counts(),
+                "abstract_length": dict(zip(
+                    ABSTRACT_LENGTH_CATEGORIES,
+                    sketches.select("abstract_length").histogram(ABSTRACT_LENGTH_BOUNDS)
+                )),
+                "reviews_per_paper": {
+                    value_count: papers
+                    for value_count, papers in sketches.select("reviews_per_paper").value_counts().items()
+                    if value_count > 0
+                }
+            },
+            "percentiles": {}
         }
         
-        # Year distribution
-        if "year" in papers_df.columns:
-            year_dist = papers_df.groupBy("year").count().collect()
-            distribution_metrics["distributions"]["year"] = {
-                row["year"]: row["count"] for row in year_dist
+        for metric in REVIEW_METRICS + PAPER_METRICS:
+            distribution_metrics["percentiles"][metric] = {
+                "overall": sketches.percentiles(metric),
+                "by_year": {year: sketches.percentiles(metric, year=year) for year in sketches.groups("year")},
+                "by_decision": {
+                    decision: sketches.percentiles(metric, decision=decision)
+                    for decision in sketches.groups("decision")
+                }
             }
         
-        # Decision distribution
-        decision_dist = papers_df.groupBy("decision").count().collect()
-        distribution_metrics["distributions"]["decision"] = {
-            row["decision"]: row["count"] for row in decision_dist
-        }
-        
-        # Authors count distribution
-        authors_count_dist = papers_df.select(
-            expr("size(authors) as author_count")
-        ).groupBy("author_count").count().orderBy("author_count").collect()
-        
-        distribution_metrics["distributions"]["authors_per_paper"] = {
-            row["author_count"]: row["count"] for row in authors_count_dist
-        }
-        
-        # Abstract length distribution
-        abstract_length_dist = papers_df.select(
-            expr("length(abstract) as abstract_length")
-        ).groupBy(
-            expr("CASE " +
-                 "WHEN abstract_length < 100 THEN 'short' " +
-                 "WHEN abstract_length < 500 THEN 'medium' " +
-                 "WHEN abstract_length < 1000 THEN 'long' " +
-                 "ELSE 'very_long' END as length_category")
-        ).count().collect()
-        
-        distribution_metrics["distributions"]["abstract_length"] = {
-            row["length_category"]: row["count"] for row in abstract_length_dist
-        }
-        
-        # Metareview distribution
-        papers_with_reviews = papers_df.filter(
-            col("metareviews").isNotNull() & 
-            (expr("size(metareviews)") > 0)
-        )
-        
-        review_count_dist = papers_with_reviews.select(
-            expr("size(metareviews) as review_count")
-        ).groupBy("review_count").count().orderBy("review_count").collect()
-        
-        distribution_metrics["distributions"]["reviews_per_paper"] = {
-            row["review_count"]: row["count"] for row in review_count_dist
-        }
-        
         self.performance_results["data_distribution"] = distribution_metrics
-        logger.info(f"Data distribution analysis completed")
+        logger.info(f"Data distribution analysis completed ({len(sketches.sketches)} sketches)")
         
         return distribution_metrics
     
+    def save_distribution_sketches(self, path):
+        """Store the sketches so later runs can merge them instead of rescanning"""
+        self.spark.sparkContext.parallelize([self.distribution_sketches.to_json()], 1).saveAsTextFile(path)
+        logger.info(f"Distribution sketches saved to {path}")
+    
+    def load_distribution_sketches(self, path):
+        return DistributionSketches.from_json("".join(self.spark.sparkContext.textFile(path).collect()))
+    
     def analyze_index_efficiency(self, papers_df):
         """Analyze index efficiency and optimization opportunities"""
         logger.info("Starting index efficiency analysis...")
         
+        frames = self.dataframes(papers_df)
+        papers_df = frames.acquire("papers", "index_efficiency")
+        
         index_metrics = {
             "recommendations": [],
             "performance_issues": []
@@ -227,6 +418,7 @@ class ICLRPerformanceAnalyzer:
                 "priority": "high" if agg_time > 10 else "medium"
             })
         
+        frames.release("index_efficiency")
         self.performance_results["index_efficiency"] = index_metrics
         logger.info(f"Index efficiency analysis completed")
         
@@ -293,6 +485,10 @@ class ICLRPerformanceAnalyzer:
         """Analyze scalability patterns and bottlenecks"""
         logger.info("Starting scalability analysis...")
         
+        frames = self.dataframes(papers_df)
+        papers_df = frames.acquire("papers", "scalability_patterns")
+        current_size = frames.read_count("papers", "scalability_patterns")
+        
         scalability_metrics = {
             "bottlenecks": [],
             "scalability_limits": {},
@@ -304,7 +500,7 @@ class ICLRPerformanceAnalyzer:
         performance_by_size = {}
         
         for size in sample_sizes:
-            if papers_df.count() >= size:
+            if current_size >= size:
                 sample_df = papers_df.limit(size)
                 
                 # Test count operation
@@ -346,7 +542,6 @@ class ICLRPerformanceAnalyzer:
                 })
         
         # Estimate scalability limits
-        current_size = papers_df.count()
         if current_size > 15000:
             scalability_metrics["scalability_limits"] = {
                 "current_size": current_size,
@@ -359,6 +554,7 @@ class ICLRPerformanceAnalyzer:
                 ]
             }
         
+        frames.release("scalability_patterns")
         self.performance_results["scalability_patterns"] = scalability_metrics
         logger.info(f"Scalability analysis completed")
         
@@ -377,11 +573,17 @@ class ICLRPerformanceAnalyzer:
             },
             "detailed_results": self.performance_results
         }
+        if self.reuse:
+            # Kept apart from detailed_results so cache fills never blur the query timings
+            report["dataframe_reuse"] = self.reuse.report()
+        
+        # Append to the report history (one row per run, never overwritten)
+        history = ReportHistory(self.spark)
+        history.append("performance", report)
         
-        # Save report to S3
-        report_json = json.dumps(report, indent=2)
-        self.spark.sparkContext.parallelize([report_json]).saveAsTextFile(
-            "s3://your-bucket/performance-reports/iclr-performance-report.json"
+        # Trend of the slowest benchmarked query, read from the history rather than old reports
+        report["performance_summary"]["title_search_p95_ms_last_90_runs"] = history.metric_percentile(
+            "performance", "query_performance.queries.title_search.execution_time_ms", 95, last_runs=90
         )
         
         logger.info(f"Performance report generated and saved to S3")
@@ -448,17 +650,30 @@ def main():
         .getOrCreate()
     
     try:
-        # Read papers data
-        papers_df = spark.read.json("s3://your-bucket/iclr-data/papers/*.json")
-        
-        logger.info(f"Loaded {papers_df.count()} papers for performance analysis")
-        
-        # Initialize analyzer
+        # Read the exported paper chunks (any encoding) into one row per paper; EXPORT_MANIFEST
+        # selects one export and carries the dictionaries of zstd-dict chunks
+        manifest = None
+        if os.getenv('EXPORT_MANIFEST'):
+            manifest = json.loads("\n".join(spark.sparkContext.textFile(os.getenv('EXPORT_MANIFEST')).collect()))
+        papers_df = export_papers(spark, os.getenv('PAPERS_ROOT', "s3://your-bucket/iclr-data"), manifest)
+        
+        # Initialize analyzer; planning first lets the load count fill the papers cache
         analyzer = ICLRPerformanceAnalyzer(spark)
+        analyzer.plan_reuse(papers_df, list(ANALYSIS_INPUTS))
+        frames = analyzer.dataframes(papers_df)
+        logger.info(f"Loaded {frames.read_count('papers', 'load')} papers for performance analysis")
+        frames.release("load")
         
         # Run all analyses
         analyzer.analyze_query_performance(papers_df)
-        analyzer.analyze_data_distribution(papers_df)
+        # MERGE_SKETCHES points at sketches saved by an earlier run over other exports
+        previous_sketches = None
+        if os.getenv('MERGE_SKETCHES'):
+            previous_sketches = analyzer.load_distribution_sketches(os.getenv('MERGE_SKETCHES'))
+        analyzer.analyze_data_distribution(papers_df, previous_sketches)
+        analyzer.save_distribution_sketches(
+            f"s3://your-bucket/performance-reports/distribution-sketches/{datetime.now().strftime('%Y%m%d_%H%M%S')}/"
+        )
         analyzer.analyze_index_efficiency(papers_df)
         analyzer.analyze_resource_utilization()
         analyzer.analyze_scalability_patterns(papers_df)
@@ -470,6 +685,7 @@ def main():
         logger.info(f"Performance analysis completed. Overall score: {report['performance_summary']['overall_performance']}")
         logger.info(f"Critical issues: {report['performance_summary']['critical_issues']}")
         logger.info(f"Optimization opportunities: {report['performance_summary']['optimization_opportunities']}")
+        logger.info(f"DataFrame reuse: {report.get('dataframe_reuse')}")
         
         # Exit with appropriate code
         if report['performance_summary']['overall_performance'] >= 80:
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Prompt metadata of the prediction result files
+The prompts file (iclr-node-server-app/data/prompts.json) maps the prompt id of
+the result_*.jsonl files to its text, and optionally to its prompt_type or its
+number in importPredictionStats.js PROMPT_CANDIDATES (stats_prompt). The bulk
+loader, the prompt stats and the EMR prediction analysis all read it through
+prompt_entries, so a prompt gets the same prompt_type everywhere.
+
+Ship with the Spark jobs that import it:
+    spark-submit --py-files s3://your-bucket/scripts/prompt_metadata.py emr-process-20000-papers.py
+"""
+
+# prompt_type of the PROMPT_CANDIDATES numbers: initial prompts, APO on rebut 0, APO on rebut 1
+STATS_PROMPT_TYPES = [(range(1, 4), -1), (range(4, 8), 0), (range(8, 13), 1)]
+
+
+def stats_prompt_type(number):
+    """prompt_type of a PROMPT_CANDIDATES number (1-based), None outside the known prompts"""
+    for numbers, prompt_type in STATS_PROMPT_TYPES:
+        if int(number) in numbers:
+            return prompt_type
+    return None
+
+
+def prompt_entries(prompts):
+    """
+    Normalise a parsed prompts file.
+
+    Args:
+        prompts: JSON object keyed by the prompt id of the result files; values are the
+            prompt text or {"prompt": text, "prompt_type": n, "stats_prompt": n}
+
+    Returns:
+        Mapping of prompt id to {"prompt", "prompt_type"[, "stats_prompt"]}; a missing
+        prompt_type comes from stats_prompt, else 0
+    """
+    entries = {}
+    for key, value in prompts.items():
+        entry = dict(value) if isinstance(value, dict) else {'prompt': value}
+        if 'prompt_type' not in entry:
+            known_type = stats_prompt_type(entry['stats_prompt']) if 'stats_prompt' in entry else None
+            entry['prompt_type'] = 0 if known_type is None else known_type
+        entries[str(key)] = entry
+    return entries
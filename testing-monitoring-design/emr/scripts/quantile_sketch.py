@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Mergeable KLL quantile sketches for ICLR paper distributions
+Builds rating, confidence, soundness, abstract-length, reviews-per-paper and
+authors-per-paper sketches per year and decision in a single pass over the papers.
+Sketches from different partitions or runs merge into one, and every percentile or
+histogram is answered from the sketches without rescanning the data.
+
+Ship with the Spark jobs that import it:
+    spark-submit --py-files s3://your-bucket/scripts/quantile_sketch.py,s3://your-bucket/scripts/review_values.py performance-analysis.py
+"""
+
+import json
+import math
+import random
+
+from review_values import review_value
+
+# Per-review metrics parsed from metareviews.values
+REVIEW_METRICS = ["rating", "confidence", "soundness"]
+
+# Per-paper metrics
+PAPER_METRICS = ["abstract_length", "reviews_per_paper", "authors_per_paper"]
+
+# Accuracy parameter: rank error is roughly 1.7 / k (about 1% at 200)
+DEFAULT_K = 200
+
+class KLLSketch:
+    """
+    KLL quantile sketch (Karnin, Lang, Liberty 2016).
+
+    Level h holds items of weight 2**h. When the sketch is full the lowest
+    overfull level is sorted and every other item is promoted one level up, so
+    memory stays O(k) while ranks stay within about 1.7 / k of the truth.
+    Streams shorter than k are kept exactly.
+    """
+
+    def __init__(self, k=DEFAULT_K, c=2 / 3, seed=None):
+        self.k = k
+        self.c = c
+        self.n = 0
+        self.min = None
+        self.max = None
+        self.levels = [[]]
+        self.random = random.Random(seed)
+
+    def capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * self.c ** depth)))
+
+    def size(self):
+        return sum(len(items) for items in self.levels)
+
+    def max_size(self):
+        return sum(self.capacity(level) for level in range(len(self.levels)))
+
+    def update(self, value):
+        value = float(value)
+        self.levels[0].append(value)
+        self.n += 1
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if self.size() >= self.max_size():
+            self.compress()
+
+    def compress(self):
+        """Compact the lowest overfull levels until the sketch fits again"""
+        while self.size() >= self.max_size():
+            for level, items in enumerate(self.levels):
+                if len(items) >= self.capacity(level):
+                    if level + 1 == len(self.levels):
+                        self.levels.append([])
+                    items.sort()
+                    # An odd item out stays behind so no weight is lost
+                    keep = [items.pop()] if len(items) % 2 else []
+                    offset = self.random.randint(0, 1)
+                    self.levels[level + 1].extend(items[offset::2])
+                    self.levels[level] = keep
+                    break
+
+    def merge(self, other):
+        """Fold another sketch into this one (same k); returns self"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self.n += other.n
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        self.compress()
+        return self
+
+    def weighted_items(self):
+        return sorted((value, 1 << level) for level, values in enumerate(self.levels) for value in values)
+
+    def quantile(self, q):
+        """Approximate value at quantile q in [0, 1]"""
+        if not self.n:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        items = self.weighted_items()
+        total = sum(weight for _, weight in items)
+        target = q * total
+        cumulative = 0
+        for value, weight in items:
+            cumulative += weight
+            if cumulative >= target:
+                return value
+        return self.max
+
+    def rank(self, value, items=None):
+        """Approximate number of values strictly below value"""
+        if not self.n:
+            return 0
+        items = items if items is not None else self.weighted_items()
+        total = sum(weight for _, weight in items)
+        below = sum(weight for item, weight in items if item < value)
+        return int(round(below * self.n / total))
+
+    def histogram(self, bounds):
+        """Approximate counts in (-inf, b0), [b0, b1), ..., [b_last, inf)"""
+        items = self.weighted_items()
+        ranks = [0] + [self.rank(bound, items) for bound in bounds] + [self.n]
+        return [ranks[i + 1] - ranks[i] for i in range(len(ranks) - 1)]
+
+    def value_counts(self):
+        """Approximate count of each integer value from min to max (for small integer metrics)"""
+        if not self.n:
+            return {}
+        values = range(int(math.floor(self.min)), int(math.floor(self.max)) + 1)
+        # Bins [v, v + 1) for every value; the first and last bins are open-ended
+        counts = self.histogram(list(values[1:]))
+        return {value: count for value, count in zip(values, counts) if count}
+
+    def mean(self):
+        """Weighted mean of the retained items"""
+        items = self.weighted_items()
+        total = sum(weight for _, weight in items)
+        return sum(value * weight for value, weight in items) / total if total else None
+
+    def to_dict(self):
+        return {"k": self.k, "n": self.n, "min": self.min, "max": self.max, "levels": self.levels}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(k=data["k"])
+        sketch.n = data["n"]
+        sketch.min = data["min"]
+        sketch.max = data["max"]
+        sketch.levels = [list(items) for items in data["levels"]] or [[]]
+        return sketch
+
+
+class DistributionSketches:
+    """One KLL sketch per (metric, year, decision), with roll-ups over years or decisions"""
+
+    def __init__(self, k=DEFAULT_K):
+        self.k = k
+        self.sketches = {}
+
+    def add(self, metric, year, decision, value):
+        if value is None:
+            return
+        key = (metric, str(year), str(decision))
+        if key not in self.sketches:
+            self.sketches[key] = KLLSketch(k=self.k)
+        self.sketches[key].update(value)
+
+    def add_paper(self, paper):
+        """Add every metric of one paper (a dict shaped like the exported documents)"""
+        year = paper.get("year") or "unknown"
+        decision = paper.get("decision") or "unknown"
+        reviews = paper.get("metareviews") or []
+
+        self.add("abstract_length", year, decision, len(paper.get("abstract") or ""))
+        self.add("reviews_per_paper", year, decision, len(reviews))
+        self.add("authors_per_paper", year, decision, len(paper.get("authors") or []))
+        for review in reviews:
+            values = review.get("values") or {}
+            for metric in REVIEW_METRICS:
+                self.add(metric, year, decision, review_value(values.get(metric)))
+
+    def merge(self, other):
+        for key, sketch in other.sketches.items():
+            if key in self.sketches:
+                self.sketches[key].merge(sketch)
+            else:
+                self.sketches[key] = KLLSketch.from_dict(sketch.to_dict())
+        return self
+
+    def select(self, metric, year=None, decision=None):
+        """Merged sketch of a metric, optionally restricted to one year and/or decision"""
+        merged = KLLSketch(k=self.k)
+        for (key_metric, key_year, key_decision), sketch in self.sketches.items():
+            if key_metric != metric:
+                continue
+            if year is not None and key_year != str(year):
+                continue
+            if decision is not None and key_decision != str(decision):
+                continue
+            merged.merge(sketch)
+        return merged
+
+    def groups(self, field):
+        """Years (field="year") or decisions (field="decision") seen in the sketches"""
+        position = 1 if field == "year" else 2
+        return sorted({key[position] for key in self.sketches})
+
+    def counts_by(self, metric, field):
+        """Exact number of values of a metric per year or per decision"""
+        return {group: self.select(metric, **{field: group}).n for group in self.groups(field)}
+
+    def percentiles(self, metric, percentiles=(5, 25, 50, 75, 95), **group):
+        sketch = self.select(metric, **group)
+        summary = {"count": sketch.n, "min": sketch.min, "max": sketch.max}
+        if sketch.n:
+            summary["mean"] = round(sketch.mean(), 4)
+            summary.update({f"p{p}": sketch.quantile(p / 100) for p in percentiles})
+        return summary
+
+    def to_dict(self):
+        return {
+            "k": self.k,
+            "sketches": [
+                {"metric": metric, "year": year, "decision": decision, "sketch": sketch.to_dict()}
+                for (metric, year, decision), sketch in sorted(self.sketches.items())
+            ]
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketches = cls(k=data["k"])
+        for entry in data["sketches"]:
+            key = (entry["metric"], entry["year"], entry["decision"])
+            sketches.sketches[key] = KLLSketch.from_dict(entry["sketch"])
+        return sketches
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_dict(json.loads(text))
+
+
+def sketch_papers(papers_df, k=DEFAULT_K):
+    """
+    Build DistributionSketches from a flattened papers DataFrame in one pass.
+
+    Only the columns the sketches need are projected; each partition builds its own
+    sketches and they are merged with a tree reduce on the executors.
+    """
+    columns = set(papers_df.columns)
+    # Profiled exports may leave out abstracts, metareviews or some review values
+    value_fields = set()
+    if "metareviews" in columns:
+        review_type = papers_df.schema["metareviews"].dataType.elementType
+        if hasattr(review_type, "fieldNames") and "values" in review_type.fieldNames() \
+                and hasattr(review_type["values"].dataType, "fieldNames"):
+            value_fields = set(review_type["values"].dataType.fieldNames())
+    review_fields = ", ".join(
+        f"'{metric}', r.values.{metric}" if metric in value_fields else f"'{metric}', CAST(NULL AS STRING)"
+        for metric in REVIEW_METRICS
+    )
+    projected = papers_df.selectExpr(
+        "year" if "year" in columns else "NULL AS year",
+        "decision",
+        "length(abstract) AS abstract_length" if "abstract" in columns else "CAST(NULL AS INT) AS abstract_length",
+        "size(authors) AS authors_per_paper",
+        f"transform(metareviews, r -> named_struct({review_fields})) AS reviews"
+        if "metareviews" in columns else "CAST(NULL AS ARRAY<STRING>) AS reviews"
+    )
+
+    def partition_sketches(rows):
+        sketches = DistributionSketches(k=k)
+        for row in rows:
+            year = row["year"] if row["year"] is not None else "unknown"
+            decision = row["decision"] or "unknown"
+            reviews = row["reviews"] or []
+            # Every paper is counted here (as 0 without an abstract); reports count papers by it
+            sketches.add("abstract_length", year, decision, row["abstract_length"] or 0)
+            sketches.add("reviews_per_paper", year, decision, len(reviews))
+            sketches.add("authors_per_paper", year, decision, max(row["authors_per_paper"] or 0, 0))
+            for review in reviews:
+                for metric in REVIEW_METRICS:
+                    sketches.add(metric, year, decision, review_value(review[metric]))
+        yield sketches.to_json()
+
+    def merge_json(left, right):
+        return DistributionSketches.from_json(left).merge(DistributionSketches.from_json(right)).to_json()
+
+    merged = projected.rdd.mapPartitions(partition_sketches).treeReduce(merge_json)
+    return DistributionSketches.from_json(merged)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Append-only history of validation and performance reports
+Every run appends one row to a zstd Parquet dataset partitioned by report type and
+run date. The row holds the run timestamp, the export manifest, the code version,
+every numeric leaf of the report in a metrics map, and the full report as compressed
+JSON. Trend queries only read the metrics column of the partitions they need, and
+the same files back an Athena table for the Grafana report-trend panels.
+
+Layout:
+    <root>/report_type=<type>/run_date=<YYYY-MM-DD>/part-*.zstd.parquet
+
+Ship with the Spark jobs that import it:
+    spark-submit --py-files s3://your-bucket/scripts/report_history.py data-validation.py
+"""
+
+import json
+import logging
+import math
+import os
+import subprocess
+import zlib
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_ROOT = "s3://your-bucket/report-history"
+
+# Prefix dropped from metric names so they read like the report sections
+DETAIL_PREFIX = "detailed_results."
+
+ATHENA_TABLE = "iclr_report_history"
+
+
+def code_version():
+    """CODE_VERSION from the deployment, else the git commit, else "unknown" """
+    if os.getenv('CODE_VERSION'):
+        return os.getenv('CODE_VERSION')
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def flatten_metrics(report, prefix=""):
+    """Numeric leaves of a report as {"quality_metrics.quality_score": 97.5, ...}"""
+    metrics = {}
+    for key, value in report.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            metrics.update(flatten_metrics(value, f"{name}."))
+        elif isinstance(value, bool):
+            metrics[name] = float(value)
+        elif isinstance(value, (int, float)):
+            metrics[name] = float(value)
+    return {
+        name[len(DETAIL_PREFIX):] if name.startswith(DETAIL_PREFIX) else name: value
+        for name, value in metrics.items()
+    }
+
+
+def history_schema():
+    from pyspark.sql.types import (StructType, StructField, StringType, TimestampType, MapType,
+                                   DoubleType, BinaryType)
+    return StructType([
+        StructField("run_timestamp", TimestampType(), False),
+        StructField("export_manifest", StringType(), True),
+        StructField("code_version", StringType(), True),
+        StructField("status", StringType(), True),
+        StructField("metrics", MapType(StringType(), DoubleType()), False),
+        StructField("report_json_zlib", BinaryType(), False),
+        StructField("report_type", StringType(), False),
+        StructField("run_date", StringType(), False)
+    ])
+
+
+class ReportHistory:
+    """Append runs and answer trend queries over the report history"""
+
+    def __init__(self, spark_session, root=None):
+        self.spark = spark_session
+        self.root = (root or os.getenv('REPORT_HISTORY_ROOT', DEFAULT_HISTORY_ROOT)).rstrip("/")
+
+    def append(self, report_type, report, export_manifest=None, status=None):
+        """Append one run's report as a single row (never overwrites earlier runs)"""
+        run_timestamp = datetime.fromisoformat(report["timestamp"]) if "timestamp" in report else datetime.now()
+        row = (
+            run_timestamp,
+            export_manifest or os.getenv('EXPORT_MANIFEST'),
+            code_version(),
+            status,
+            flatten_metrics({key: value for key, value in report.items() if key != "timestamp"}),
+            bytearray(zlib.compress(json.dumps(report, default=str).encode("utf-8"), 9)),
+            report_type,
+            run_timestamp.strftime("%Y-%m-%d")
+        )
+        self.spark.createDataFrame([row], history_schema()).coalesce(1).write \
+            .mode("append") \
+            .option("compression", "zstd") \
+            .partitionBy("report_type", "run_date") \
+            .parquet(self.root)
+        logger.info(f"Appended {report_type} report of {run_timestamp.isoformat()} to {self.root}")
+        return row
+
+    def runs(self, report_type, since_days=None):
+        """Runs of one report type (partition-pruned by type and, with since_days, by date)"""
+        from pyspark.sql.functions import col
+        runs_df = self.spark.read.parquet(self.root).filter(col("report_type") == report_type)
+        if since_days:
+            since = (datetime.now() - timedelta(days=since_days)).strftime("%Y-%m-%d")
+            runs_df = runs_df.filter(col("run_date") >= since)
+        return runs_df
+
+    def metric_series(self, report_type, metric, last_runs=None, since_days=None):
+        """[(run_timestamp, value)] of one metric, oldest first"""
+        from pyspark.sql.functions import col
+        series_df = self.runs(report_type, since_days) \
+            .select("run_timestamp", col("metrics")[metric].alias("value")) \
+            .filter(col("value").isNotNull())
+        if last_runs:
+            series_df = series_df.orderBy(col("run_timestamp").desc()).limit(last_runs)
+        return sorted((row["run_timestamp"], row["value"]) for row in series_df.collect())
+
+    def metric_percentile(self, report_type, metric, percentile, last_runs=90):
+        """e.g. p95 of query_performance.queries.title_search.execution_time_ms over the last 90 runs"""
+        values = sorted(value for _, value in self.metric_series(report_type, metric, last_runs=last_runs))
+        if not values:
+            return None
+        # Nearest-rank percentile; a few hundred runs never need a sketch
+        rank = max(0, min(len(values) - 1, math.ceil(percentile / 100 * len(values)) - 1))
+        return values[rank]
+
+    def metric_by_period(self, report_type, metric, period="week", agg="avg", since_days=None):
+        """[(period_start, value)] of a metric aggregated per day/week/month, e.g. quality_score by week"""
+        from pyspark.sql import functions as F
+        period_df = self.runs(report_type, since_days) \
+            .select(F.date_trunc(period, "run_timestamp").alias("period"), F.col("metrics")[metric].alias("value")) \
+            .filter(F.col("value").isNotNull()) \
+            .groupBy("period").agg(getattr(F, agg)("value").alias("value")) \
+            .orderBy("period")
+        return [(row["period"], row["value"]) for row in period_df.collect()]
+
+    def report(self, report_type, run_timestamp):
+        """Full report of one run, decompressed"""
+        from pyspark.sql.functions import col
+        rows = self.runs(report_type).filter(col("run_timestamp") == run_timestamp) \
+            .select("report_json_zlib").collect()
+        return json.loads(zlib.decompress(bytes(rows[0]["report_json_zlib"]))) if rows else None
+
+    def athena_ddl(self, table=ATHENA_TABLE):
+        """External table over the history for the Grafana Athena data source (partitions projected)"""
+        return f"""CREATE EXTERNAL TABLE IF NOT EXISTS {table} (
+  run_timestamp timestamp,
+  export_manifest string,
+  code_version string,
+  status string,
+  metrics map<string,double>,
+  report_json_zlib binary
+)
+PARTITIONED BY (report_type string, run_date string)
+STORED AS PARQUET
+LOCATION '{self.root}/'
+TBLPROPERTIES (
+  'projection.enabled'='true',
+  'projection.report_type.type'='enum',
+  'projection.report_type.values'='validation,performance',
+  'projection.run_date.type'='date',
+  'projection.run_date.format'='yyyy-MM-dd',
+  'projection.run_date.range'='2024-01-01,NOW',
+  'storage.location.template'='{self.root}/report_type=${{report_type}}/run_date=${{run_date}}/'
+)"""
+
+
+if __name__ == "__main__":
+    # Print the Athena table the Grafana report-history panels query
+    print(ReportHistory(None).athena_ddl())
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Numeric review values of ICLR metareviews
+Review fields hold strings like "6: marginally above the acceptance threshold".
+The Spark jobs, the quantile sketches and the local paper tools all read the
+leading number the way JavaScript parseFloat does, so the pattern is defined here
+once: REVIEW_NUMBER for Spark's regexp_extract and review_value in Python.
+
+Ship with the Spark jobs that import it:
+    spark-submit --py-files s3://your-bucket/scripts/review_values.py data-validation.py
+"""
+
+import re
+
+# Leading number of a review value, like JavaScript parseFloat ("6: marginally above" -> 6)
+REVIEW_NUMBER = r'^\s*([-+]?\d*\.?\d+)'
+LEADING_NUMBER = re.compile(REVIEW_NUMBER)
+
+
+def review_value(raw):
+    """Numeric part of a metareview value, or None"""
+    if isinstance(raw, (int, float)):
+        return float(raw)
+    match = LEADING_NUMBER.match(str(raw or ''))
+    return float(match.group(1)) if match else None
@@ -0,0 +1,783 @@
+#!/usr/bin/env python3
+"""
+ICLR API Traffic Replayer
+Open-loop asyncio load generator for the Node API. Sessions arrive as a Poisson
+process following the load-test.yml phases, each session replays one weighted
+scenario of the real endpoint mix with think times, and latencies are recorded
+per endpoint in HDR histograms. The report has the same structure as
+ICLRPerformanceAnalyzer.generate_performance_report.
+
+For local runs without the shared database, --mock-db starts a throwaway
+mongod, seeds it with fixture papers, predictions, stats and users, and starts
+the Node API against it; --seed-db seeds an existing MongoDB instead (see
+docker-compose.mock.yml).
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import shutil
+import socket
+import string
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+
+import aiohttp
+
+try:
+    from bson import ObjectId
+    from pymongo import MongoClient
+except ImportError:  # Only the mock/seed modes need pymongo
+    MongoClient = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# (name, duration seconds, arrival rate, ramp-to rate) as in load-test.yml
+DEFAULT_PHASES = [
+    ("Warm-up", 60, 5, None),
+    ("Ramp-up", 120, 5, 50),
+    ("Sustained load", 300, 50, None),
+    ("Peak load", 180, 50, 100),
+    ("Cool-down", 60, 100, 10),
+]
+
+# Response-time thresholds per endpoint (ms), from the load-test.yml expectations
+ENDPOINT_THRESHOLDS_MS = {
+    "GET /api/iclr/random": 300,
+    "GET /api/iclr/paginated": 500,
+    "GET /api/iclr/paginated?search": 2000,
+    "GET /api/iclr/title": 2000,
+    "GET /api/iclr/author": 1500,
+    "GET /api/iclr/ranked/rating": 1000,
+    "GET /api/iclr/year": 500,
+    "POST /api/prompt/prediction": 5000,
+    "POST /api/prompt/predictions_by_prompt_and_rebuttal": 5000,
+    "GET /api/predictionStats/all": 1000,
+    "GET /api/predictionStats/summary": 1000,
+    "POST /api/public/comments/like": 1000,
+    "POST /api/public/comments/comment": 1500,
+}
+DEFAULT_THRESHOLD_MS = 1000
+
+# ensure block of load-test.yml
+MAX_ERROR_RATE_PERCENT = 5
+MAX_P99_MS = 5000
+
+SEARCH_TERMS = ["machine learning", "diffusion", "transformer", "reinforcement learning",
+                "graph neural network", "language model", "contrastive", "robustness"]
+AUTHOR_TERMS = ["Wang", "Zhang", "Li", "Chen", "Liu", "Smith", "Kim", "Yang"]
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+API_DIR = os.path.join(REPO_ROOT, 'iclr-node-server-app')
+# Result prompt id -> prompt text, the mapping bulk_load.py loads predictions with
+PROMPTS_FILE = os.path.join(API_DIR, 'data', 'prompts.json')
+
+# Database and year the Node API reads (App.js dbName, globalConfig default year)
+API_DB_NAME = "iclr_2024"
+FIXTURE_YEAR = "2024"
+FIXTURE_USERS = 20
+
+
+class LatencyHistogram:
+    """
+    HDR-style histogram of latencies in microseconds.
+
+    Values are bucketed log-linearly with a fixed number of significant digits,
+    so memory is constant and percentiles stay within the configured precision
+    however many samples are recorded. Histograms merge by adding counts.
+    """
+
+    def __init__(self, significant_digits=3, highest_us=60_000_000):
+        sub_bucket_count = 2 ** math.ceil(math.log2(2 * 10 ** significant_digits))
+        self.sub_bucket_bits = int(math.log2(sub_bucket_count))
+        self.half_bits = self.sub_bucket_bits - 1
+        self.highest_us = highest_us
+        self.counts = [0] * (self.index_of(highest_us) + 1)
+        self.total = 0
+        self.sum_us = 0
+        self.max_us = 0
+
+    def index_of(self, value_us):
+        bucket = max(0, value_us.bit_length() - self.sub_bucket_bits)
+        sub_bucket = value_us >> bucket
+        return (bucket << self.half_bits) + sub_bucket
+
+    def highest_equivalent(self, index):
+        """Largest value that falls into a counts index."""
+        if index < (2 << self.half_bits):
+            return index
+        bucket = (index >> self.half_bits) - 1
+        sub_bucket = (index & ((1 << self.half_bits) - 1)) + (1 << self.half_bits)
+        return ((sub_bucket + 1) << bucket) - 1
+
+    def record(self, seconds):
+        value_us = min(max(int(seconds * 1_000_000), 0), self.highest_us)
+        self.counts[self.index_of(value_us)] += 1
+        self.total += 1
+        self.sum_us += value_us
+        self.max_us = max(self.max_us, value_us)
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.total += other.total
+        self.sum_us += other.sum_us
+        self.max_us = max(self.max_us, other.max_us)
+
+    def percentile_ms(self, percentile):
+        if self.total == 0:
+            return 0.0
+        target = max(1, math.ceil(percentile / 100 * self.total))
+        running = 0
+        for index, count in enumerate(self.counts):
+            running += count
+            if running >= target:
+                return min(self.highest_equivalent(index), self.max_us) / 1000
+        return self.max_us / 1000
+
+    def summary(self):
+        return {
+            "count": self.total,
+            "mean_ms": round(self.sum_us / self.total / 1000, 3) if self.total else 0.0,
+            "p50_ms": self.percentile_ms(50),
+            "p75_ms": self.percentile_ms(75),
+            "p90_ms": self.percentile_ms(90),
+            "p95_ms": self.percentile_ms(95),
+            "p99_ms": self.percentile_ms(99),
+            "max_ms": self.max_us / 1000,
+        }
+
+
+def random_text(rng, length):
+    return ''.join(rng.choice(string.ascii_letters) for _ in range(length))
+
+
+# ----------------------------------------------------------------------
+# Endpoint mix: each step builds (endpoint name, method, path, json body)
+# from the session context; names group URLs that differ only by parameters
+# ----------------------------------------------------------------------
+
+def step_random(ctx, rng):
+    return "GET /api/iclr/random", "GET", "/api/iclr/random/1", None
+
+
+def step_paginated(ctx, rng):
+    skip = rng.randrange(0, 400) * 20
+    return "GET /api/iclr/paginated", "GET", f"/api/iclr/paginated?limit=20&skip={skip}", None
+
+
+def step_paginated_search(ctx, rng):
+    term = rng.choice(SEARCH_TERMS)
+    return ("GET /api/iclr/paginated?search", "GET",
+            f"/api/iclr/paginated?limit=20&skip=0&search={term.replace(' ', '%20')}", None)
+
+
+def step_title_search(ctx, rng):
+    term = rng.choice(SEARCH_TERMS)
+    return "GET /api/iclr/title", "GET", f"/api/iclr/title/{term.replace(' ', '%20')}", None
+
+
+def step_author_search(ctx, rng):
+    return "GET /api/iclr/author", "GET", f"/api/iclr/author/{rng.choice(AUTHOR_TERMS)}", None
+
+
+def step_ranked(ctx, rng):
+    return "GET /api/iclr/ranked/rating", "GET", "/api/iclr/ranked/rating/20", None
+
+
+def step_year(ctx, rng):
+    return "GET /api/iclr/year", "GET", "/api/iclr/year", None
+
+
+def step_predictions_by_prompt(ctx, rng):
+    body = {"prompt": rng.choice(ctx["prompts"]), "rebuttal": rng.choice([0, 1])}
+    return ("POST /api/prompt/predictions_by_prompt_and_rebuttal", "POST",
+            "/api/prompt/predictions_by_prompt_and_rebuttal", body)
+
+
+def step_prediction_for_paper(ctx, rng):
+    body = {"paperId": ctx["paperId"], "prompt": rng.choice(ctx["prompts"])}
+    return "POST /api/prompt/prediction", "POST", "/api/prompt/prediction", body
+
+
+def step_stats_all(ctx, rng):
+    return "GET /api/predictionStats/all", "GET", "/api/predictionStats/all", None
+
+
+def step_stats_summary(ctx, rng):
+    return "GET /api/predictionStats/summary", "GET", "/api/predictionStats/summary", None
+
+
+def step_like(ctx, rng):
+    body = {"paperId": ctx["paperId"], "userId": ctx["userId"]}
+    return "POST /api/public/comments/like", "POST", "/api/public/comments/like", body
+
+
+def step_comment(ctx, rng):
+    body = {"paperId": ctx["paperId"], "userId": ctx["userId"],
+            "comment": f"Load test comment {random_text(rng, 20)}"}
+    return "POST /api/public/comments/comment", "POST", "/api/public/comments/comment", body
+
+
+# (scenario name, weight, steps); weights follow load-test.yml, minus sign-in
+SCENARIOS = [
+    ("Paper Retrieval", 30, [step_random, step_paginated, step_ranked]),
+    ("Search Operations", 25, [step_paginated_search, step_title_search, step_author_search]),
+    ("Prediction Lookups", 15, [step_random, step_predictions_by_prompt, step_prediction_for_paper]),
+    ("Dashboard", 10, [step_year, step_stats_all, step_stats_summary]),
+    ("Comments and Likes", 20, [step_random, step_like, step_comment]),
+]
+
+# Steps that act on the paper step_random picked; a session without one stops before them
+PAPER_STEPS = {step_prediction_for_paper, step_like, step_comment}
+
+
+# ----------------------------------------------------------------------
+# Mock database: fixtures for a local Node API on a throwaway MongoDB
+# ----------------------------------------------------------------------
+
+def fixture_prompts():
+    """Prompt texts of prompts.json, or placeholders when the file is missing."""
+    try:
+        with open(PROMPTS_FILE) as f:
+            prompts = json.load(f)
+    except FileNotFoundError:
+        return [f"Fixture prompt {i}" for i in range(3)]
+    return [value["prompt"] if isinstance(value, dict) else value for value in prompts.values()]
+
+
+def synthetic_papers(count, rng):
+    """Papers whose titles and authors hit the search terms of the endpoint mix."""
+    papers = []
+    for i in range(count):
+        reviews = []
+        for r in range(rng.randint(3, 5)):
+            rating = rng.choice([1, 3, 5, 6, 8, 10])
+            reviews.append({
+                "id": f"review-{i}-{r}",
+                "values": {
+                    "summary": random_text(rng, 200),
+                    "rating": f"{rating}: fixture rating",
+                    "confidence": f"{rng.randint(1, 5)}: fixture confidence",
+                    "soundness": f"{rng.randint(1, 4)} fair",
+                    "presentation": f"{rng.randint(1, 4)} fair",
+                    "contribution": f"{rng.randint(1, 4)} fair",
+                    "strengths": random_text(rng, 300),
+                    "weaknesses": random_text(rng, 300),
+                },
+                "rebuttal": [],
+            })
+        papers.append({
+            "s_id": f"fixture-{i:05d}",
+            "title": f"{rng.choice(SEARCH_TERMS).title()} for {random_text(rng, 12)}",
+            "authors": [f"{random_text(rng, 6)} {rng.choice(AUTHOR_TERMS)}" for _ in range(rng.randint(1, 5))],
+            "abstract": random_text(rng, 800),
+            "year": FIXTURE_YEAR,
+            "url": f"https://openreview.net/forum?id=fixture{i}",
+            "decision": rng.choice(["Accept (poster)", "Accept (spotlight)", "Reject", "Reject", "Reject"]),
+            "metareviews": reviews,
+        })
+    return papers
+
+
+def load_fixture_papers(paths):
+    """Papers from export chunks (.json with a "papers" list) or JSONL files."""
+    papers = []
+    for path in paths:
+        with open(path) as f:
+            if path.endswith('.json'):
+                papers.extend(json.load(f).get("papers", []))
+            else:
+                papers.extend(json.loads(line) for line in f if line.strip())
+    for paper in papers:
+        paper.pop("_id", None)
+        paper["year"] = FIXTURE_YEAR
+    return papers
+
+
+def seed_database(uri, papers, prompts, seed=0):
+    """
+    Replace the API's collections with fixtures.
+
+    Args:
+        uri: MongoDB connection string (the API database is API_DB_NAME)
+        papers: Paper documents for the iclr_2024 collection
+        prompts: Prompt texts to store predictions and stats for
+        seed: Seed for the fixture predictions
+
+    Returns:
+        Ids of the fixture users, for the comment and like steps
+    """
+    if MongoClient is None:
+        raise RuntimeError("Seeding the mock database needs pymongo: pip install pymongo")
+    rng = random.Random(seed)
+    client = MongoClient(uri)
+    try:
+        db = client[API_DB_NAME]
+        for name in ("iclr_2024", "predictions", "predictionstats", "users", "comments", "likes", "sample_pools"):
+            db.drop_collection(name)
+
+        paper_ids = db.iclr_2024.insert_many(papers).inserted_ids
+        db.iclr_2024.create_index("s_id", unique=True)
+
+        predictions = []
+        stats = []
+        for prompt in prompts:
+            prompt_type = rng.choice([-1, 0, 1])
+            stats_entries = []
+            for rebuttal in (0, 1):
+                counts = {"TP": 0, "FP": 0, "TN": 0, "FN": 0}
+                for paper_id, paper in zip(paper_ids, papers):
+                    accepted = str(paper.get("decision", "")).lower().startswith("accept")
+                    predicted = rng.random() < (0.7 if accepted else 0.3)
+                    counts[("T" if predicted == accepted else "F") + ("P" if predicted else "N")] += 1
+                    predictions.append({
+                        "prompt": prompt, "prompt_type": prompt_type, "paper_id": paper_id,
+                        "paper_title": paper.get("title", ""), "model": "gpt-4o-mini", "rebuttal": rebuttal,
+                        "prediction": "Accept" if predicted else "Reject",
+                        "decision": "Accept" if accepted else "Reject", "__v": 0,
+                    })
+                total = sum(counts.values())
+                stats_entries.append({
+                    "year": int(FIXTURE_YEAR), "conference": "ICLR", "number_of_predictions": total,
+                    "rebuttal_in_review": rebuttal, **counts,
+                    "accuracy": round((counts["TP"] + counts["TN"]) / max(total, 1), 4),
+                })
+            stats.append({"prompt": prompt, "prompt_type": prompt_type, "predictions": stats_entries,
+                          "comparisons": [], "__v": 0})
+        if predictions:
+            db.predictions.insert_many(predictions)
+            db.predictions.create_index([("paper_id", 1), ("prompt", 1), ("rebuttal", 1)])
+            db.predictions.create_index([("prompt", 1), ("rebuttal", 1)])
+        if stats:
+            db.predictionstats.insert_many(stats)
+
+        users = [
+            {"_id": ObjectId(), "username": f"loadtest{i}", "password": random_text(rng, 16),
+             "firstName": "Load", "lastName": f"Test{i}", "email": f"loadtest{i}@example.com",
+             "nickName": f"loadtest{i}", "role": "USER"}
+            for i in range(FIXTURE_USERS)
+        ]
+        db.users.insert_many(users)
+        logger.info(f"Seeded {len(papers)} papers, {len(predictions)} predictions, "
+                    f"{len(stats)} prompt stats and {len(users)} users into {API_DB_NAME}")
+        return [str(user["_id"]) for user in users]
+    finally:
+        client.close()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until(check, timeout_s, what):
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        try:
+            if check():
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"{what} did not come up within {timeout_s:.0f}s")
+
+
+def stop_process(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+@contextmanager
+def mock_mongod(binary):
+    """Throwaway mongod on a free port with a temporary data directory; yields its URI."""
+    if shutil.which(binary) is None:
+        raise RuntimeError(f"{binary} not found; set --mongod or MONGOD_BINARY "
+                           "(e.g. the binary mongodb-memory-server caches), or use docker-compose.mock.yml")
+    port = free_port()
+    data_dir = tempfile.mkdtemp(prefix="replay-mongod-")
+    process = subprocess.Popen(
+        [binary, "--dbpath", data_dir, "--port", str(port), "--bind_ip", "127.0.0.1"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        def ping():
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return True
+        wait_until(ping, 30, "mongod")
+        yield f"mongodb://127.0.0.1:{port}"
+    finally:
+        stop_process(process)
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+@contextmanager
+def local_api(db_uri, api_dir=API_DIR):
+    """Node API (App.js) on a free port against db_uri; yields its base URL."""
+    port = free_port()
+    env = dict(os.environ, DB_CONNECTION_STRING=db_uri, PORT=str(port))
+    process = subprocess.Popen(["node", "App.js"], cwd=api_dir, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    target = f"http://127.0.0.1:{port}"
+    try:
+        def healthy():
+            with urllib.request.urlopen(f"{target}/health", timeout=2) as response:
+                return response.status == 200
+        wait_until(healthy, 60, "The Node API")
+        yield target
+    finally:
+        stop_process(process)
+
+
+class TrafficReplayer:
+    """Replays the endpoint mix against a running API and collects latencies."""
+
+    def __init__(self, target, phases=None, think_time_s=1.0, max_sessions=500,
+                 max_connections=100, timeout_s=30, prompts=None, seed=0, user_ids=None):
+        self.target = target.rstrip('/')
+        self.phases = phases or DEFAULT_PHASES
+        self.think_time_s = think_time_s
+        self.max_sessions = max_sessions
+        self.max_connections = max_connections
+        self.timeout_s = timeout_s
+        self.prompts = prompts or fixture_prompts()
+        self.user_ids = user_ids or []
+        self.rng = random.Random(seed)
+
+        self.histograms = {}
+        self.errors = {}
+        self.status_codes = {}
+        self.sessions = {"scheduled": 0, "completed": 0, "dropped": 0}
+        self.active_sessions = 0
+        self.started_at = None
+        self.finished_at = None
+
+    def rate_at(self, elapsed):
+        """Arrival rate (sessions/s) at a time offset, with linear ramps inside phases."""
+        offset = 0
+        for _, duration, rate, ramp_to in self.phases:
+            if elapsed < offset + duration:
+                if ramp_to is None:
+                    return rate
+                return rate + (ramp_to - rate) * (elapsed - offset) / duration
+            offset += duration
+        return 0.0
+
+    def total_duration(self):
+        return sum(duration for _, duration, _, _ in self.phases)
+
+    def record(self, endpoint, latency_s, status, failed):
+        self.histograms.setdefault(endpoint, LatencyHistogram()).record(latency_s)
+        self.status_codes.setdefault(endpoint, {})
+        self.status_codes[endpoint][str(status)] = self.status_codes[endpoint].get(str(status), 0) + 1
+        if failed:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    async def request(self, http, step, ctx, rng, intended_start):
+        """Send one request; latency counts from the intended start, so stalls are not hidden."""
+        endpoint, method, path, body = step(ctx, rng)
+        status = "error"
+        failed = True
+        try:
+            async with http.request(method, self.target + path, json=body) as response:
+                status = response.status
+                payload = await response.read()
+                failed = status >= 400
+                if step is step_random and not failed:
+                    papers = json.loads(payload or b"null")
+                    if isinstance(papers, list) and papers and "_id" in papers[0]:
+                        ctx["paperId"] = papers[0]["_id"]
+                    else:
+                        # A 2xx without a paper would leave the paper steps posting empty ids
+                        failed = True
+                        status = "no paperId"
+                        logger.error(f"❌ {endpoint} returned no paper id: {payload[:200]!r}")
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            status = type(e).__name__
+        self.record(endpoint, time.perf_counter() - intended_start, status, failed)
+
+    async def run_session(self, http, intended_start):
+        rng = random.Random(self.rng.random())
+        name, _, steps = rng.choices(SCENARIOS, weights=[weight for _, weight, _ in SCENARIOS])[0]
+        user_id = rng.choice(self.user_ids) if self.user_ids else f"loadtest-{random_text(rng, 8)}"
+        ctx = {"prompts": self.prompts, "userId": user_id}
+        try:
+            for position, step in enumerate(steps):
+                if step in PAPER_STEPS and "paperId" not in ctx:
+                    break
+                if position:
+                    think = rng.expovariate(1 / self.think_time_s) if self.think_time_s > 0 else 0
+                    await asyncio.sleep(think)
+                    intended_start = time.perf_counter()
+                await self.request(http, step, ctx, rng, intended_start)
+            self.sessions["completed"] += 1
+        finally:
+            self.active_sessions -= 1
+
+    async def run(self):
+        """Drive open-loop arrivals for every phase, then wait for sessions in flight."""
+        connector = aiohttp.TCPConnector(limit=self.max_connections)
+        timeout = aiohttp.ClientTimeout(total=self.timeout_s)
+        tasks = set()
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as http:
+            self.started_at = time.perf_counter()
+            next_arrival = self.started_at
+            end = self.started_at + self.total_duration()
+
+            while True:
+                rate = self.rate_at(next_arrival - self.started_at)
+                # Skip idle stretches in 100ms steps until the rate picks up
+                next_arrival += self.rng.expovariate(rate) if rate > 0 else 0.1
+                if next_arrival >= end:
+                    break
+                delay = next_arrival - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                if rate <= 0:
+                    continue
+                self.sessions["scheduled"] += 1
+                # Arrivals never wait for earlier sessions; past the cap they are dropped and counted
+                if self.active_sessions >= self.max_sessions:
+                    self.sessions["dropped"] += 1
+                    continue
+                self.active_sessions += 1
+                task = asyncio.create_task(self.run_session(http, next_arrival))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            self.finished_at = time.perf_counter()
+
+    # ------------------------------------------------------------------
+    # Report (same shape as ICLRPerformanceAnalyzer.generate_performance_report)
+    # ------------------------------------------------------------------
+
+    def endpoint_results(self):
+        elapsed = max(self.finished_at - self.started_at, 1e-9)
+        queries = {}
+        recommendations = []
+
+        for endpoint, histogram in sorted(self.histograms.items()):
+            summary = histogram.summary()
+            threshold = ENDPOINT_THRESHOLDS_MS.get(endpoint, DEFAULT_THRESHOLD_MS)
+            errors = self.errors.get(endpoint, 0)
+            error_rate = 100 * errors / max(histogram.total, 1)
+            p95 = summary["p95_ms"]
+
+            queries[endpoint] = {
+                "operation": endpoint,
+                "execution_time_ms": summary["mean_ms"],
+                "result_count": histogram.total,
+                "latency_ms": summary,
+                "threshold_ms": threshold,
+                "throughput_rps": round(histogram.total / elapsed, 2),
+                "error_count": errors,
+                "error_rate_percent": round(error_rate, 2),
+                "status_codes": self.status_codes.get(endpoint, {}),
+                "performance_rating": "excellent" if p95 < threshold / 2 else "good" if p95 < threshold else "poor",
+            }
+
+            if error_rate > MAX_ERROR_RATE_PERCENT:
+                recommendations.append({
+                    "type": "errors",
+                    "recommendation": f"Investigate failures on {endpoint}",
+                    "reason": f"Error rate {error_rate:.1f}% exceeds {MAX_ERROR_RATE_PERCENT}%",
+                    "priority": "high"
+                })
+            if summary["p99_ms"] > MAX_P99_MS:
+                recommendations.append({
+                    "type": "latency",
+                    "recommendation": f"Reduce tail latency of {endpoint}",
+                    "reason": f"p99 {summary['p99_ms']:.0f}ms exceeds {MAX_P99_MS}ms",
+                    "priority": "high"
+                })
+            elif p95 > threshold:
+                recommendations.append({
+                    "type": "latency",
+                    "recommendation": f"Optimize {endpoint}",
+                    "reason": f"p95 {p95:.0f}ms exceeds the {threshold}ms threshold",
+                    "priority": "medium"
+                })
+
+        return {
+            "total_requests": sum(histogram.total for histogram in self.histograms.values()),
+            "queries": queries,
+            "recommendations": recommendations,
+        }
+
+    def load_test_results(self):
+        overall = LatencyHistogram()
+        for histogram in self.histograms.values():
+            overall.merge(histogram)
+        elapsed = self.finished_at - self.started_at
+        return {
+            "target": self.target,
+            "phases": [
+                {"name": name, "duration_s": duration, "arrival_rate": rate, "ramp_to": ramp_to}
+                for name, duration, rate, ramp_to in self.phases
+            ],
+            "think_time_s": self.think_time_s,
+            "sessions": dict(self.sessions),
+            "duration_s": round(elapsed, 2),
+            "throughput_rps": round(overall.total / max(elapsed, 1e-9), 2),
+            "error_count": sum(self.errors.values()),
+            "latency_ms": overall.summary(),
+            "recommendations": [],
+        }
+
+    def generate_performance_report(self):
+        """Build the report with the same keys and scoring as the EMR performance analysis."""
+        performance_results = {
+            "query_performance": self.endpoint_results(),
+            "load_test": self.load_test_results(),
+        }
+        if self.sessions["dropped"]:
+            performance_results["load_test"]["recommendations"].append({
+                "type": "load_generator",
+                "recommendation": "Raise --max-sessions or lower the arrival rate",
+                "reason": f"{self.sessions['dropped']} sessions dropped at the concurrency cap",
+                "priority": "medium"
+            })
+
+        score = 100
+        for metrics in performance_results["query_performance"]["queries"].values():
+            if metrics["performance_rating"] == "poor":
+                score -= 10
+            elif metrics["performance_rating"] == "good":
+                score -= 5
+
+        all_recommendations = [
+            rec for results in performance_results.values() for rec in results.get("recommendations", [])
+        ]
+        critical = sum(
+            1 for metrics in performance_results["query_performance"]["queries"].values()
+            if metrics["performance_rating"] == "poor"
+        ) + sum(1 for rec in all_recommendations if rec.get("priority") == "high")
+
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "performance_summary": {
+                "overall_performance": max(0, score),
+                "critical_issues": critical,
+                "optimization_opportunities": len(all_recommendations)
+            },
+            "detailed_results": performance_results
+        }
+
+
+def parse_phases(spec):
+    """Parse "duration:rate[-ramp_to],..." (e.g. "30:5,60:5-50,120:50")."""
+    phases = []
+    for number, part in enumerate(spec.split(','), start=1):
+        duration, rates = part.split(':')
+        rate, _, ramp_to = rates.partition('-')
+        phases.append((f"Phase {number}", float(duration), float(rate), float(ramp_to) if ramp_to else None))
+    return phases
+
+
+def run_replay(args, phases):
+    """Replay traffic, first starting or seeding the mock database when asked (None with --seed-only)."""
+    with ExitStack() as stack:
+        target = args.target
+        db_uri = args.seed_db
+        if args.mock_db:
+            db_uri = stack.enter_context(mock_mongod(args.mongod))
+            logger.info(f"Started mock MongoDB at {db_uri}")
+
+        prompts = args.prompts
+        user_ids = None
+        if db_uri:
+            papers = (load_fixture_papers(args.fixtures) if args.fixtures
+                      else synthetic_papers(args.fixture_papers, random.Random(args.seed)))
+            prompts = prompts or fixture_prompts()
+            user_ids = seed_database(db_uri, papers, prompts, seed=args.seed)
+            if args.seed_only:
+                return None
+        if args.mock_db:
+            target = stack.enter_context(local_api(db_uri, args.api_dir))
+            logger.info(f"Started the Node API at {target}")
+
+        replayer = TrafficReplayer(
+            target, phases=phases, think_time_s=args.think_time,
+            max_sessions=args.max_sessions, max_connections=args.max_connections,
+            timeout_s=args.timeout, prompts=prompts, seed=args.seed, user_ids=user_ids
+        )
+        logger.info(f"Replaying traffic against {replayer.target} for {replayer.total_duration():.0f}s")
+        asyncio.run(replayer.run())
+        return replayer
+
+
+def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description="Replay ICLR API traffic with open-loop arrivals")
+    parser.add_argument("--target", default=os.getenv('LOAD_TEST_TARGET', 'http://localhost:4000'))
+    parser.add_argument("--phases", help='Phases as "duration:rate[-ramp_to],..." (default: load-test.yml phases)')
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="Multiply phase durations (e.g. 0.1 for a quick local run)")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Mean think time between steps (s)")
+    parser.add_argument("--max-sessions", type=int, default=500)
+    parser.add_argument("--max-connections", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--prompts", nargs="+", help="Prompt texts used for prediction lookups (default: the texts in prompts.json)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="load-test-report.json")
+    parser.add_argument("--mock-db", action="store_true",
+                        help="Start a throwaway mongod and the Node API on it, seed fixtures and replay against it")
+    parser.add_argument("--mongod", default=os.getenv('MONGOD_BINARY', 'mongod'),
+                        help="mongod binary for --mock-db")
+    parser.add_argument("--api-dir", default=API_DIR, help="Node API directory for --mock-db")
+    parser.add_argument("--seed-db", help="Seed fixtures into this MongoDB before replaying (drops the API collections)")
+    parser.add_argument("--seed-only", action="store_true", help="Seed --seed-db and exit without replaying")
+    parser.add_argument("--fixtures", nargs="+", help="Paper export chunks or JSONL to seed instead of synthetic papers")
+    parser.add_argument("--fixture-papers", type=int, default=500, help="Synthetic papers to seed")
+    args = parser.parse_args()
+    if args.seed_only and not args.seed_db:
+        parser.error("--seed-only needs --seed-db")
+
+    phases = parse_phases(args.phases) if args.phases else DEFAULT_PHASES
+    phases = [(name, duration * args.time_scale, rate, ramp_to) for name, duration, rate, ramp_to in phases]
+
+    try:
+        replayer = run_replay(args, phases)
+    except RuntimeError as e:
+        logger.error(f"❌ {e}")
+        sys.exit(1)
+    if replayer is None:
+        return
+
+    report = replayer.generate_performance_report()
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    load_test = report["detailed_results"]["load_test"]
+    logger.info(f"""
+    🚦 Load Test Summary:
+    - Sessions: {load_test['sessions']['completed']} completed, {load_test['sessions']['dropped']} dropped
+    - Requests: {load_test['latency_ms']['count']} ({load_test['throughput_rps']} req/s)
+    - Errors: {load_test['error_count']}
+    - Latency p50/p95/p99: {load_test['latency_ms']['p50_ms']}/{load_test['latency_ms']['p95_ms']}/{load_test['latency_ms']['p99_ms']} ms
+    - Overall performance: {report['performance_summary']['overall_performance']}
+    - Report: {args.output}
+    """)
+
+
+if __name__ == "__main__":
+    main()
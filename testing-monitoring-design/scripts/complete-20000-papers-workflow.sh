@@ -132,6 +132,7 @@ create_emr_cluster() {
           "--conf", "spark.executor.cores=4",
           "--conf", "spark.sql.adaptive.enabled=true",
           "--conf", "spark.sql.adaptive.coalescePartitions.enabled=true",
+          "--py-files", "s3://$S3_BUCKET/scripts/quantile_sketch.py,s3://$S3_BUCKET/scripts/chunk_reader.py,s3://$S3_BUCKET/scripts/review_values.py,s3://$S3_BUCKET/scripts/prompt_metadata.py",
           "s3://$S3_BUCKET/scripts/emr-process-20000-papers.py"
         ]
       }
@@ -4,36 +4,194 @@ EMR Spark Script: Process 20,000 Papers from S3
 This script runs on EMR cluster to process large paper datasets
 """
 
+from pyspark import StorageLevel
 from pyspark.sql import SparkSession
-from pyspark.sql.functions import col, count, avg, min, max, stddev, explode, size, when, lit
+from pyspark.sql.functions import col, count, avg, min, max, stddev, explode, size, when, lit, broadcast, countDistinct, regexp_extract, coalesce
 from pyspark.sql.types import StructType, StructField, StringType, ArrayType, DoubleType, IntegerType
+import builtins
 import json
 import logging
+import math
+import os
+import sys
+import time
 from datetime import datetime
 
+# spark-submit ships quantile_sketch.py, review_values.py, prompt_metadata.py and chunk_reader.py with --py-files; local runs import them from the repo
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "emr", "scripts"))
+from chunk_reader import chunk_glob, manifest_dictionaries, read_chunks
+from prompt_metadata import prompt_entries
+from quantile_sketch import sketch_papers
+from review_values import REVIEW_NUMBER
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Decision strings as stored in the iclr_<year> collections, mapped to the
+# Accept/Reject labels the prediction dashboards compare against
+DECISION_LABELS = [
+    ("Accept (oral)", "Accept", "oral"),
+    ("Accept (spotlight)", "Accept", "spotlight"),
+    ("Accept (poster)", "Accept", "poster"),
+    ("Accept", "Accept", "unspecified"),
+    ("Reject", "Reject", "rejected"),
+    ("Withdrawn", "Reject", "withdrawn"),
+    ("Desk Rejected", "Reject", "desk_rejected"),
+]
+
+# PySpark does not expose the serialized JVM levels by name
+MEMORY_ONLY_SER = StorageLevel(False, True, False, False, 1)
+MEMORY_AND_DISK_SER = StorageLevel(True, True, False, False, 1)
+
+
+class SparkAutoTuner:
+    """Size-aware partitioning, caching and broadcast decisions for loaded papers"""
+
+    def __init__(self, spark_session, target_partition_mb=64, min_rows_per_partition=500,
+                 broadcast_threshold_rows=10000, storage_memory_fraction=0.5):
+        self.spark = spark_session
+        self.target_partition_bytes = target_partition_mb * 1024 * 1024
+        self.min_rows_per_partition = min_rows_per_partition
+        self.broadcast_threshold_rows = broadcast_threshold_rows
+        self.storage_memory_fraction = storage_memory_fraction
+        self.decisions = []
+
+    def _record(self, decision, **details):
+        """Keep and log a tuning decision"""
+        entry = {"decision": decision, **details}
+        self.decisions.append(entry)
+        logger.info(f"Auto-tune [{decision}]: {details}")
+
+    def measure_input_bytes(self, path_glob):
+        """Sum the size of all files matched by a path glob via the Hadoop FileSystem API"""
+        jvm = self.spark.sparkContext._jvm
+        hadoop_conf = self.spark.sparkContext._jsc.hadoopConfiguration()
+        path = jvm.org.apache.hadoop.fs.Path(path_glob)
+        fs = path.getFileSystem(hadoop_conf)
+        statuses = fs.globStatus(path) or []
+
+        total_bytes = sum(status.getLen() for status in statuses)
+        self._record("input_size", path=path_glob, files=len(statuses), bytes=total_bytes)
+        return total_bytes
+
+    def available_storage_bytes(self):
+        """Free block-manager memory across the driver and executors"""
+        try:
+            memory_status = self.spark.sparkContext._jsc.sc().getExecutorMemoryStatus()
+            iterator = memory_status.values().iterator()
+            remaining = 0
+            while iterator.hasNext():
+                remaining += iterator.next()._2()
+            return remaining
+        except Exception as e:
+            logger.warning(f"Could not read executor memory status, assuming 1GB: {e}")
+            return 1024 * 1024 * 1024
+
+    def choose_partition_count(self, input_bytes, row_count):
+        """Partitions sized by bytes, at least one per core, never thinner than min rows"""
+        by_size = math.ceil(input_bytes / self.target_partition_bytes) if input_bytes else 1
+        parallelism = self.spark.sparkContext.defaultParallelism
+        # min and max are the pyspark column functions in this module
+        by_rows = builtins.max(1, row_count // self.min_rows_per_partition)
+        return builtins.max(1, builtins.min(builtins.max(by_size, parallelism), by_rows))
+
+    def tune_partitions(self, df, input_bytes, row_count):
+        """Coalesce or repartition a DataFrame to the chosen partition count"""
+        current = df.rdd.getNumPartitions()
+        target = self.choose_partition_count(input_bytes, row_count)
+
+        if target == current:
+            action = "keep"
+        elif target < current:
+            # Narrow dependency, no shuffle
+            df = df.coalesce(target)
+            action = "coalesce"
+        else:
+            df = df.repartition(target)
+            action = "repartition"
+
+        self._record(
+            "partitions",
+            action=action,
+            current=current,
+            target=target,
+            rows=row_count,
+            avg_partition_mb=round(input_bytes / target / (1024 * 1024), 2)
+        )
+        return df
+
+    def choose_storage_level(self, input_bytes):
+        """Serialized memory when the data fits, spill to disk when it nearly does, disk otherwise"""
+        budget = self.available_storage_bytes() * self.storage_memory_fraction
+
+        if input_bytes <= budget:
+            level, name = MEMORY_ONLY_SER, "MEMORY_ONLY_SER"
+        elif input_bytes <= budget * 2:
+            level, name = MEMORY_AND_DISK_SER, "MEMORY_AND_DISK_SER"
+        else:
+            level, name = StorageLevel.DISK_ONLY, "DISK_ONLY"
+
+        self._record(
+            "storage_level",
+            level=name,
+            input_mb=round(input_bytes / (1024 * 1024), 2),
+            budget_mb=round(budget / (1024 * 1024), 2)
+        )
+        return level
+
+    def broadcast_lookup(self, lookup_df, name):
+        """Mark a lookup table for broadcast joins if it is small enough"""
+        row_count = lookup_df.count()
+        if row_count <= self.broadcast_threshold_rows:
+            self._record("broadcast", table=name, rows=row_count, broadcast=True)
+            return broadcast(lookup_df)
+
+        self._record("broadcast", table=name, rows=row_count, broadcast=False)
+        return lookup_df
+
+    def tune(self, df, path_glob, row_count):
+        """Repartition and persist a freshly loaded DataFrame"""
+        input_bytes = self.measure_input_bytes(path_glob)
+        df = self.tune_partitions(df, input_bytes, row_count)
+        df.persist(self.choose_storage_level(input_bytes))
+        return df
+
+    def summary(self):
+        """All decisions made so far, in order"""
+        return list(self.decisions)
+
+
 class ICLRPaperProcessor:
-    def __init__(self, spark_session, s3_bucket, s3_prefix):
+    def __init__(self, spark_session, s3_bucket, s3_prefix, auto_tune=True):
         self.spark = spark_session
         self.s3_bucket = s3_bucket
         self.s3_prefix = s3_prefix
+        self.auto_tuner = SparkAutoTuner(spark_session) if auto_tune else None
+        self.papers_path = None
+        self.loaded_row_count = 0
+        self.export_manifest = None
+    
+    def papers_root(self):
+        """Root location of exported chunks"""
+        return f"s3://{self.s3_bucket}/{self.s3_prefix}"
         
-    def load_papers_from_s3(self, timestamp=None):
-        """Load papers from S3 into Spark DataFrame"""
+    def load_papers_from_s3(self, timestamp=None, manifest=None):
+        """Load papers from S3 into Spark DataFrame (zstd-dict chunks need the export's manifest)"""
         logger.info("Loading papers from S3...")
         
         if timestamp:
             # Load specific export
-            papers_path = f"s3://{self.s3_bucket}/{self.s3_prefix}/papers/chunk_*_{timestamp}.json"
+            papers_path = chunk_glob(f"{self.papers_root()}/papers/chunk_*_{timestamp}")
         else:
             # Load latest export
-            papers_path = f"s3://{self.s3_bucket}/{self.s3_prefix}/papers/chunk_*.json"
+            papers_path = chunk_glob(f"{self.papers_root()}/papers/chunk_*")
+        self.papers_path = papers_path
         
-        # Read JSON files from S3
-        papers_df = self.spark.read.json(papers_path)
+        # Read the chunks from S3 in whichever encoding the export used
+        papers_df = read_chunks(
+            self.spark, papers_path, manifest_dictionaries(self.spark, manifest, self.papers_root())
+        )
         
         # Extract papers from chunk structure
         papers_df = papers_df.select(explode("papers").alias("paper"))
@@ -41,20 +199,118 @@ class ICLRPaperProcessor:
         # Flatten paper structure
         papers_df = papers_df.select("paper.*")
         
-        logger.info(f"Loaded {papers_df.count()} papers from S3")
+        self.loaded_row_count = papers_df.count()
+        logger.info(f"Loaded {self.loaded_row_count} papers from S3")
+        return papers_df
+    
+    def load_multi_year_papers_from_s3(self, timestamp=None, years=None, manifest=None):
+        """Load every year partition of a multi-year export in a single read"""
+        logger.info("Loading year-partitioned papers from S3...")
+        
+        year_glob = f"{{{','.join(str(year) for year in years)}}}" if years else "*"
+        chunk_name = f"chunk_*_{timestamp}" if timestamp else "chunk_*"
+        papers_path = chunk_glob(f"{self.papers_root()}/papers/export_year={year_glob}/{chunk_name}")
+        self.papers_path = papers_path
+        
+        # basePath keeps export_year as a partition column
+        papers_df = read_chunks(
+            self.spark,
+            papers_path,
+            manifest_dictionaries(self.spark, manifest, self.papers_root()),
+            base_path=f"{self.papers_root()}/papers/"
+        )
+        
+        papers_df = papers_df.select(
+            col("export_year"),
+            explode("papers").alias("paper")
+        ).select("export_year", "paper.*")
+        
+        self.loaded_row_count = papers_df.count()
+        logger.info(f"Loaded {self.loaded_row_count} papers across years from S3")
         return papers_df
     
-    def analyze_paper_distribution(self, papers_df):
+    def load_export_manifest(self, timestamp):
+        """Read the exporter's manifest for an export, None if it cannot be read"""
+        manifest_path = f"{self.papers_root()}/manifests/export_manifest_{timestamp}.json"
+        try:
+            manifest = json.loads("\n".join(self.spark.sparkContext.textFile(manifest_path).collect()))
+        except Exception as e:
+            logger.warning(f"No export manifest at {manifest_path}, distributions will be rescanned: {e}")
+            return None
+        
+        self.export_manifest = manifest
+        logger.info(
+            f"Loaded export manifest {manifest_path} "
+            f"(profile '{self.export_profile_name(manifest)}')"
+        )
+        return manifest
+    
+    def export_profile_name(self, manifest):
+        """Export profile recorded in a manifest; exports from before profiles were full-text"""
+        if not manifest:
+            return None
+        return (manifest.get("export_profile") or {}).get("name", "full-text")
+    
+    def manifest_collection_summary(self, manifest):
+        """Collection summary of a manifest, merging the per-year summaries of a multi-year export"""
+        if not manifest:
+            return None
+        if "collection_summary" in manifest:
+            return manifest["collection_summary"]
+        
+        summaries = [info.get("collection_summary") for info in manifest.get("years", {}).values()]
+        if not summaries or not all(summaries):
+            return None
+        
+        merged = {"total_papers": 0, "by_year": {}, "by_decision": {}, "bson_bytes": 0}
+        for summary in summaries:
+            merged["total_papers"] += summary["total_papers"]
+            merged["bson_bytes"] += summary["bson_bytes"]
+            for field in ("by_year", "by_decision"):
+                for key, value in summary[field].items():
+                    merged[field][key] = merged[field].get(key, 0) + value
+        return merged
+    
+    def cross_check_manifest(self, collection_summary):
+        """Compare what Spark loaded with the counts the exporter recorded at export time"""
+        if not collection_summary:
+            return []
+        
+        check = {
+            "check": "loaded_vs_collection_total",
+            "expected": collection_summary["total_papers"],
+            "actual": self.loaded_row_count
+        }
+        check["match"] = check["expected"] == check["actual"]
+        if not check["match"]:
+            logger.warning(
+                f"Loaded {check['actual']} papers but the export recorded {check['expected']} "
+                f"in the collection"
+            )
+        return [check]
+    
+    def analyze_paper_distribution(self, papers_df, collection_summary=None):
         """Analyze distribution of papers by various criteria"""
         logger.info("Analyzing paper distribution...")
         
+        if collection_summary:
+            # Year and decision counts were aggregated by MongoDB at export time
+            year_dist = self.spark.createDataFrame(
+                sorted(collection_summary["by_year"].items()), ["year", "count"]
+            )
+            decision_dist = self.spark.createDataFrame(
+                sorted(collection_summary["by_decision"].items(), key=lambda item: -item[1]),
+                ["decision", "count"]
+            )
+        else:
+            year_dist = papers_df.groupBy("year").count().orderBy("year")
+            decision_dist = papers_df.groupBy("decision").count().orderBy("count", ascending=False)
+        
         # Year distribution
-        year_dist = papers_df.groupBy("year").count().orderBy("year")
         logger.info("Year distribution:")
         year_dist.show()
         
         # Decision distribution
-        decision_dist = papers_df.groupBy("decision").count().orderBy("count", ascending=False)
         logger.info("Decision distribution:")
         decision_dist.show()
         
@@ -78,8 +334,12 @@ class ICLRPaperProcessor:
         # Check for missing titles
         missing_titles = papers_df.filter(col("title").isNull() | (col("title") == "")).count()
         
-        # Check for missing abstracts
-        missing_abstracts = papers_df.filter(col("abstract").isNull() | (col("abstract") == "")).count()
+        # Check for missing abstracts (exports from before analytics-lite kept abstracts have none)
+        if "abstract" in papers_df.columns:
+            missing_abstracts = papers_df.filter(col("abstract").isNull() | (col("abstract") == "")).count()
+        else:
+            logger.warning("Export has no abstracts, skipping the abstract check")
+            missing_abstracts = 0
         
         # Check for papers without authors
         no_authors = papers_df.filter(
@@ -107,6 +367,46 @@ class ICLRPaperProcessor:
         logger.info(f"Quality Report: {quality_report}")
         return quality_report
     
+    def exact_review_stats(self, papers_df, metrics):
+        """Papers with reviews and exact count/mean/stddev/min/max per review metric, in one aggregation"""
+        # Exports without review values (or with metareviews inferred as another type) give null metrics
+        metareviews_type = papers_df.schema["metareviews"].dataType
+        if not isinstance(metareviews_type, ArrayType):
+            null_stats = {"count": 0, "mean": None, "stddev": None, "min": None, "max": None}
+            return {"papers_with_reviews": 0, **{metric: dict(null_stats) for metric in metrics}}
+        value_fields = set()
+        review_type = metareviews_type.elementType
+        if isinstance(review_type, StructType) and "values" in review_type.fieldNames() \
+                and isinstance(review_type["values"].dataType, StructType):
+            value_fields = set(review_type["values"].dataType.fieldNames())
+        reviews_df = papers_df.select(col("_id"), explode("metareviews").alias("review"))
+        
+        aggregations = [countDistinct("_id").alias("papers_with_reviews")]
+        for metric in metrics:
+            if metric in value_fields:
+                value = regexp_extract(col(f"review.values.{metric}"), REVIEW_NUMBER, 1).cast("double")
+            else:
+                value = lit(None).cast("double")
+            aggregations += [
+                count(value).alias(f"{metric}_count"),
+                avg(value).alias(f"{metric}_mean"),
+                stddev(value).alias(f"{metric}_stddev"),
+                min(value).alias(f"{metric}_min"),
+                max(value).alias(f"{metric}_max"),
+            ]
+        row = reviews_df.agg(*aggregations).collect()[0]
+        
+        stats = {"papers_with_reviews": row["papers_with_reviews"]}
+        for metric in metrics:
+            stats[metric] = {
+                "count": row[f"{metric}_count"],
+                "mean": round(row[f"{metric}_mean"], 4) if row[f"{metric}_mean"] is not None else None,
+                "stddev": round(row[f"{metric}_stddev"], 4) if row[f"{metric}_stddev"] is not None else None,
+                "min": row[f"{metric}_min"],
+                "max": row[f"{metric}_max"],
+            }
+        return stats
+    
     def analyze_metareviews(self, papers_df):
         """Analyze metareview data if available"""
         logger.info("Analyzing metareviews...")
@@ -116,35 +416,29 @@ class ICLRPaperProcessor:
             logger.info("No metareviews found in papers")
             return None
         
-        # Papers with metareviews
-        papers_with_reviews = papers_df.filter(
-            col("metareviews").isNotNull() & (size(col("metareviews")) > 0)
-        )
-        
-        review_count = papers_with_reviews.count()
+        # Counts, means and spreads are exact; the sketches only add the percentiles
+        exact_stats = self.exact_review_stats(papers_df, ["rating", "confidence"])
+        review_count = exact_stats.pop("papers_with_reviews")
         logger.info(f"Papers with metareviews: {review_count}")
         
         if review_count > 0:
-            # Explode metareviews for analysis
-            reviews_df = papers_with_reviews.select(
-                col("_id").alias("paper_id"),
-                explode("metareviews").alias("review")
-            )
+            sketches = sketch_papers(papers_df)
             
-            # Analyze ratings
-            rating_stats = reviews_df.select("review.rating").summary("count", "mean", "stddev", "min", "max")
-            logger.info("Rating statistics:")
-            rating_stats.show()
+            rating_stats = {**sketches.percentiles("rating"), **exact_stats["rating"]}
+            logger.info(f"Rating statistics: {rating_stats}")
             
-            # Analyze confidence
-            confidence_stats = reviews_df.select("review.confidence").summary("count", "mean", "stddev", "min", "max")
-            logger.info("Confidence statistics:")
-            confidence_stats.show()
+            confidence_stats = {**sketches.percentiles("confidence"), **exact_stats["confidence"]}
+            logger.info(f"Confidence statistics: {confidence_stats}")
             
             return {
                 "papers_with_reviews": review_count,
                 "rating_stats": rating_stats,
-                "confidence_stats": confidence_stats
+                "confidence_stats": confidence_stats,
+                "rating_by_decision": {
+                    decision: sketches.percentiles("rating", decision=decision)
+                    for decision in sketches.groups("decision")
+                },
+                "sketches": sketches
             }
         
         return None
@@ -162,10 +456,12 @@ class ICLRPaperProcessor:
             avg(size(col("authors"))).alias("avg_authors_per_paper")
         ).orderBy("year")
         
-        # Decision analysis
+        # Decision analysis, labelled via the (broadcast) decision lookup
         decision_stats = papers_df.groupBy("decision").agg(
             count("*").alias("paper_count"),
             avg(size(col("authors"))).alias("avg_authors_per_paper")
+        ).join(
+            self.decision_lookup(), on="decision", how="left"
         ).orderBy("paper_count", ascending=False)
         
         # Author analysis
@@ -182,25 +478,102 @@ class ICLRPaperProcessor:
         
         return report
     
+    def decision_lookup(self):
+        """Decision label lookup table, broadcast when the auto-tuner allows it"""
+        lookup_df = self.spark.createDataFrame(DECISION_LABELS, ["decision", "label", "track"])
+        if self.auto_tuner:
+            return self.auto_tuner.broadcast_lookup(lookup_df, "decision_labels")
+        return lookup_df
+    
+    def load_prompt_metadata(self, prompts_path):
+        """
+        Prompt id -> (prompt_type, text) rows from a prompts file, the JSON object bulk_load.py
+        takes; prompt_type comes from stats_prompt when it is not given, as in bulk_load.py
+        """
+        prompts = prompt_entries(json.loads("\n".join(self.spark.sparkContext.textFile(prompts_path).collect())))
+        return [(prompt_id, int(entry["prompt_type"]), entry.get("prompt")) for prompt_id, entry in prompts.items()]
+    
+    def prompt_lookup(self, prompts_path):
+        """Prompt metadata lookup table, broadcast when the auto-tuner allows it"""
+        lookup_df = self.spark.createDataFrame(
+            self.load_prompt_metadata(prompts_path),
+            StructType([
+                StructField("prompt", StringType(), False),
+                StructField("prompt_type", IntegerType(), True),
+                StructField("prompt_text", StringType(), True)
+            ])
+        )
+        if self.auto_tuner:
+            return self.auto_tuner.broadcast_lookup(lookup_df, "prompt_metadata")
+        return lookup_df
+    
+    def analyze_predictions(self, papers_df, predictions_path, prompts_path=None):
+        """Confusion counts per prompt and rebuttal flag, labelled via the (broadcast) lookups"""
+        logger.info("Analyzing predictions...")
+        
+        predictions_df = self.spark.read.json(predictions_path)
+        # Older result files spell the field "prediciton"
+        prediction_col = "prediction" if "prediction" in predictions_df.columns else "prediciton"
+        predictions_df = predictions_df.select(
+            col("s_id").cast("string").alias("s_id"),
+            col("prompt").cast("string").alias("prompt"),
+            col("rebuttal").cast("int").alias("rebuttal"),
+            col(prediction_col).cast("string").alias("prediction")
+        ).filter(col("s_id").isNotNull() & col("prediction").isNotNull())
+        
+        # Decisions missing from DECISION_LABELS (or null) are kept and counted as unlabelled
+        labelled = predictions_df.join(
+            papers_df.select("s_id", "decision"), on="s_id", how="inner"
+        ).join(
+            self.decision_lookup(), on="decision", how="left"
+        ).withColumn("label", coalesce(col("label"), lit("unknown")))
+        predicted_accept = col("prediction").rlike("(?i)^[ *]*(yes|accept)[ *]*$")
+        actual_accept = col("label") == "Accept"
+        actual_reject = col("label") == "Reject"
+        prompt_stats = labelled.groupBy("prompt", "rebuttal").agg(
+            count("*").alias("number_of_predictions"),
+            count(when(predicted_accept & actual_accept, 1)).alias("TP"),
+            count(when(predicted_accept & actual_reject, 1)).alias("FP"),
+            count(when(~predicted_accept & actual_reject, 1)).alias("TN"),
+            count(when(~predicted_accept & actual_accept, 1)).alias("FN"),
+            count(when(col("label") == "unknown", 1)).alias("unlabelled")
+        ).withColumn(
+            "accuracy", (col("TP") + col("TN")) / (col("number_of_predictions") - col("unlabelled"))
+        )
+        
+        if prompts_path:
+            prompt_stats = prompt_stats.join(self.prompt_lookup(prompts_path), on="prompt", how="left")
+        
+        prompt_stats = prompt_stats.orderBy("prompt", "rebuttal")
+        logger.info("Prediction accuracy per prompt:")
+        prompt_stats.show()
+        return prompt_stats
+    
     def save_results_to_s3(self, results, timestamp):
         """Save processing results back to S3"""
         logger.info("Saving results to S3...")
         
         # Save year distribution
         results["year_analysis"].write.mode("overwrite").json(
-            f"s3://{self.s3_bucket}/{self.s3_prefix}/analytics/year_distribution_{timestamp}/"
+            f"{self.papers_root()}/analytics/year_distribution_{timestamp}/"
         )
         
         # Save decision distribution
         results["decision_analysis"].write.mode("overwrite").json(
-            f"s3://{self.s3_bucket}/{self.s3_prefix}/analytics/decision_distribution_{timestamp}/"
+            f"{self.papers_root()}/analytics/decision_distribution_{timestamp}/"
         )
         
         # Save top authors
         results["top_authors"].write.mode("overwrite").json(
-            f"s3://{self.s3_bucket}/{self.s3_prefix}/analytics/top_authors_{timestamp}/"
+            f"{self.papers_root()}/analytics/top_authors_{timestamp}/"
         )
         
+        # Save per-prompt prediction metrics
+        if results.get("prompt_analysis") is not None:
+            results["prompt_analysis"].write.mode("overwrite").json(
+                f"{self.papers_root()}/analytics/prompt_metrics_{timestamp}/"
+            )
+        
         # Save summary report
         summary = {
             "timestamp": timestamp,
@@ -211,24 +584,37 @@ class ICLRPaperProcessor:
         # Convert to RDD and save
         summary_rdd = self.spark.sparkContext.parallelize([json.dumps(summary)])
         summary_rdd.saveAsTextFile(
-            f"s3://{self.s3_bucket}/{self.s3_prefix}/analytics/summary_{timestamp}/"
+            f"{self.papers_root()}/analytics/summary_{timestamp}/"
         )
         
-        logger.info(f"Results saved to s3://{self.s3_bucket}/{self.s3_prefix}/analytics/")
+        logger.info(f"Results saved to {self.papers_root()}/analytics/")
     
-    def process_papers(self, timestamp=None):
+    def process_papers(self, timestamp=None, multi_year=False, predictions_path=None, prompts_path=None):
         """Main processing pipeline"""
         logger.info("Starting paper processing pipeline...")
         
+        # The manifest records the chunk encoding (and zstd dictionaries) of the export
+        manifest = self.load_export_manifest(timestamp) if timestamp else None
+        
         # Load papers
-        papers_df = self.load_papers_from_s3(timestamp)
+        if multi_year:
+            papers_df = self.load_multi_year_papers_from_s3(timestamp, manifest=manifest)
+        else:
+            papers_df = self.load_papers_from_s3(timestamp, manifest=manifest)
+        
+        # Counts the exporter aggregated server-side replace rescans and cross-check the load
+        collection_summary = self.manifest_collection_summary(manifest)
+        manifest_cross_checks = self.cross_check_manifest(collection_summary)
         
-        # Cache DataFrame for multiple operations
-        papers_df.cache()
+        # Repartition and cache DataFrame for multiple operations
+        if self.auto_tuner:
+            papers_df = self.auto_tuner.tune(papers_df, self.papers_path, self.loaded_row_count)
+        else:
+            papers_df.cache()
         
         try:
             # Analyze distributions
-            distributions = self.analyze_paper_distribution(papers_df)
+            distributions = self.analyze_paper_distribution(papers_df, collection_summary)
             
             # Validate quality
             quality_report = self.validate_paper_quality(papers_df)
@@ -238,6 +624,10 @@ class ICLRPaperProcessor:
             
             # Generate comprehensive report
             analytics_report = self.generate_analytics_report(papers_df)
+            if predictions_path:
+                analytics_report["prompt_analysis"] = self.analyze_predictions(
+                    papers_df, predictions_path, prompts_path
+                )
             
             # Save results
             processing_timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -256,15 +646,71 @@ class ICLRPaperProcessor:
                 "success": True,
                 "papers_processed": papers_df.count(),
                 "quality_score": quality_report['quality_score'],
-                "timestamp": processing_timestamp
+                "timestamp": processing_timestamp,
+                "export_profile": self.export_profile_name(manifest),
+                "auto_tune_decisions": self.auto_tuner.summary() if self.auto_tuner else [],
+                "manifest_cross_checks": manifest_cross_checks
             }
             
         finally:
             # Uncache DataFrame
             papers_df.unpersist()
 
+def run_local_benchmark(papers_glob, iterations=3):
+    """Compare default loading against auto-tuned loading in Spark local mode"""
+    spark = SparkSession.builder \
+        .appName("ICLR-AutoTune-Benchmark") \
+        .master("local[*]") \
+        .config("spark.sql.adaptive.enabled", "true") \
+        .getOrCreate()
+    
+    def workload(papers_df):
+        papers_df.groupBy("year").count().collect()
+        papers_df.groupBy("decision").count().collect()
+        papers_df.filter(col("title").contains("learning")).count()
+        papers_df.select(explode("authors")).groupBy("col").count().collect()
+    
+    def load():
+        raw_df = spark.read.option("multiLine", "true").json(papers_glob)
+        return raw_df.select(explode("papers").alias("paper")).select("paper.*")
+    
+    timings = {"default": [], "auto_tuned": []}
+    try:
+        for _ in range(iterations):
+            start_time = time.time()
+            papers_df = load().cache()
+            workload(papers_df)
+            timings["default"].append(time.time() - start_time)
+            papers_df.unpersist()
+            
+            tuner = SparkAutoTuner(spark)
+            start_time = time.time()
+            papers_df = load()
+            papers_df = tuner.tune(papers_df, papers_glob, papers_df.count())
+            workload(papers_df)
+            timings["auto_tuned"].append(time.time() - start_time)
+            papers_df.unpersist()
+        
+        best_default = builtins.min(timings["default"])
+        best_tuned = builtins.min(timings["auto_tuned"])
+        logger.info(f"""
+        ⏱️ Auto-tune Benchmark ({iterations} iterations, best of):
+        - Default loading: {best_default:.2f} seconds
+        - Auto-tuned loading: {best_tuned:.2f} seconds
+        - Speedup: {best_default / best_tuned:.2f}x
+        - Decisions: {tuner.summary()}
+        """)
+        return timings
+    finally:
+        spark.stop()
+
 def main():
     """Main execution function"""
+    if len(sys.argv) > 2 and sys.argv[1] == "--benchmark":
+        # Usage: emr-process-20000-papers.py --benchmark "/path/to/chunk_*.json"
+        run_local_benchmark(sys.argv[2])
+        return
+    
     logger.info("Starting EMR paper processing...")
     
     # Initialize Spark session
@@ -282,8 +728,15 @@ def main():
         # Initialize processor
         processor = ICLRPaperProcessor(spark, S3_BUCKET, S3_PREFIX)
         
-        # Process papers
-        result = processor.process_papers()
+        # Process papers (MULTI_YEAR=true reads a year-partitioned export; EXPORT_TIMESTAMP
+        # selects one export and its manifest; PREDICTIONS_PATH adds per-prompt metrics, labelled
+        # with the prompt metadata in PROMPTS_PATH)
+        result = processor.process_papers(
+            timestamp=os.getenv('EXPORT_TIMESTAMP'),
+            multi_year=os.getenv('MULTI_YEAR', 'false') == 'true',
+            predictions_path=os.getenv('PREDICTIONS_PATH'),
+            prompts_path=os.getenv('PROMPTS_PATH')
+        )
         
         if result["success"]:
             logger.info("✅ Paper processing completed successfully!")
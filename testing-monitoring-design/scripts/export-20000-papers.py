@@ -5,107 +5,820 @@ This script efficiently exports large datasets from MongoDB to S3
 """
 
 import os
+import sys
 import json
+import gzip
+import hashlib
+import struct
 import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+import bson
+from bson import json_util
 from pymongo import MongoClient
+from pymongo.errors import OperationFailure
 from datetime import datetime
 import logging
-from concurrent.futures import ThreadPoolExecutor
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from contextlib import contextmanager
+import resource
+import threading
 import time
+import tracemalloc
+
+# The chunk encodings live in chunk_reader.py, next to the EMR jobs that read them back
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "emr", "scripts"))
+from chunk_reader import CHUNK_SUFFIXES, PAPER_CHUNK_MAGIC, decode_chunk, paper_decompressor
+
+try:
+    import psutil
+except ImportError:  # RSS falls back to /proc when psutil is not installed
+    psutil = None
+
+try:
+    import zstandard
+except ImportError:  # only needed for EXPORT_COMPRESSION=zstd-dict
+    zstandard = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Server-side projections per export profile; None exports whole documents.
+# reviews-numeric mirrors getAllSubmissionsWithPartialMetareviews in the 02ICLR dao.
+EXPORT_PROFILES = {
+    # abstract stays in every profile: the EMR quality checks and sketches read it
+    "analytics-lite": {
+        "s_id": 1, "title": 1, "authors": 1, "abstract": 1, "year": 1, "decision": 1
+    },
+    "reviews-numeric": {
+        "s_id": 1, "title": 1, "authors": 1, "abstract": 1, "year": 1, "url": 1, "decision": 1,
+        "metareviews.values.soundness": 1,
+        "metareviews.values.presentation": 1,
+        "metareviews.values.contribution": 1,
+        "metareviews.values.rating": 1,
+        "metareviews.values.confidence": 1
+    },
+    "full-text": None
+}
+
+# Memory profiling: phases of a chunk export, in order
+PROFILE_PHASES = ["fetch", "convert_object_ids", "json_dumps", "upload"]
+# Headroom applied to measured per-paper memory when recommending settings
+PROFILE_SAFETY_FACTOR = 1.25
+MIN_RECOMMENDED_CHUNK_SIZE = 100
+MAX_RECOMMENDED_CHUNK_SIZE = 5000
+
+# Auto-tuning: chunk sizes probed, and the share of the best predicted
+# throughput at which fewer workers are preferred
+AUTO_TUNE_CHUNK_SIZES = [250, 500, 1000, 2000]
+AUTO_TUNE_MAX_WORKERS = 16
+AUTO_TUNE_SATURATION = 0.97
+
+# botocore pools 10 connections per client by default, so more workers than that
+# kept discarding and reopening connections (seen in the s3-standin.py sweep)
+S3_MAX_POOL_CONNECTIONS = 2 * AUTO_TUNE_MAX_WORKERS
+
+# Documents encoded to estimate the collection size when collStats is unavailable
+SUMMARY_SIZE_SAMPLE = 200
+
+# Chunk encodings. zstd-dict compresses every paper as its own frame with a dictionary
+# trained on a sample of the collection, so one paper decodes without the rest of its chunk
+CHUNK_COMPRESSIONS = ["none", "gzip", "zstd-dict"]
+CHUNK_CONTENT_TYPES = {"none": 'application/json', "gzip": 'application/gzip', "zstd-dict": 'application/octet-stream'}
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 12
+ZSTD_DICT_SIZE = 112 * 1024
+ZSTD_DICT_SAMPLE_PAPERS = 2000
+
+def create_s3_client():
+    """S3 client for the exporters; S3_ENDPOINT_URL points it at an S3-compatible endpoint"""
+    return boto3.client(
+        's3',
+        endpoint_url=os.getenv('S3_ENDPOINT_URL') or None,
+        config=Config(max_pool_connections=S3_MAX_POOL_CONNECTIONS)
+    )
+
+def convert_object_ids(papers):
+    """Convert ObjectId to string for JSON serialization"""
+    for paper in papers:
+        paper['_id'] = str(paper['_id'])
+
+def dump_chunk(papers, chunk_num, timestamp):
+    """Wrap papers with chunk metadata and render the chunk JSON"""
+    chunk_data = {
+        "chunk_number": chunk_num,
+        "total_papers": len(papers),
+        "export_timestamp": timestamp,
+        "papers": papers
+    }
+    
+    return json.dumps(chunk_data, indent=2)
+
+def dump_paper(paper):
+    """Compact JSON of one paper, as zstd-dict frames and dictionary samples hold it"""
+    return json.dumps(paper, separators=(',', ':')).encode('utf-8')
+
+def train_paper_dictionary(papers, dict_size=ZSTD_DICT_SIZE):
+    """zstd dictionary trained on sample papers (ObjectIds already converted)"""
+    if zstandard is None:
+        raise RuntimeError("EXPORT_COMPRESSION=zstd-dict needs the zstandard package")
+    return zstandard.train_dictionary(dict_size, [dump_paper(paper) for paper in papers]).as_bytes()
+
+def encode_paper_chunk(papers, chunk_num, timestamp, dictionary, level=ZSTD_LEVEL):
+    """zstd-dict chunk: one dictionary-compressed frame per paper behind an index header"""
+    compression_dict = zstandard.ZstdCompressionDict(dictionary)
+    compressor = zstandard.ZstdCompressor(level=level, dict_data=compression_dict)
+    frames, index, offset = [], [], 0
+    for paper in papers:
+        frame = compressor.compress(dump_paper(paper))
+        index.append([paper.get('s_id'), offset, len(frame)])
+        frames.append(frame)
+        offset += len(frame)
+    header = json.dumps({
+        "chunk_number": chunk_num,
+        "total_papers": len(papers),
+        "export_timestamp": timestamp,
+        "dict_id": compression_dict.dict_id(),
+        "papers": index
+    }, separators=(',', ':')).encode('utf-8')
+    return PAPER_CHUNK_MAGIC + struct.pack('<I', len(header)) + header + b"".join(frames)
+
+def decode_paper(frame, dictionary):
+    """One paper from its frame (e.g. fetched with a ranged GET of data offset + offset)"""
+    return json.loads(paper_decompressor(dictionary).decompress(frame))
+
+def encode_chunk(papers, chunk_num, timestamp, compression="none", dictionary=None, level=ZSTD_LEVEL):
+    """Chunk body in the configured encoding (str for plain JSON, bytes otherwise)"""
+    if compression == "zstd-dict":
+        return encode_paper_chunk(papers, chunk_num, timestamp, dictionary, level)
+    body = dump_chunk(papers, chunk_num, timestamp)
+    if compression == "gzip":
+        # mtime=0 keeps the bytes, and so the checksum, identical when a chunk is re-exported
+        return gzip.compress(body.encode('utf-8'), GZIP_LEVEL, mtime=0)
+    return body
+
+def serialize_chunk(papers, chunk_num, timestamp, compression="none", dictionary=None, level=ZSTD_LEVEL):
+    """Serialize a chunk of papers (module level so it can run in a process pool)"""
+    convert_object_ids(papers)
+    return encode_chunk(papers, chunk_num, timestamp, compression, dictionary, level)
+
+def current_rss_bytes():
+    """Resident set size of this process"""
+    if psutil:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        # Peak rather than current RSS, but the best available without /proc
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class RSSSampler:
+    """Background thread tracking the peak RSS between resets"""
+    
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = current_rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss_bytes())
+    
+    def start(self):
+        self._thread.start()
+        return self
+    
+    def reset_peak(self):
+        self.peak = current_rss_bytes()
+        return self.peak
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+class ChunkMemoryProfiler:
+    """Attributes one chunk's memory to its export phases with tracemalloc and RSS sampling
+    
+    Traced figures are relative to the start of the chunk, so a phase's
+    traced peak is the memory the chunk held at its high-water mark.
+    """
+    
+    def __init__(self, rss_sampler=None, enabled=True, top_allocations=3):
+        self.enabled = enabled and tracemalloc.is_tracing()
+        self.rss_sampler = rss_sampler
+        self.top_allocations = top_allocations
+        self.phases = {}
+        if self.enabled:
+            self.start_traced, _ = tracemalloc.get_traced_memory()
+            self.start_rss = current_rss_bytes()
+            self.snapshot = tracemalloc.take_snapshot()
+    
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        
+        phase_start, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        if self.rss_sampler:
+            self.rss_sampler.reset_peak()
+        start_time = time.perf_counter()
+        
+        yield
+        
+        elapsed = time.perf_counter() - start_time
+        current, peak = tracemalloc.get_traced_memory()
+        rss_peak = max(self.rss_sampler.peak if self.rss_sampler else 0, current_rss_bytes())
+        
+        # Largest allocation growth since the previous phase, by source line
+        snapshot = tracemalloc.take_snapshot()
+        top = snapshot.compare_to(self.snapshot, 'lineno')[:self.top_allocations]
+        self.snapshot = snapshot
+        
+        self.phases[name] = {
+            "seconds": round(elapsed, 4),
+            "traced_peak_mb": round((peak - self.start_traced) / (1024 * 1024), 2),
+            "traced_net_mb": round((current - phase_start) / (1024 * 1024), 2),
+            "rss_peak_mb": round(rss_peak / (1024 * 1024), 1),
+            "top_allocations": [
+                {"location": str(stat.traceback), "size_diff_kb": round(stat.size_diff / 1024, 1)}
+                for stat in top
+            ]
+        }
+    
+    def result(self, paper_count):
+        """Per-chunk profile for the journal and manifest"""
+        if not self.enabled:
+            return None
+        peak_phase = max(self.phases, key=lambda name: self.phases[name]["traced_peak_mb"])
+        rss_peak_mb = max(phase["rss_peak_mb"] for phase in self.phases.values())
+        return {
+            "papers": paper_count,
+            "rss_start_mb": round(self.start_rss / (1024 * 1024), 1),
+            "rss_peak_mb": rss_peak_mb,
+            "traced_peak_mb": self.phases[peak_phase]["traced_peak_mb"],
+            "peak_phase": peak_phase,
+            "phases": self.phases
+        }
+
+def recommend_export_settings(chunk_profiles, memory_budget_mb, max_workers=8):
+    """Largest worker count, then chunk size, whose estimated peak fits the memory budget
+    
+    The peak of the threaded engine is modelled as the RSS before the export
+    plus max_workers chunks at the measured per-paper high-water mark.
+    """
+    profiles = [p for p in chunk_profiles if p and p.get("papers")]
+    if not profiles or not memory_budget_mb:
+        return None
+    
+    baseline_mb = min(p["rss_start_mb"] for p in profiles)
+    # Per-paper cost from whichever of traced and RSS growth is larger, in the worst chunk
+    per_paper_mb = max(
+        max(p["traced_peak_mb"], p["rss_peak_mb"] - p["rss_start_mb"]) / p["papers"]
+        for p in profiles
+    ) * PROFILE_SAFETY_FACTOR
+    available_mb = memory_budget_mb - baseline_mb
+    
+    recommendation = None
+    for workers in range(max(1, max_workers), 0, -1):
+        chunk_size = min(int(available_mb / (workers * per_paper_mb)), MAX_RECOMMENDED_CHUNK_SIZE)
+        if chunk_size >= MIN_RECOMMENDED_CHUNK_SIZE or workers == 1:
+            recommendation = {"chunk_size": max(chunk_size, 1), "max_workers": workers}
+            break
+    
+    recommendation.update({
+        "memory_budget_mb": memory_budget_mb,
+        "baseline_rss_mb": baseline_mb,
+        "per_paper_mb": round(per_paper_mb, 4),
+        "estimated_peak_mb": round(
+            baseline_mb + recommendation["max_workers"] * recommendation["chunk_size"] * per_paper_mb, 1
+        ),
+        "fits_budget": recommendation["chunk_size"] >= MIN_RECOMMENDED_CHUNK_SIZE
+    })
+    return recommendation
+
+def system_memory_mb():
+    """Physical memory of this machine"""
+    if psutil:
+        return psutil.virtual_memory().total / (1024 * 1024)
+    return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / (1024 * 1024)
+
+def choose_export_settings(probes, per_paper_mb, baseline_mb, memory_cap_mb, max_workers=AUTO_TUNE_MAX_WORKERS):
+    """Pick the chunk size and worker count with the best predicted papers/sec under the memory cap
+    
+    Fetch and upload overlap across worker threads while serialization holds
+    the GIL, so a chunk costs (fetch + serialize + upload) / workers seconds of
+    wall time but never less than its serialize time.
+    """
+    candidates = []
+    for probe in probes:
+        chunk_time = probe["fetch_s"] + probe["serialize_s"] + probe["upload_s"]
+        for workers in range(1, max_workers + 1):
+            estimated_peak_mb = baseline_mb + workers * probe["chunk_size"] * per_paper_mb
+            if estimated_peak_mb > memory_cap_mb:
+                break
+            seconds_per_chunk = max(chunk_time / workers, probe["serialize_s"], 1e-6)
+            candidates.append({
+                "chunk_size": probe["chunk_size"],
+                "max_workers": workers,
+                "predicted_papers_per_s": round(probe["chunk_size"] / seconds_per_chunk, 1),
+                "estimated_peak_mb": round(estimated_peak_mb, 1)
+            })
+    
+    if not candidates:
+        return None
+    # Near the best throughput, fewer workers and smaller chunks are cheaper for the same speed
+    best = max(c["predicted_papers_per_s"] for c in candidates)
+    return min(
+        (c for c in candidates if c["predicted_papers_per_s"] >= AUTO_TUNE_SATURATION * best),
+        key=lambda c: (c["max_workers"], c["chunk_size"])
+    )
+
+class ExportJournal:
+    """Per-chunk progress journal stored next to an export in S3"""
+    
+    def __init__(self, s3_client, s3_bucket, journal_prefix):
+        self.s3_client = s3_client
+        self.s3_bucket = s3_bucket
+        self.journal_prefix = journal_prefix
+    
+    def _put(self, key, document):
+        # bson's json_util keeps ObjectId key boundaries round-trippable
+        self.s3_client.put_object(
+            Bucket=self.s3_bucket,
+            Key=key,
+            Body=json_util.dumps(document, indent=2),
+            ContentType='application/json'
+        )
+    
+    def load_plan(self):
+        """Return the chunk plan of an earlier run, or None for a fresh export"""
+        try:
+            response = self.s3_client.get_object(
+                Bucket=self.s3_bucket,
+                Key=f"{self.journal_prefix}/plan.json"
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None
+            raise
+        return json_util.loads(response['Body'].read())
+    
+    def save_plan(self, plan):
+        """Persist the chunk plan so reruns reuse the same key ranges"""
+        self._put(f"{self.journal_prefix}/plan.json", plan)
+    
+    def record_chunk(self, entry):
+        """Record a finished chunk; each entry is its own object so writers never contend"""
+        self._put(f"{self.journal_prefix}/chunks/chunk_{entry['chunk_number']:04d}.json", entry)
+    
+    def completed_chunks(self):
+        """Journal entries of every chunk recorded as finished, keyed by chunk number"""
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        entries = {}
+        for page in paginator.paginate(Bucket=self.s3_bucket, Prefix=f"{self.journal_prefix}/chunks/"):
+            for obj in page.get('Contents', []):
+                response = self.s3_client.get_object(Bucket=self.s3_bucket, Key=obj['Key'])
+                entry = json_util.loads(response['Body'].read())
+                entries[entry['chunk_number']] = entry
+        return entries
+
 class MongoDBToS3Exporter:
-    def __init__(self, mongo_uri, db_name, collection_name, s3_bucket, s3_prefix):
+    def __init__(self, mongo_uri, db_name, collection_name, s3_bucket, s3_prefix, partition=None,
+                 profile="full-text", profile_memory=False, memory_budget_mb=None, client=None,
+                 max_pool_size=32, compression="none", zstd_level=ZSTD_LEVEL):
+        if profile not in EXPORT_PROFILES:
+            raise ValueError(f"Unknown export profile '{profile}', expected one of {sorted(EXPORT_PROFILES)}")
+        if compression not in CHUNK_COMPRESSIONS:
+            raise ValueError(f"Unknown chunk compression '{compression}', expected one of {CHUNK_COMPRESSIONS}")
+        if compression == "zstd-dict" and zstandard is None:
+            raise RuntimeError("EXPORT_COMPRESSION=zstd-dict needs the zstandard package")
         self.mongo_uri = mongo_uri
         self.db_name = db_name
         self.collection_name = collection_name
         self.s3_bucket = s3_bucket
         self.s3_prefix = s3_prefix
-        self.s3_client = boto3.client('s3')
+        # Optional Hive-style partition directory, e.g. "export_year=2025"
+        self.partition = partition
+        self.profile = profile
+        self.projection = EXPORT_PROFILES[profile]
+        self.s3_client = create_s3_client()
+        self.last_export = {}
+        # Opt-in per-chunk memory profiling (threaded engine)
+        self.profile_memory = profile_memory
+        self.memory_budget_mb = memory_budget_mb
+        self.rss_sampler = None
+        # One pooled client for every query of the run; MultiYearExporter shares its own
+        self.client = client
+        self.owns_client = client is None
+        self.max_pool_size = max_pool_size
+        # Export-time $facet summary of the collection, kept in the plan and manifest
+        self.collection_summary = None
+        self.cross_checks = []
+        # Chunk encoding; for zstd-dict the trained dictionary is kept in the plan and manifest
+        self.compression = compression
+        self.zstd_level = zstd_level
+        self.dictionary = None
+        self.compression_info = {"codec": compression}
+    
+    def get_collection(self):
+        """Collection on the shared pooled client (connected on first use)"""
+        if self.client is None:
+            self.client = MongoClient(self.mongo_uri, maxPoolSize=self.max_pool_size)
+        return self.client[self.db_name][self.collection_name]
+    
+    def close(self):
+        """Close the pooled client if this exporter created it"""
+        if self.client is not None and self.owns_client:
+            self.client.close()
+            self.client = None
+    
+    def papers_prefix(self):
+        """S3 prefix that chunk files are written under"""
+        if self.partition:
+            return f"{self.s3_prefix}/papers/{self.partition}"
+        return f"{self.s3_prefix}/papers"
+    
+    def journal_for(self, timestamp):
+        """Progress journal for one export run"""
+        journal_prefix = f"{self.s3_prefix}/journals/{timestamp}"
+        if self.partition:
+            journal_prefix = f"{journal_prefix}/{self.partition}"
+        return ExportJournal(self.s3_client, self.s3_bucket, journal_prefix)
         
     def get_total_papers(self):
-        """Get total count of papers in MongoDB"""
-        client = MongoClient(self.mongo_uri)
-        db = client[self.db_name]
-        collection = db[self.collection_name]
+        """Get total count of papers in MongoDB (from the export-time summary when there is one)"""
+        if self.collection_summary:
+            return self.collection_summary["total_papers"]
         
-        total_count = collection.count_documents({})
+        total_count = self.get_collection().count_documents({})
         logger.info(f"Total papers in MongoDB: {total_count}")
         return total_count
     
-    def export_papers_in_chunks(self, chunk_size=1000, max_workers=4):
-        """Export papers in parallel chunks for better performance"""
-        client = MongoClient(self.mongo_uri)
-        db = client[self.db_name]
-        collection = db[self.collection_name]
+    def collect_collection_summary(self, collection):
+        """Counts, review-count histogram and size of the collection from one $facet aggregation"""
+        facets = {
+            "total": [{"$count": "count"}],
+            "by_year_decision": [
+                {"$group": {"_id": {"year": "$year", "decision": "$decision"}, "count": {"$sum": 1}}}
+            ],
+            "review_counts": [
+                {"$group": {"_id": {"$size": {"$ifNull": ["$metareviews", []]}}, "count": {"$sum": 1}}}
+            ],
+            "bytes": [{"$group": {"_id": None, "bson_bytes": {"$sum": {"$bsonSize": "$$ROOT"}}}}]
+        }
+        try:
+            result = next(collection.aggregate([{"$facet": facets}], allowDiskUse=True))
+            bson_bytes = result["bytes"][0]["bson_bytes"] if result["bytes"] else 0
+        except OperationFailure:
+            # $bsonSize needs MongoDB 4.4+; fall back to the collection's data size
+            del facets["bytes"]
+            result = next(collection.aggregate([{"$facet": facets}], allowDiskUse=True))
+            total = result["total"][0]["count"] if result["total"] else 0
+            bson_bytes = self.estimate_collection_bytes(collection, total)
         
-        # Get total count
-        total_papers = self.get_total_papers()
+        by_year, by_decision, by_year_decision = {}, {}, {}
+        for row in result["by_year_decision"]:
+            year = str(row["_id"].get("year") or "unknown")
+            decision = str(row["_id"].get("decision") or "unknown")
+            by_year[year] = by_year.get(year, 0) + row["count"]
+            by_decision[decision] = by_decision.get(decision, 0) + row["count"]
+            by_year_decision.setdefault(year, {})[decision] = row["count"]
         
-        # Calculate number of chunks
-        num_chunks = (total_papers + chunk_size - 1) // chunk_size
-        logger.info(f"Exporting {total_papers} papers in {num_chunks} chunks of {chunk_size}")
+        summary = {
+            "total_papers": result["total"][0]["count"] if result["total"] else 0,
+            "by_year": dict(sorted(by_year.items())),
+            "by_decision": dict(sorted(by_decision.items())),
+            "by_year_decision": dict(sorted(by_year_decision.items())),
+            "review_count_histogram": {
+                str(row["_id"]): row["count"] for row in sorted(result["review_counts"], key=lambda r: r["_id"])
+            },
+            "bson_bytes": bson_bytes,
+            "computed_at": datetime.now().isoformat()
+        }
+        logger.info(
+            f"Collection summary: {summary['total_papers']} papers, "
+            f"{bson_bytes / (1024 * 1024):.2f} MB BSON, years {summary['by_year']}"
+        )
+        return summary
+    
+    def estimate_collection_bytes(self, collection, total_papers):
+        """Data size from collStats, or extrapolated from sample documents where collStats is missing"""
+        try:
+            return collection.database.command({"collStats": collection.name}).get("size", 0)
+        except (OperationFailure, NotImplementedError):
+            # Servers without collStats permission, or in-memory test doubles like mongomock
+            sample = [len(bson.encode(doc)) for doc in collection.find().limit(SUMMARY_SIZE_SAMPLE)]
+            return int(sum(sample) / len(sample) * total_papers) if sample else 0
+    
+    def plan_chunks(self, collection, chunk_size):
+        """Split the collection into contiguous _id ranges of chunk_size papers"""
+        boundaries = []
+        total_papers = 0
+        for position, doc in enumerate(collection.find({}, {'_id': 1}).sort('_id', 1)):
+            if position % chunk_size == 0:
+                boundaries.append(doc['_id'])
+            total_papers = position + 1
         
-        # Create timestamp for this export
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        chunks = [
+            {
+                "chunk_number": chunk_num,
+                "start_id": start_id,
+                "end_id": boundaries[chunk_num + 1] if chunk_num + 1 < len(boundaries) else None
+            }
+            for chunk_num, start_id in enumerate(boundaries)
+        ]
+        return {
+            "chunk_size": chunk_size,
+            "total_papers": total_papers,
+            "profile": self.profile,
+            "chunks": chunks
+        }
+    
+    def prepare_export(self, collection, chunk_size, timestamp=None):
+        """Load or create the chunk plan and work out which chunks still need exporting"""
+        # Create timestamp for this export (shared when several collections export together)
+        timestamp = timestamp or datetime.now().strftime('%Y%m%d_%H%M%S')
+        journal = self.journal_for(timestamp)
         
-        # Export chunks in parallel
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = []
-            
-            for chunk_num in range(num_chunks):
-                skip = chunk_num * chunk_size
-                future = executor.submit(
-                    self.export_chunk,
-                    collection,
-                    skip,
-                    chunk_size,
-                    chunk_num,
-                    timestamp
+        plan = journal.load_plan()
+        if plan is None:
+            plan = self.plan_chunks(collection, chunk_size)
+            # Taken with the plan so a resumed export cross-checks against the same figures
+            plan["collection_summary"] = self.collect_collection_summary(collection)
+            plan["compression"] = self.prepare_compression(collection, timestamp)
+            journal.save_plan(plan)
+        else:
+            if plan.get("profile", "full-text") != self.profile:
+                raise ValueError(
+                    f"Export {timestamp} was started with profile '{plan.get('profile')}', "
+                    f"cannot resume it with '{self.profile}'"
                 )
-                futures.append(future)
-            
-            # Wait for all chunks to complete
-            for future in futures:
-                future.result()
+            compression = plan.get("compression", {"codec": "none"})
+            if compression["codec"] != self.compression:
+                raise ValueError(
+                    f"Export {timestamp} was started with compression '{compression['codec']}', "
+                    f"cannot resume it with '{self.compression}'"
+                )
+            # Resumed chunks are compressed with the dictionary the finished ones used
+            self.load_dictionary(compression)
+            logger.info(f"Resuming export {timestamp} with its original plan of {len(plan['chunks'])} chunks")
+        self.collection_summary = plan.get("collection_summary") or self.collect_collection_summary(collection)
+        
+        completed = {
+            chunk_num: entry
+            for chunk_num, entry in journal.completed_chunks().items()
+            if self.chunk_is_intact(entry)
+        }
+        pending = [chunk for chunk in plan["chunks"] if chunk["chunk_number"] not in completed]
+        
+        logger.info(
+            f"Exporting {plan['total_papers']} papers in {len(plan['chunks'])} chunks of {plan['chunk_size']} "
+            f"with profile '{self.profile}' "
+            f"({len(completed)} already complete, {len(pending)} pending)"
+        )
+        return timestamp, plan, journal, pending
+    
+    def dictionary_key(self, timestamp):
+        """S3 key of the zstd dictionary of one export run"""
+        if self.partition:
+            return f"{self.s3_prefix}/dictionaries/{self.partition}/papers_{timestamp}.zdict"
+        return f"{self.s3_prefix}/dictionaries/papers_{timestamp}.zdict"
+    
+    def prepare_compression(self, collection, timestamp):
+        """Train and upload the zstd dictionary of a new export; returns what the plan records"""
+        if self.compression != "zstd-dict":
+            self.compression_info = {"codec": self.compression}
+            return self.compression_info
         
-        logger.info(f"Export completed! All {num_chunks} chunks uploaded to S3")
+        self.dictionary, sample = self.sample_dictionary(collection)
+        
+        s3_key = self.dictionary_key(timestamp)
+        checksum = hashlib.sha256(self.dictionary).hexdigest()
+        self.s3_client.put_object(
+            Bucket=self.s3_bucket,
+            Key=s3_key,
+            Body=self.dictionary,
+            ContentType='application/octet-stream',
+            Metadata={'sha256': checksum}
+        )
+        self.compression_info = {
+            "codec": "zstd-dict",
+            "level": self.zstd_level,
+            "dictionary": {
+                "s3_key": s3_key,
+                "dict_id": zstandard.ZstdCompressionDict(self.dictionary).dict_id(),
+                "sha256": checksum,
+                "bytes": len(self.dictionary),
+                "trained_on_papers": len(sample)
+            }
+        }
+        logger.info(
+            f"Trained a {len(self.dictionary) / 1024:.0f} KB zstd dictionary on {len(sample)} papers: "
+            f"s3://{self.s3_bucket}/{s3_key}"
+        )
+        return self.compression_info
+    
+    def sample_dictionary(self, collection):
+        """zstd dictionary trained on a $sample of the collection, and the sampled papers"""
+        pipeline = [{"$sample": {"size": ZSTD_DICT_SAMPLE_PAPERS}}]
+        if self.projection:
+            pipeline.append({"$project": self.projection})
+        sample = list(collection.aggregate(pipeline, allowDiskUse=True))
+        convert_object_ids(sample)
+        return train_paper_dictionary(sample), sample
+    
+    def load_dictionary(self, compression_info):
+        """Fetch and check the dictionary a plan or manifest records"""
+        self.compression_info = compression_info
+        if compression_info["codec"] != "zstd-dict":
+            return None
+        info = compression_info["dictionary"]
+        body = self.s3_client.get_object(Bucket=self.s3_bucket, Key=info["s3_key"])['Body'].read()
+        if hashlib.sha256(body).hexdigest() != info["sha256"]:
+            raise RuntimeError(f"Dictionary s3://{self.s3_bucket}/{info['s3_key']} does not match its checksum")
+        self.zstd_level = compression_info.get("level", self.zstd_level)
+        self.dictionary = body
+        return body
+    
+    def chunk_is_intact(self, entry):
+        """Check that a journaled chunk is still in S3 with the recorded checksum"""
+        try:
+            head = self.s3_client.head_object(Bucket=self.s3_bucket, Key=entry["s3_key"])
+        except ClientError:
+            return False
+        return head.get('Metadata', {}).get('sha256') == entry["sha256"]
+    
+    def finish_export(self, timestamp, plan, journal, failed_chunks, write_manifest):
+        """Write the manifest only once every planned chunk is journaled"""
+        if failed_chunks:
+            raise RuntimeError(
+                f"{len(failed_chunks)} chunks failed: {sorted(failed_chunks)}. "
+                f"Rerun with RESUME_TIMESTAMP={timestamp} to export only the missing chunks"
+            )
+        
+        completed = journal.completed_chunks()
+        missing = [c["chunk_number"] for c in plan["chunks"] if c["chunk_number"] not in completed]
+        if missing:
+            raise RuntimeError(f"Journal is missing chunks {missing}; manifest not written")
+        
+        chunks = [completed[c["chunk_number"]] for c in plan["chunks"]]
+        total_papers = sum(entry["count"] for entry in chunks)
+        total_bytes = sum(entry.get("bytes", 0) for entry in chunks)
+        num_chunks = len(chunks)
+        
+        logger.info(
+            f"Export completed! All {num_chunks} chunks uploaded to S3 "
+            f"({total_bytes / (1024 * 1024):.2f} MB, profile '{self.profile}')"
+        )
+        
+        self.cross_checks = self.cross_check_export(plan, total_papers)
+        self.last_export = {
+            "collection": self.collection_name,
+            "total_papers": total_papers,
+            "num_chunks": num_chunks,
+            "total_bytes": total_bytes,
+            "profile": self.profile,
+            "compression": self.compression_info,
+            "papers_prefix": self.papers_prefix(),
+            "collection_summary": self.collection_summary,
+            "cross_checks": self.cross_checks
+        }
+        memory_profile = self.summarize_memory_profile(chunks)
+        if memory_profile:
+            self.last_export["memory_profile"] = memory_profile
         
         # Create export manifest
-        self.create_export_manifest(timestamp, total_papers, num_chunks)
+        if write_manifest:
+            self.create_export_manifest(timestamp, total_papers, num_chunks, chunks, memory_profile)
         
         return timestamp
     
-    def export_chunk(self, collection, skip, limit, chunk_num, timestamp):
+    def cross_check_export(self, plan, exported_papers):
+        """Compare the exported paper count with the plan and the export-time collection summary"""
+        checks = [
+            {"check": "planned_papers", "expected": plan["total_papers"], "actual": exported_papers}
+        ]
+        if self.collection_summary:
+            checks.append({
+                "check": "collection_total",
+                "expected": self.collection_summary["total_papers"],
+                "actual": exported_papers
+            })
+        for check in checks:
+            check["match"] = check["expected"] == check["actual"]
+            if not check["match"]:
+                logger.warning(
+                    f"Cross-check {check['check']} failed: expected {check['expected']}, "
+                    f"exported {check['actual']} (collection changed during the export?)"
+                )
+        return checks
+    
+    def export_papers_in_chunks(self, chunk_size=1000, max_workers=4, timestamp=None, write_manifest=True):
+        """Export papers in parallel chunks for better performance
+        
+        Passing the timestamp of an interrupted export resumes it, skipping
+        chunks the journal records as finished.
+        """
+        # Worker threads share the pooled client
+        collection = self.get_collection()
+        
+        timestamp, plan, journal, pending = self.prepare_export(collection, chunk_size, timestamp)
+        
+        if self.profile_memory:
+            # tracemalloc is process-wide, so chunks run one at a time for clean attribution
+            logger.info(f"Memory profiling enabled: exporting one chunk at a time (requested {max_workers} workers)")
+            tracemalloc.start()
+            self.rss_sampler = RSSSampler().start()
+            max_workers = 1
+        
+        # Export chunks in parallel
+        failed_chunks = []
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {
+                    executor.submit(self.export_chunk, collection, chunk, timestamp, journal): chunk["chunk_number"]
+                    for chunk in pending
+                }
+                
+                # Wait for all chunks so one failure does not abandon the rest
+                for future, chunk_num in futures.items():
+                    try:
+                        future.result()
+                    except Exception:
+                        failed_chunks.append(chunk_num)
+        finally:
+            if self.profile_memory:
+                self.rss_sampler.stop()
+                tracemalloc.stop()
+        
+        return self.finish_export(timestamp, plan, journal, failed_chunks, write_manifest)
+    
+    def fetch_chunk(self, collection, chunk):
+        """Fetch the papers of one planned _id range from MongoDB"""
+        id_range = {'$gte': chunk["start_id"]}
+        if chunk["end_id"] is not None:
+            id_range['$lt'] = chunk["end_id"]
+        return list(collection.find({'_id': id_range}, self.projection).sort('_id', 1))
+    
+    def upload_chunk(self, body, chunk_num, timestamp):
+        """Upload a serialized chunk to S3, returning its key, checksum and size"""
+        s3_key = f"{self.papers_prefix()}/chunk_{chunk_num:04d}_{timestamp}{CHUNK_SUFFIXES[self.compression]}"
+        body = body.encode('utf-8') if isinstance(body, str) else body
+        content_type = CHUNK_CONTENT_TYPES[self.compression]
+        checksum = hashlib.sha256(body).hexdigest()
+        
+        # Same key on every attempt, so a retried chunk overwrites instead of leaving an orphan
+        self.s3_client.put_object(
+            Bucket=self.s3_bucket,
+            Key=s3_key,
+            Body=body,
+            ContentType=content_type,
+            Metadata={'sha256': checksum}
+        )
+        
+        return s3_key, checksum, len(body)
+    
+    def journal_entry(self, chunk, key_range, count, s3_key, checksum, size_bytes, memory_profile=None):
+        """Progress journal record for an uploaded chunk"""
+        entry = {
+            "chunk_number": chunk["chunk_number"],
+            "key_range": key_range,
+            "count": count,
+            "s3_key": s3_key,
+            "sha256": checksum,
+            "bytes": size_bytes,
+            "completed_at": datetime.now().isoformat()
+        }
+        if memory_profile:
+            entry["memory_profile"] = memory_profile
+        return entry
+    
+    def export_chunk(self, collection, chunk, timestamp, journal):
         """Export a single chunk of papers"""
+        chunk_num = chunk["chunk_number"]
+        profiler = ChunkMemoryProfiler(self.rss_sampler, enabled=self.profile_memory)
         try:
             # Fetch chunk from MongoDB
-            papers = list(collection.find({}).skip(skip).limit(limit))
-            
-            # Convert ObjectId to string for JSON serialization
-            for paper in papers:
-                paper['_id'] = str(paper['_id'])
-            
-            # Create chunk data with metadata
-            chunk_data = {
-                "chunk_number": chunk_num,
-                "total_papers": len(papers),
-                "export_timestamp": timestamp,
-                "papers": papers
-            }
+            with profiler.phase("fetch"):
+                papers = self.fetch_chunk(collection, chunk)
+            key_range = [str(papers[0]['_id']), str(papers[-1]['_id'])] if papers else None
             
-            # Upload to S3
-            s3_key = f"{self.s3_prefix}/papers/chunk_{chunk_num:04d}_{timestamp}.json"
-            
-            self.s3_client.put_object(
-                Bucket=self.s3_bucket,
-                Key=s3_key,
-                Body=json.dumps(chunk_data, indent=2),
-                ContentType='application/json'
-            )
+            # Serialize and upload to S3
+            with profiler.phase("convert_object_ids"):
+                convert_object_ids(papers)
+            with profiler.phase("json_dumps"):
+                body = encode_chunk(papers, chunk_num, timestamp, self.compression, self.dictionary, self.zstd_level)
+            with profiler.phase("upload"):
+                s3_key, checksum, size_bytes = self.upload_chunk(body, chunk_num, timestamp)
+            journal.record_chunk(self.journal_entry(
+                chunk, key_range, len(papers), s3_key, checksum, size_bytes, profiler.result(len(papers))
+            ))
             
             logger.info(f"Chunk {chunk_num}: Exported {len(papers)} papers to s3://{self.s3_bucket}/{s3_key}")
             
@@ -115,7 +828,235 @@ class MongoDBToS3Exporter:
             logger.error(f"Error exporting chunk {chunk_num}: {e}")
             raise
     
-    def create_export_manifest(self, timestamp, total_papers, num_chunks):
+    def export_papers_async(self, chunk_size=1000, read_concurrency=4, serialize_workers=None,
+                            upload_concurrency=8, queue_size=None, timestamp=None, write_manifest=True):
+        """Export papers through a pipelined read -> serialize -> upload engine"""
+        collection = self.get_collection()
+        
+        timestamp, plan, journal, pending = self.prepare_export(collection, chunk_size, timestamp)
+        serialize_workers = serialize_workers or os.cpu_count() or 1
+        queue_size = queue_size or 2 * serialize_workers
+        
+        logger.info(
+            f"Async export of {len(pending)} chunks "
+            f"(reads={read_concurrency}, serializers={serialize_workers}, "
+            f"uploads={upload_concurrency}, queue={queue_size})"
+        )
+        
+        failed_chunks = asyncio.run(self._run_export_pipeline(
+            collection, pending, timestamp, journal,
+            read_concurrency, serialize_workers, upload_concurrency, queue_size
+        ))
+        
+        return self.finish_export(timestamp, plan, journal, failed_chunks, write_manifest)
+    
+    async def _run_export_pipeline(self, collection, pending, timestamp, journal,
+                                   read_concurrency, serialize_workers, upload_concurrency, queue_size):
+        """Run readers, serializers and uploaders concurrently with bounded queues between them"""
+        loop = asyncio.get_running_loop()
+        # pymongo and boto3 block, so their calls run on a thread pool the event loop awaits
+        io_pool = ThreadPoolExecutor(max_workers=read_concurrency + upload_concurrency)
+        cpu_pool = ProcessPoolExecutor(max_workers=serialize_workers)
+        read_semaphore = asyncio.Semaphore(read_concurrency)
+        serialize_queue = asyncio.Queue(maxsize=queue_size)
+        upload_queue = asyncio.Queue(maxsize=queue_size)
+        
+        failed_chunks = []
+        
+        async def read(chunk):
+            # Hold the semaphore until the chunk is queued so a full queue stalls new reads
+            async with read_semaphore:
+                try:
+                    papers = await loop.run_in_executor(io_pool, self.fetch_chunk, collection, chunk)
+                except Exception as e:
+                    logger.error(f"Error exporting chunk {chunk['chunk_number']}: {e}")
+                    failed_chunks.append(chunk["chunk_number"])
+                    return
+                key_range = [str(papers[0]['_id']), str(papers[-1]['_id'])] if papers else None
+                await serialize_queue.put((chunk, key_range, papers))
+        
+        async def serialize():
+            while (item := await serialize_queue.get()) is not None:
+                chunk, key_range, papers = item
+                try:
+                    body = await loop.run_in_executor(
+                        cpu_pool, serialize_chunk, papers, chunk["chunk_number"], timestamp,
+                        self.compression, self.dictionary, self.zstd_level
+                    )
+                except Exception as e:
+                    logger.error(f"Error exporting chunk {chunk['chunk_number']}: {e}")
+                    failed_chunks.append(chunk["chunk_number"])
+                    continue
+                await upload_queue.put((chunk, key_range, len(papers), body))
+        
+        def upload_and_record(chunk, key_range, paper_count, body):
+            s3_key, checksum, size_bytes = self.upload_chunk(body, chunk["chunk_number"], timestamp)
+            journal.record_chunk(self.journal_entry(chunk, key_range, paper_count, s3_key, checksum, size_bytes))
+            return s3_key
+        
+        async def upload():
+            while (item := await upload_queue.get()) is not None:
+                chunk, key_range, paper_count, body = item
+                try:
+                    s3_key = await loop.run_in_executor(
+                        io_pool, upload_and_record, chunk, key_range, paper_count, body
+                    )
+                except Exception as e:
+                    logger.error(f"Error exporting chunk {chunk['chunk_number']}: {e}")
+                    failed_chunks.append(chunk["chunk_number"])
+                    continue
+                logger.info(
+                    f"Chunk {chunk['chunk_number']}: Exported {paper_count} papers "
+                    f"to s3://{self.s3_bucket}/{s3_key}"
+                )
+        
+        async def read_all():
+            await asyncio.gather(*(read(chunk) for chunk in pending))
+            for _ in range(serialize_workers):
+                await serialize_queue.put(None)
+        
+        async def serialize_all():
+            await asyncio.gather(*(serialize() for _ in range(serialize_workers)))
+            for _ in range(upload_concurrency):
+                await upload_queue.put(None)
+        
+        stages = [
+            asyncio.ensure_future(read_all()),
+            asyncio.ensure_future(serialize_all()),
+            asyncio.ensure_future(asyncio.gather(*(upload() for _ in range(upload_concurrency))))
+        ]
+        try:
+            await asyncio.gather(*stages)
+            return failed_chunks
+        except Exception as e:
+            logger.error(f"Async export failed: {e}")
+            for stage in stages:
+                stage.cancel()
+            raise
+        finally:
+            io_pool.shutdown(wait=False, cancel_futures=True)
+            cpu_pool.shutdown(wait=False, cancel_futures=True)
+    
+    def summarize_memory_profile(self, chunks):
+        """Export-level memory profile and recommended settings from the per-chunk profiles"""
+        chunk_profiles = [entry["memory_profile"] for entry in chunks if entry.get("memory_profile")]
+        if not chunk_profiles:
+            return None
+        
+        peak_chunk = max(chunk_profiles, key=lambda p: p["traced_peak_mb"])
+        summary = {
+            "profiled_chunks": len(chunk_profiles),
+            "rss_peak_mb": max(p["rss_peak_mb"] for p in chunk_profiles),
+            "traced_peak_mb": peak_chunk["traced_peak_mb"],
+            "peak_phase_counts": {
+                phase: sum(1 for p in chunk_profiles if p["peak_phase"] == phase) for phase in PROFILE_PHASES
+            },
+            "phase_traced_peak_mb": {
+                phase: max(p["phases"].get(phase, {}).get("traced_peak_mb", 0) for p in chunk_profiles)
+                for phase in PROFILE_PHASES
+            },
+            "recommendation": recommend_export_settings(chunk_profiles, self.memory_budget_mb)
+        }
+        return summary
+    
+    def probe_chunk(self, collection, chunk_size, probe_num, dictionary=None):
+        """Time a throwaway export of the first chunk_size papers in the configured encoding"""
+        start_time = time.perf_counter()
+        papers = list(collection.find({}, self.projection).sort('_id', 1).limit(chunk_size))
+        fetch_s = time.perf_counter() - start_time
+        
+        start_time = time.perf_counter()
+        body = serialize_chunk(papers, probe_num, "probe", self.compression, dictionary, self.zstd_level)
+        body = body.encode('utf-8') if isinstance(body, str) else body
+        serialize_s = time.perf_counter() - start_time
+        
+        probe_key = f"{self.s3_prefix}/probes/probe_{probe_num:04d}_{chunk_size}{CHUNK_SUFFIXES[self.compression]}"
+        start_time = time.perf_counter()
+        self.s3_client.put_object(
+            Bucket=self.s3_bucket, Key=probe_key, Body=body, ContentType=CHUNK_CONTENT_TYPES[self.compression]
+        )
+        upload_s = time.perf_counter() - start_time
+        self.s3_client.delete_object(Bucket=self.s3_bucket, Key=probe_key)
+        
+        return {
+            "chunk_size": len(papers),
+            "fetch_s": round(fetch_s, 4),
+            "serialize_s": round(serialize_s, 4),
+            "upload_s": round(upload_s, 4),
+            "bytes_per_paper": round(len(body) / max(len(papers), 1))
+        }
+    
+    def probe_memory(self, collection, chunk_size):
+        """Per-paper memory high-water mark of one traced chunk export, plus the RSS before it"""
+        tracemalloc.start()
+        try:
+            profiler = ChunkMemoryProfiler()
+            with profiler.phase("fetch"):
+                papers = list(collection.find({}, self.projection).sort('_id', 1).limit(chunk_size))
+            with profiler.phase("convert_object_ids"):
+                convert_object_ids(papers)
+            with profiler.phase("json_dumps"):
+                body = dump_chunk(papers, 0, "probe")
+            with profiler.phase("upload"):
+                encoded = body.encode('utf-8')
+            profile = profiler.result(len(papers))
+        finally:
+            tracemalloc.stop()
+        del papers, body, encoded
+        per_paper_mb = max(profile["traced_peak_mb"], profile["rss_peak_mb"] - profile["rss_start_mb"])
+        return per_paper_mb / max(profile["papers"], 1) * PROFILE_SAFETY_FACTOR, profile["rss_start_mb"]
+    
+    def auto_tune(self, memory_cap_mb=None, chunk_sizes=None, max_workers=AUTO_TUNE_MAX_WORKERS):
+        """Run short probe exports and choose chunk_size and max_workers for the threaded engine
+        
+        Probes fetch, serialize and upload (then delete) real papers from the
+        start of the collection, so timings include this collection's document
+        size and the actual network to MongoDB and S3.
+        """
+        memory_cap_mb = memory_cap_mb or system_memory_mb() / 2
+        collection = self.get_collection()
+        total_papers = collection.estimated_document_count()
+        
+        sizes = sorted({min(size, total_papers) for size in (chunk_sizes or AUTO_TUNE_CHUNK_SIZES)} - {0})
+        if not sizes:
+            return None
+        logger.info(f"Auto-tuning export with probe chunks of {sizes} papers (memory cap {memory_cap_mb:.0f} MB)")
+        
+        # Probes compress like the export; zstd-dict needs a dictionary before the export trains its own
+        dictionary = self.dictionary
+        if self.compression == "zstd-dict" and dictionary is None:
+            dictionary, _ = self.sample_dictionary(collection)
+        
+        # Warm the connections so the first probe does not pay for them
+        self.probe_chunk(collection, 1, 0, dictionary)
+        probes = [
+            self.probe_chunk(collection, size, probe_num, dictionary) for probe_num, size in enumerate(sizes, 1)
+        ]
+        per_paper_mb, baseline_mb = self.probe_memory(collection, sizes[0])
+        
+        settings = choose_export_settings(probes, per_paper_mb, baseline_mb, memory_cap_mb, max_workers)
+        if settings is None:
+            logger.warning(f"No probed chunk size fits in {memory_cap_mb:.0f} MB; using the smallest with one worker")
+            smallest = probes[0]
+            chunk_time = smallest["fetch_s"] + smallest["serialize_s"] + smallest["upload_s"]
+            settings = {
+                "chunk_size": smallest["chunk_size"],
+                "max_workers": 1,
+                "predicted_papers_per_s": round(smallest["chunk_size"] / max(chunk_time, 1e-6), 1),
+                "estimated_peak_mb": round(baseline_mb + smallest["chunk_size"] * per_paper_mb, 1)
+            }
+        settings.update({
+            "memory_cap_mb": round(memory_cap_mb),
+            "per_paper_mb": round(per_paper_mb, 4),
+            "probes": probes
+        })
+        logger.info(
+            f"Auto-tuned settings: chunk_size={settings['chunk_size']}, max_workers={settings['max_workers']} "
+            f"(predicted {settings['predicted_papers_per_s']} papers/second, ~{settings['estimated_peak_mb']} MB)"
+        )
+        return settings
+    
+    def create_export_manifest(self, timestamp, total_papers, num_chunks, chunks=None, memory_profile=None):
         """Create a manifest file with export metadata"""
         manifest = {
             "export_timestamp": timestamp,
@@ -124,8 +1065,30 @@ class MongoDBToS3Exporter:
             "s3_bucket": self.s3_bucket,
             "s3_prefix": self.s3_prefix,
             "export_status": "completed",
+            "export_profile": {
+                "name": self.profile,
+                "projection": self.projection
+            },
+            # Readers fetch the dictionary from here to decode zstd-dict chunks
+            "compression": self.compression_info,
             "created_at": datetime.now().isoformat()
         }
+        if chunks:
+            manifest["total_bytes"] = sum(entry.get("bytes", 0) for entry in chunks)
+            manifest["chunks"] = [
+                {
+                    key: entry.get(key)
+                    for key in ("chunk_number", "s3_key", "count", "bytes", "key_range", "sha256", "memory_profile")
+                    if key in entry
+                }
+                for entry in chunks
+            ]
+        if memory_profile:
+            manifest["memory_profile"] = memory_profile
+        if self.collection_summary:
+            # Downstream jobs read these instead of rescanning, and cross-check against them
+            manifest["collection_summary"] = self.collection_summary
+            manifest["cross_checks"] = self.cross_checks
         
         manifest_key = f"{self.s3_prefix}/manifests/export_manifest_{timestamp}.json"
         
@@ -138,20 +1101,27 @@ class MongoDBToS3Exporter:
         
         logger.info(f"Export manifest created: s3://{self.s3_bucket}/{manifest_key}")
     
+    def list_chunk_keys(self, timestamp):
+        """List chunk object keys written for an export timestamp"""
+        # S3 prefixes do not glob, so list all chunks and match the timestamp suffix
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        chunk_keys = []
+        for page in paginator.paginate(Bucket=self.s3_bucket, Prefix=f"{self.papers_prefix()}/chunk_"):
+            for obj in page.get('Contents', []):
+                if obj['Key'].endswith(f"_{timestamp}{CHUNK_SUFFIXES[self.compression]}"):
+                    chunk_keys.append(obj['Key'])
+        return sorted(chunk_keys)
+    
     def verify_export(self, timestamp):
         """Verify that all chunks were exported correctly"""
         try:
             # List all chunks for this export
-            response = self.s3_client.list_objects_v2(
-                Bucket=self.s3_bucket,
-                Prefix=f"{self.s3_prefix}/papers/chunk_*_{timestamp}.json"
-            )
+            chunk_files = [{'Key': key} for key in self.list_chunk_keys(timestamp)]
             
-            if 'Contents' not in response:
+            if not chunk_files:
                 logger.error("No exported chunks found!")
                 return False
             
-            chunk_files = response['Contents']
             logger.info(f"Found {len(chunk_files)} chunk files in S3")
             
             # Verify each chunk
@@ -163,7 +1133,7 @@ class MongoDBToS3Exporter:
                     Key=chunk_file['Key']
                 )
                 
-                chunk_data = json.loads(response['Body'].read())
+                chunk_data = decode_chunk(response['Body'].read(), self.compression, self.dictionary)
                 total_papers_exported += chunk_data['total_papers']
             
             logger.info(f"Verification complete: {total_papers_exported} papers exported")
@@ -173,14 +1143,178 @@ class MongoDBToS3Exporter:
             logger.error(f"Error verifying export: {e}")
             return False
 
+class MultiYearExporter:
+    """Export several per-year collections concurrently into one year-partitioned dataset"""
+    
+    def __init__(self, mongo_uri, db_name, year_collections, s3_bucket, s3_prefix, profile="full-text",
+                 max_pool_size=64, compression="none"):
+        self.s3_bucket = s3_bucket
+        self.profile = profile
+        self.compression = compression
+        self.s3_prefix = s3_prefix
+        self.s3_client = create_s3_client()
+        # Every year's exporter queries through one shared connection pool
+        self.client = MongoClient(mongo_uri, maxPoolSize=max_pool_size)
+        self.exporters = {
+            year: MongoDBToS3Exporter(
+                mongo_uri=mongo_uri,
+                db_name=db_name,
+                collection_name=collection_name,
+                s3_bucket=s3_bucket,
+                s3_prefix=s3_prefix,
+                partition=f"export_year={year}",
+                profile=profile,
+                client=self.client,
+                compression=compression
+            )
+            for year, collection_name in year_collections.items()
+        }
+    
+    def export_all_years(self, chunk_size=1000, max_workers_per_year=4, timestamp=None):
+        """Export every configured year under one shared timestamp (pass it again to resume)"""
+        timestamp = timestamp or datetime.now().strftime('%Y%m%d_%H%M%S')
+        logger.info(f"Exporting years {sorted(self.exporters)} concurrently (timestamp {timestamp})")
+        
+        with ThreadPoolExecutor(max_workers=len(self.exporters)) as executor:
+            futures = {
+                year: executor.submit(
+                    exporter.export_papers_in_chunks,
+                    chunk_size=chunk_size,
+                    max_workers=max_workers_per_year,
+                    timestamp=timestamp,
+                    write_manifest=False
+                )
+                for year, exporter in self.exporters.items()
+            }
+            
+            for future in futures.values():
+                future.result()
+        
+        self.create_unified_manifest(timestamp)
+        return timestamp
+    
+    def create_unified_manifest(self, timestamp):
+        """Create one manifest describing every year partition of the export"""
+        years = {year: exporter.last_export for year, exporter in self.exporters.items()}
+        manifest = {
+            "export_timestamp": timestamp,
+            "total_papers": sum(info["total_papers"] for info in years.values()),
+            "num_chunks": sum(info["num_chunks"] for info in years.values()),
+            "total_bytes": sum(info["total_bytes"] for info in years.values()),
+            "export_profile": {
+                "name": self.profile,
+                "projection": EXPORT_PROFILES[self.profile]
+            },
+            # Same shape as a single export's; each year's dictionary is under years.<year>.compression
+            "compression": {"codec": self.compression},
+            "partition_column": "export_year",
+            "years": years,
+            "s3_bucket": self.s3_bucket,
+            "s3_prefix": self.s3_prefix,
+            "export_status": "completed",
+            "created_at": datetime.now().isoformat()
+        }
+        
+        manifest_key = f"{self.s3_prefix}/manifests/export_manifest_{timestamp}.json"
+        
+        self.s3_client.put_object(
+            Bucket=self.s3_bucket,
+            Key=manifest_key,
+            Body=json.dumps(manifest, indent=2),
+            ContentType='application/json'
+        )
+        
+        logger.info(f"Unified export manifest created: s3://{self.s3_bucket}/{manifest_key}")
+        return manifest
+    
+    def verify_export(self, timestamp):
+        """Verify every year partition of the export"""
+        return all(exporter.verify_export(timestamp) for exporter in self.exporters.values())
+    
+    def close(self):
+        self.client.close()
+
+def parse_year_collections(value):
+    """Parse "2024:iclr_2024,2025:iclr_2025" into {"2024": "iclr_2024", ...}"""
+    year_collections = {}
+    for entry in value.split(','):
+        year, collection_name = entry.strip().split(':')
+        year_collections[year.strip()] = collection_name.strip()
+    return year_collections
+
+def main_multi_year():
+    """Export all configured year collections into one partitioned dataset"""
+    MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
+    DB_NAME = os.getenv('DB_NAME', 'iclr_2024')
+    YEAR_COLLECTIONS = parse_year_collections(
+        os.getenv('YEAR_COLLECTIONS', '2024:iclr_2024,2025:iclr_2025,2026:iclr_2026')
+    )
+    S3_BUCKET = os.getenv('S3_BUCKET', 'your-iclr-bucket')
+    S3_PREFIX = os.getenv('S3_PREFIX', 'iclr-data')
+    EXPORT_PROFILE = os.getenv('EXPORT_PROFILE', 'full-text')
+    EXPORT_COMPRESSION = os.getenv('EXPORT_COMPRESSION', 'none')
+    
+    logger.info(f"Starting multi-year MongoDB to S3 export for collections {YEAR_COLLECTIONS}...")
+    
+    exporter = MultiYearExporter(
+        mongo_uri=MONGO_URI,
+        db_name=DB_NAME,
+        year_collections=YEAR_COLLECTIONS,
+        s3_bucket=S3_BUCKET,
+        s3_prefix=S3_PREFIX,
+        profile=EXPORT_PROFILE,
+        compression=EXPORT_COMPRESSION
+    )
+    
+    try:
+        start_time = time.time()
+        timestamp = exporter.export_all_years(
+            chunk_size=1000,
+            max_workers_per_year=4,
+            timestamp=os.getenv('RESUME_TIMESTAMP')
+        )
+        export_time = time.time() - start_time
+        
+        if not exporter.verify_export(timestamp):
+            logger.error("❌ Export verification failed!")
+            exit(1)
+        
+        total_papers = sum(e.last_export["total_papers"] for e in exporter.exporters.values())
+        logger.info(f"""
+        📊 Multi-year Export Summary:
+        - Years exported: {', '.join(sorted(YEAR_COLLECTIONS))}
+        - Total papers exported: {total_papers:,}
+        - Export profile: {EXPORT_PROFILE}
+        - Export timestamp: {timestamp}
+        - S3 location: s3://{S3_BUCKET}/{S3_PREFIX}/papers/export_year=*/
+        - Export time: {export_time:.2f} seconds
+        - Average speed: {total_papers/export_time:.0f} papers/second
+        """)
+        
+    except Exception as e:
+        logger.error(f"Export failed: {e}")
+        exit(1)
+    finally:
+        exporter.close()
+
 def main():
     """Main execution function"""
+    if os.getenv('EXPORT_MODE') == 'multi-year':
+        main_multi_year()
+        return
+    
     # Configuration
     MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
     DB_NAME = os.getenv('DB_NAME', 'iclr_2024')
     COLLECTION_NAME = os.getenv('COLLECTION_NAME', 'papers')
     S3_BUCKET = os.getenv('S3_BUCKET', 'your-iclr-bucket')
     S3_PREFIX = os.getenv('S3_PREFIX', 'iclr-data')
+    EXPORT_PROFILE = os.getenv('EXPORT_PROFILE', 'full-text')
+    PROFILE_MEMORY = os.getenv('PROFILE_MEMORY', 'false').lower() == 'true'
+    MEMORY_BUDGET_MB = float(os.getenv('MEMORY_BUDGET_MB', '0')) or None
+    AUTO_TUNE = os.getenv('AUTO_TUNE', 'false').lower() == 'true'
+    # none | gzip | zstd-dict (per-paper frames with a trained dictionary, see CHUNK_COMPRESSIONS)
+    EXPORT_COMPRESSION = os.getenv('EXPORT_COMPRESSION', 'none')
     
     logger.info("Starting MongoDB to S3 export for EMR processing...")
     
@@ -190,13 +1324,36 @@ def main():
         db_name=DB_NAME,
         collection_name=COLLECTION_NAME,
         s3_bucket=S3_BUCKET,
-        s3_prefix=S3_PREFIX
+        s3_prefix=S3_PREFIX,
+        profile=EXPORT_PROFILE,
+        profile_memory=PROFILE_MEMORY,
+        memory_budget_mb=MEMORY_BUDGET_MB,
+        compression=EXPORT_COMPRESSION
     )
     
     try:
-        # Export papers
+        chunk_size, max_workers, tuning = 1000, 4, None
+        if AUTO_TUNE:
+            # Probe this collection and network, then size chunks and workers under the memory cap
+            tuning = exporter.auto_tune(memory_cap_mb=MEMORY_BUDGET_MB)
+            if tuning:
+                chunk_size, max_workers = tuning["chunk_size"], tuning["max_workers"]
+        
+        # Export papers (EXPORT_ENGINE=async pipelines reads, serialization and uploads)
         start_time = time.time()
-        timestamp = exporter.export_papers_in_chunks(chunk_size=1000, max_workers=4)
+        if os.getenv('EXPORT_ENGINE', 'threads') == 'async':
+            timestamp = exporter.export_papers_async(
+                chunk_size=chunk_size,
+                read_concurrency=int(os.getenv('READ_CONCURRENCY', '4')),
+                upload_concurrency=int(os.getenv('UPLOAD_CONCURRENCY', '8')),
+                timestamp=os.getenv('RESUME_TIMESTAMP')
+            )
+        else:
+            timestamp = exporter.export_papers_in_chunks(
+                chunk_size=chunk_size,
+                max_workers=max_workers,
+                timestamp=os.getenv('RESUME_TIMESTAMP')
+            )
         export_time = time.time() - start_time
         
         logger.info(f"Export completed in {export_time:.2f} seconds")
@@ -208,20 +1365,54 @@ def main():
             logger.error("❌ Export verification failed!")
             exit(1)
         
-        # Print summary
-        total_papers = exporter.get_total_papers()
+        # Print summary (counts come from the export itself, no second scan)
+        total_papers = exporter.last_export["total_papers"]
+        summary = exporter.last_export["collection_summary"]
+        failed_checks = [c["check"] for c in exporter.last_export["cross_checks"] if not c["match"]]
         logger.info(f"""
         📊 Export Summary:
         - Total papers exported: {total_papers:,}
+        - Export profile: {EXPORT_PROFILE}
+        - Chunk compression: {EXPORT_COMPRESSION} ({exporter.last_export['total_bytes'] / (1024 * 1024):.2f} MB)
         - Export timestamp: {timestamp}
         - S3 bucket: s3://{S3_BUCKET}/{S3_PREFIX}/papers/
         - Export time: {export_time:.2f} seconds
         - Average speed: {total_papers/export_time:.0f} papers/second
+        - Chunk size: {chunk_size}{' (auto-tuned)' if tuning else ''}
+        - Max workers: {max_workers}{' (auto-tuned)' if tuning else ''}
+        - Collection size: {summary['bson_bytes'] / (1024 * 1024):.2f} MB BSON
+        - Papers by year: {summary['by_year']}
+        - Cross-checks: {'failed ' + ', '.join(failed_checks) if failed_checks else 'all passed'}
+        """)
+        if tuning:
+            logger.info(
+                f"Auto-tune predicted {tuning['predicted_papers_per_s']} papers/second "
+                f"within {tuning['memory_cap_mb']} MB; probes: {tuning['probes']}"
+            )
+        
+        memory_profile = exporter.last_export.get("memory_profile")
+        if memory_profile:
+            recommendation = memory_profile["recommendation"]
+            if recommendation:
+                recommended = (
+                    f"chunk_size={recommendation['chunk_size']}, max_workers={recommendation['max_workers']} "
+                    f"(~{recommendation['estimated_peak_mb']} MB of {recommendation['memory_budget_mb']:.0f} MB)"
+                )
+            else:
+                recommended = "set MEMORY_BUDGET_MB to get a recommendation"
+            logger.info(f"""
+        🧠 Memory Profile:
+        - Peak RSS: {memory_profile['rss_peak_mb']} MB
+        - Peak traced per chunk: {memory_profile['traced_peak_mb']} MB
+        - Peak phase by chunk: {memory_profile['peak_phase_counts']}
+        - Recommended settings: {recommended}
         """)
         
     except Exception as e:
         logger.error(f"Export failed: {e}")
         exit(1)
+    finally:
+        exporter.close()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
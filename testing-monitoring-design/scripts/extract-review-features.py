@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Review-Text Feature Store: extract per-review text features into compressed Parquet
+Streams exported submissions once and computes, for every metareview, token counts and
+length buckets of the free-text fields, a hashed bag-of-words vector and the depth of
+its rebuttal thread. Rows are keyed by s_id (sorted within each year partition) so
+prompt-error analysis can join predictions against review features without re-reading
+the raw JSON.
+
+Runs with a multiprocessing pool locally (FEATURE_MODE=local) or with mapPartitions on
+Spark (FEATURE_MODE=spark); both write the same year-partitioned layout:
+    <output>/year=<year>/*.parquet
+
+Reads chunks of every export encoding; zstd-dict chunks need the export's dictionary
+(DICTIONARY_PATH locally, the manifest of EXPORT_TIMESTAMP on Spark).
+"""
+
+import glob
+import gzip
+import json
+import logging
+import os
+import re
+import sys
+import time
+import zlib
+from multiprocessing import Pool
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Only local mode writes through pyarrow; Spark writes Parquet itself
+    pa = None
+
+# spark-submit ships chunk_reader.py and review_values.py with --py-files; local runs import them from the repo
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "emr", "scripts"))
+from chunk_reader import (CHUNK_SUFFIXES, chunk_glob, decode_paper_chunk, manifest_dictionaries,
+                          paper_decompressor, read_chunks)
+from review_values import review_value
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Free-text fields of metareviews.values that get features
+TEXT_FIELDS = ["summary", "strengths", "weaknesses", "questions"]
+
+# Upper token bounds of the length buckets; longer texts land in the last bucket
+LENGTH_BUCKETS = [0, 50, 100, 200, 400, 800]
+
+# Width of the hashed bag-of-words vectors
+HASH_DIM = 1024
+
+TOKEN = re.compile(r"[a-z0-9]+")
+
+PARQUET_COMPRESSION = "zstd"
+
+
+def tokenize(text):
+    return TOKEN.findall(str(text or "").lower())
+
+
+def length_bucket(token_count):
+    """Index of the first bucket whose bound holds token_count"""
+    for bucket, bound in enumerate(LENGTH_BUCKETS):
+        if token_count <= bound:
+            return bucket
+    return len(LENGTH_BUCKETS)
+
+
+def hashed_bag_of_words(tokens):
+    """Sparse (indices, counts) of tokens hashed into HASH_DIM buckets (crc32, stable across runs)"""
+    counts = {}
+    for token in tokens:
+        index = zlib.crc32(token.encode("utf-8")) % HASH_DIM
+        counts[index] = counts.get(index, 0) + 1
+    indices = sorted(counts)
+    return indices, [counts[index] for index in indices]
+
+
+def rebuttal_thread_stats(review):
+    """
+    Messages, tokens and depth of a review's rebuttal thread.
+
+    Depth follows reply_id links back to the review (review -> rebuttal -> comment ...);
+    messages whose parent is not in the thread count as direct replies to the review.
+    """
+    parents = {}
+    messages = 0
+    tokens = 0
+    for rebuttal in review.get("rebuttal") or []:
+        messages += 1
+        tokens += len(tokenize(rebuttal.get("value"))) + len(tokenize(rebuttal.get("comment")))
+        if rebuttal.get("r_id"):
+            parents[rebuttal["r_id"]] = rebuttal.get("reply_id")
+        for comment in rebuttal.get("comments") or []:
+            messages += 1
+            tokens += len(tokenize(comment.get("comment")))
+            if comment.get("c_id"):
+                # Comments without a usable reply_id hang off their rebuttal
+                parents[comment["c_id"]] = comment.get("reply_id") or rebuttal.get("r_id")
+
+    depth_cache = {}
+
+    def depth(message_id, seen=()):
+        if message_id in depth_cache:
+            return depth_cache[message_id]
+        parent = parents.get(message_id)
+        if parent in parents and parent not in seen:
+            result = depth(parent, seen + (message_id,)) + 1
+        else:
+            result = 1
+        depth_cache[message_id] = result
+        return result
+
+    max_depth = max((depth(message_id) for message_id in parents), default=0)
+    if messages and not max_depth:
+        max_depth = 1
+    return messages, tokens, max_depth
+
+
+def extract_review_rows(paper):
+    """One feature row per metareview of a paper"""
+    s_id = paper.get("s_id")
+    if not s_id:
+        return []
+
+    rows = []
+    for position, review in enumerate(paper.get("metareviews") or []):
+        values = review.get("values") or {}
+        row = {
+            "s_id": s_id,
+            "year": str(paper.get("year") or "unknown"),
+            "decision": paper.get("decision"),
+            "review_id": review.get("id") or f"{s_id}-{position}",
+            "review_position": position,
+            "rating": review_value(values.get("rating")),
+            "confidence": review_value(values.get("confidence"))
+        }
+
+        all_tokens = []
+        for field in TEXT_FIELDS:
+            tokens = tokenize(values.get(field))
+            row[f"{field}_tokens"] = len(tokens)
+            row[f"{field}_length_bucket"] = length_bucket(len(tokens))
+            all_tokens.extend(tokens)
+        row["bow_indices"], row["bow_counts"] = hashed_bag_of_words(all_tokens)
+
+        messages, rebuttal_tokens, depth = rebuttal_thread_stats(review)
+        row["rebuttal_messages"] = messages
+        row["rebuttal_tokens"] = rebuttal_tokens
+        row["rebuttal_depth"] = depth
+        rows.append(row)
+    return rows
+
+
+def extract_batch(papers):
+    """Pool worker: feature rows of a batch of papers"""
+    rows = []
+    for paper in papers:
+        rows.extend(extract_review_rows(paper))
+    return rows
+
+
+def extract_partition(rows):
+    """Spark mapPartitions function over Row objects of flattened papers"""
+    for row in rows:
+        yield from extract_review_rows(row.asDict(recursive=True))
+
+
+def feature_columns():
+    """Column names and types shared by the Arrow and Spark schemas"""
+    columns = [
+        ("s_id", "string"), ("year", "string"), ("decision", "string"),
+        ("review_id", "string"), ("review_position", "int16"),
+        ("rating", "float64"), ("confidence", "float64")
+    ]
+    for field in TEXT_FIELDS:
+        columns += [(f"{field}_tokens", "int32"), (f"{field}_length_bucket", "int8")]
+    columns += [
+        ("bow_indices", "list<int16>"), ("bow_counts", "list<int32>"),
+        ("rebuttal_messages", "int32"), ("rebuttal_tokens", "int32"), ("rebuttal_depth", "int16")
+    ]
+    return columns
+
+
+def arrow_schema():
+    types = {
+        "string": pa.string(), "int8": pa.int8(), "int16": pa.int16(), "int32": pa.int32(),
+        "float64": pa.float64(), "list<int16>": pa.list_(pa.int16()), "list<int32>": pa.list_(pa.int32())
+    }
+    # year is the partition directory, not a column of the files
+    return pa.schema([(name, types[kind]) for name, kind in feature_columns() if name != "year"])
+
+
+def spark_schema():
+    from pyspark.sql.types import (StructType, StructField, StringType, ByteType, ShortType,
+                                   IntegerType, DoubleType, ArrayType)
+    types = {
+        "string": StringType(), "int8": ByteType(), "int16": ShortType(), "int32": IntegerType(),
+        "float64": DoubleType(), "list<int16>": ArrayType(ShortType()), "list<int32>": ArrayType(IntegerType())
+    }
+    return StructType([StructField(name, types[kind], True) for name, kind in feature_columns()])
+
+
+def iter_papers(paths, dictionary=None):
+    """Papers from export chunk files (.json, .json.gz, or .zpc with the dictionary) or JSONL files, one file at a time"""
+    decompressor = paper_decompressor(dictionary) if dictionary else None
+    for path in paths:
+        if path.endswith(CHUNK_SUFFIXES["zstd-dict"]):
+            if decompressor is None:
+                raise ValueError(f"{path} is a zstd-dict chunk; set DICTIONARY_PATH to the export's dictionary")
+            with open(path, 'rb') as infile:
+                yield from decode_paper_chunk(infile.read(), decompressor)["papers"]
+            continue
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, 'rt', encoding='utf-8') as infile:
+            if path.endswith((CHUNK_SUFFIXES["none"], CHUNK_SUFFIXES["gzip"])):
+                yield from json.load(infile).get("papers", [])
+            else:
+                for line in infile:
+                    if line.strip():
+                        yield json.loads(line)
+
+
+def iter_batches(papers, batch_size):
+    batch = []
+    for paper in papers:
+        batch.append(paper)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class LocalFeatureWriter:
+    """Streams feature rows into one zstd Parquet file per year, sorted by s_id per row group"""
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.schema = arrow_schema()
+        self.writers = {}
+        self.rows_written = 0
+
+    def write(self, rows):
+        by_year = {}
+        for row in rows:
+            by_year.setdefault(row.pop("year"), []).append(row)
+
+        for year, year_rows in by_year.items():
+            year_rows.sort(key=lambda row: (row["s_id"], row["review_position"]))
+            if year not in self.writers:
+                year_dir = os.path.join(self.output_dir, f"year={year}")
+                os.makedirs(year_dir, exist_ok=True)
+                self.writers[year] = pq.ParquetWriter(
+                    os.path.join(year_dir, "features.parquet"), self.schema, compression=PARQUET_COMPRESSION
+                )
+            self.writers[year].write_table(pa.Table.from_pylist(year_rows, schema=self.schema))
+            self.rows_written += len(year_rows)
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+
+
+def extract_local(paths, output_dir, workers=None, batch_size=500, dictionary=None):
+    """Extract features with a process pool, streaming input once and output as it arrives"""
+    if pa is None:
+        raise RuntimeError("Local mode needs pyarrow: pip install pyarrow")
+
+    writer = LocalFeatureWriter(output_dir)
+    papers = 0
+    try:
+        with Pool(processes=workers) as pool:
+            # imap keeps order and only holds a few batches in flight
+            for batch_rows in pool.imap(extract_batch, iter_batches(iter_papers(paths, dictionary), batch_size)):
+                papers += len({row["s_id"] for row in batch_rows})
+                writer.write(batch_rows)
+    finally:
+        writer.close()
+
+    return {"papers_with_reviews": papers, "reviews": writer.rows_written, "years": sorted(writer.writers)}
+
+
+def extract_spark(spark, papers_path, output_path, dictionaries=None):
+    """Extract features with mapPartitions and write them partitioned by year"""
+    raw_df = read_chunks(spark, papers_path, dictionaries)
+    papers_df = raw_df.selectExpr("explode(papers) AS paper").select("paper.*")
+
+    features_rdd = papers_df.rdd.mapPartitions(extract_partition)
+    features_df = spark.createDataFrame(features_rdd, spark_schema())
+
+    # Cluster each year's files by s_id so joins against predictions can prune row groups
+    features_df.repartition("year").sortWithinPartitions("s_id", "review_position") \
+        .write.mode("overwrite") \
+        .option("compression", PARQUET_COMPRESSION) \
+        .partitionBy("year") \
+        .parquet(output_path)
+
+    stored_df = spark.read.parquet(output_path)
+    return {
+        "papers_with_reviews": stored_df.select("s_id").distinct().count(),
+        "reviews": stored_df.count(),
+        "years": sorted(row["year"] for row in stored_df.select("year").distinct().collect())
+    }
+
+
+def main():
+    """Main execution function"""
+    FEATURE_MODE = os.getenv('FEATURE_MODE', 'local')
+    S3_BUCKET = os.getenv('S3_BUCKET', 'your-iclr-bucket')
+    S3_PREFIX = os.getenv('S3_PREFIX', 'iclr-data')
+    EXPORT_TIMESTAMP = os.getenv('EXPORT_TIMESTAMP')
+    chunk_name = f"chunk_*_{EXPORT_TIMESTAMP}" if EXPORT_TIMESTAMP else "chunk_*"
+
+    logger.info(f"Starting review-text feature extraction ({FEATURE_MODE} mode)...")
+    start_time = time.time()
+
+    try:
+        if FEATURE_MODE == 'spark':
+            from pyspark.sql import SparkSession
+            spark = SparkSession.builder \
+                .appName("ICLR-Review-Features") \
+                .config("spark.sql.adaptive.enabled", "true") \
+                .getOrCreate()
+            root = f"s3://{S3_BUCKET}/{S3_PREFIX}"
+            papers_path = os.getenv('PAPERS_PATH', chunk_glob(f"{root}/papers/{chunk_name}"))
+            output = os.getenv('FEATURES_OUTPUT', f"{root}/features/review_text/")
+            try:
+                manifest = None
+                if EXPORT_TIMESTAMP:
+                    manifest_path = f"{root}/manifests/export_manifest_{EXPORT_TIMESTAMP}.json"
+                    manifest = json.loads("\n".join(spark.sparkContext.textFile(manifest_path).collect()))
+                result = extract_spark(spark, papers_path, output, manifest_dictionaries(spark, manifest, root))
+            finally:
+                spark.stop()
+        else:
+            paths = sorted(glob.glob(os.getenv('PAPERS_GLOB', f"results/papers/{chunk_name}")))
+            if not paths:
+                logger.error("No paper files match PAPERS_GLOB")
+                exit(1)
+            output = os.getenv('FEATURES_OUTPUT', 'results/features/review_text')
+            workers = int(os.getenv('WORKERS', '0')) or None
+            dictionary = None
+            if os.getenv('DICTIONARY_PATH'):
+                with open(os.getenv('DICTIONARY_PATH'), 'rb') as infile:
+                    dictionary = infile.read()
+            result = extract_local(paths, output, workers=workers, dictionary=dictionary)
+
+        elapsed = time.time() - start_time
+        logger.info(f"""
+        🧾 Review Feature Summary:
+        - Papers with reviews: {result['papers_with_reviews']:,}
+        - Review rows: {result['reviews']:,}
+        - Years: {', '.join(result['years'])}
+        - Feature store: {output}
+        - Extraction time: {elapsed:.2f} seconds
+        """)
+
+    except Exception as e:
+        logger.error(f"Feature extraction failed: {e}")
+        exit(1)
+
+if __name__ == "__main__":
+    main()
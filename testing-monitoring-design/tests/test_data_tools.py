@@ -0,0 +1,233 @@
+"""
+MongoDB maintenance tools of iclr-node-server-app/data against mongomock.
+Run from the repo root with: python -m pytest testing-monitoring-design/tests
+"""
+
+import os
+import sys
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+pytest.importorskip("numpy")
+from bson import ObjectId
+from pymongo import ASCENDING
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir,
+                        "iclr-node-server-app", "data")
+sys.path.append(DATA_DIR)
+
+import bulk_load
+import consistency_repair
+import sample_pools
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient()["iclr"]
+
+
+def prediction(paper_id, prompt, rebuttal, label="Accept"):
+    return {"paper_id": paper_id, "prompt": prompt, "rebuttal": rebuttal, "prediction": label, "__v": 0}
+
+
+# ----------------------------------------------------------------------
+# bulk_load.ShadowBulkLoader
+# ----------------------------------------------------------------------
+
+def test_shadow_load_swaps_in_and_keeps_uncovered_documents(db):
+    papers = [ObjectId() for _ in range(3)]
+    db["predictions"].insert_many([
+        prediction(papers[0], "p1", 0, "Reject"),  # replaced by the load
+        prediction(papers[1], "p1", 0),            # same paper, not loaded
+        prediction(papers[0], "p2", 1),            # other prompt, not loaded
+    ])
+    db["predictions"].create_index([("model", ASCENDING)], name="by_model", sparse=True)
+
+    loader = bulk_load.ShadowBulkLoader(db, "predictions", batch_size=2, workers=2,
+                                        indexes=bulk_load.PREDICTION_INDEXES, key=bulk_load.PREDICTION_KEY)
+    result = loader.load([prediction(papers[0], "p1", 0), prediction(papers[2], "p1", 0)])
+
+    assert result["collection"] == "predictions"
+    assert (result["records"], result["kept"]) == (2, 2)
+    assert "predictions" + bulk_load.SHADOW_SUFFIX not in db.list_collection_names()
+
+    documents = list(db["predictions"].find())
+    assert sorted((str(d["paper_id"]), d["prompt"], d["rebuttal"]) for d in documents) == sorted(
+        [(str(papers[0]), "p1", 0), (str(papers[2]), "p1", 0), (str(papers[1]), "p1", 0), (str(papers[0]), "p2", 1)]
+    )
+    assert db["predictions"].find_one({"paper_id": papers[0], "prompt": "p1"})["prediction"] == "Accept"
+
+    indexes = db["predictions"].index_information()
+    keys = {tuple(spec["key"]) for spec in indexes.values()}
+    for model in bulk_load.PREDICTION_INDEXES:
+        assert tuple(model.document["key"].items()) in keys
+    assert list(indexes["by_model"]["key"]) == [("model", 1)] and indexes["by_model"].get("sparse")
+
+
+def test_shadow_load_with_replace_drops_uncovered_documents(db):
+    db["predictionstats"].insert_many([{"prompt": "old", "prompt_type": 0}, {"prompt": "kept", "prompt_type": 1}])
+
+    loader = bulk_load.ShadowBulkLoader(db, "predictionstats", indexes=bulk_load.STATS_INDEXES,
+                                        key=bulk_load.STATS_KEY)
+    result = loader.load([{"prompt": "old", "prompt_type": 0, "predictions": [1]}], replace=True)
+
+    assert (result["records"], result["kept"]) == (1, 0)
+    assert [d["prompt"] for d in db["predictionstats"].find()] == ["old"]
+
+
+def test_shadow_load_without_swap_leaves_live_collection(db):
+    db["predictions"].insert_one(prediction(ObjectId(), "p1", 0))
+
+    loader = bulk_load.ShadowBulkLoader(db, "predictions", key=bulk_load.PREDICTION_KEY)
+    result = loader.load([prediction(ObjectId(), "p1", 0)], swap=False)
+
+    assert result["collection"] == "predictions" + bulk_load.SHADOW_SUFFIX
+    assert db["predictions"].count_documents({}) == 1
+    assert db[result["collection"]].count_documents({}) == 2
+
+
+def test_shadow_load_write_errors_leave_live_collection(db):
+    db["predictions"].insert_one(prediction(ObjectId(), "p1", 0))
+    duplicate = ObjectId()
+
+    loader = bulk_load.ShadowBulkLoader(db, "predictions", key=bulk_load.PREDICTION_KEY)
+    with pytest.raises(RuntimeError, match="left untouched"):
+        loader.load([dict(prediction(ObjectId(), "p1", 0), _id=duplicate),
+                     dict(prediction(ObjectId(), "p2", 0), _id=duplicate)])
+
+    assert db["predictions"].count_documents({}) == 1
+    assert "predictions" + bulk_load.SHADOW_SUFFIX not in db.list_collection_names()
+
+
+# ----------------------------------------------------------------------
+# consistency_repair.ConsistencyRepairEngine
+# ----------------------------------------------------------------------
+
+@pytest.fixture
+def inconsistent_db(db):
+    kept, duplicate, other = ObjectId(), ObjectId(), ObjectId()
+    db["iclr_2024"].insert_many([
+        {"_id": kept, "s_id": "a", "metareviews": [{}, {}]},
+        {"_id": duplicate, "s_id": "a", "metareviews": [{}]},
+        {"_id": other, "s_id": "b", "metareviews": []},
+    ])
+    missing = ObjectId()
+    db["likes"].insert_many([
+        {"paper_id": kept, "user": "u1"},
+        {"paper_id": duplicate, "user": "u1"},  # a duplicate like once repointed
+        {"paper_id": other, "user": "u2"},
+        {"paper_id": other, "user": "u2"},
+        {"paper_id": missing, "user": "u3"},
+    ])
+    db["comments"].insert_many([
+        {"paper_id": duplicate, "comments": [{"text": "moved"}]},
+        {"paper_id": missing, "comments": [{"text": "orphan"}]},
+    ])
+    db["predictions"].insert_many([
+        prediction(kept, "p1", 0),
+        prediction(kept, "p1", 0),
+        prediction(duplicate, "p2", 0),
+    ])
+    return db, kept, duplicate
+
+
+def test_repair_converges_and_reapplying_is_harmless(inconsistent_db):
+    db, kept, duplicate = inconsistent_db
+    engine = consistency_repair.ConsistencyRepairEngine(db, years=[2024], batch_size=2)
+
+    first = engine.scan()
+    issue_types = {issue["type"] for issue in first["consistency_metrics"]["issues"]}
+    assert issue_types == {"duplicate_s_id", "duplicate_like", "orphan_like", "orphan_comment", "duplicate_prediction"}
+
+    scan = first
+    for _ in range(3):
+        engine.apply(scan)
+        scan = engine.scan()
+        if not scan["consistency_metrics"]["issues"]:
+            break
+    assert scan["consistency_metrics"]["issues"] == []
+    assert scan["operations"] == []
+
+    # The kept paper has the most metareviews, and the references moved to it
+    assert [paper["_id"] for paper in db["iclr_2024"].find({"s_id": "a"})] == [kept]
+    assert db["likes"].count_documents({"paper_id": kept, "user": "u1"}) == 1
+    assert db["comments"].find_one({"comments.text": "moved"})["paper_id"] == kept
+    assert db["predictions"].count_documents({"paper_id": kept}) == 2
+    assert db["likes"].count_documents({}) == 2
+    assert db["comments"].count_documents({}) == 1
+
+    snapshot = {name: sorted(map(str, db[name].find())) for name in ["iclr_2024", "likes", "comments", "predictions"]}
+    engine.apply(first)
+    assert {name: sorted(map(str, db[name].find())) for name in snapshot} == snapshot
+    assert engine.scan()["consistency_metrics"]["issues"] == []
+
+
+def test_repair_scan_checks_subset(inconsistent_db):
+    db, _, _ = inconsistent_db
+    scan = consistency_repair.ConsistencyRepairEngine(db, years=[2024]).scan(["orphan_comments"])
+    assert [issue["type"] for issue in scan["consistency_metrics"]["issues"]] == ["orphan_comment"]
+    assert [operation["op"] for operation in scan["operations"]] == ["delete"]
+
+
+# ----------------------------------------------------------------------
+# sample_pools.SamplePoolBuilder
+# ----------------------------------------------------------------------
+
+def papers(prefix, count, decision):
+    return [{"s_id": f"{prefix}{i}", "decision": decision} for i in range(count)]
+
+
+def test_pools_are_created_per_stratum_and_left_unchanged(db):
+    db["iclr_2024"].insert_many(papers("a", 20, "Accept (poster)") + papers("r", 30, "Reject") + [{"s_id": "x"}])
+    builder = sample_pools.SamplePoolBuilder(db, seed=1)
+
+    outcome = builder.refresh([2024])
+    assert {(entry["stratum"], entry["action"], entry["size"]) for entry in outcome} == {
+        ("2024|Accept (poster)", "created", 20), ("2024|Reject", "created", 30), ("2024|unknown", "created", 1)
+    }
+    pool = db[sample_pools.POOL_COLLECTION].find_one({"_id": "2024|Reject"})
+    assert sorted(pool["s_ids"]) == sorted(f"r{i}" for i in range(30))
+    assert (pool["cursor"], pool["version"]) == (0, 1)
+
+    assert {entry["action"] for entry in builder.refresh([2024])} == {"unchanged"}
+
+
+def test_pool_patch_keeps_served_order_and_splices_new_papers(db):
+    db["iclr_2024"].insert_many(papers("r", 30, "Reject"))
+    builder = sample_pools.SamplePoolBuilder(db, seed=2)
+    builder.refresh([2024])
+    pools = db[sample_pools.POOL_COLLECTION]
+    before = pools.find_one({"_id": "2024|Reject"})["s_ids"]
+
+    # The API has served 10 picks; one served and one unserved paper leave, two papers arrive
+    pools.update_one({"_id": "2024|Reject"}, {"$set": {"cursor": 10}})
+    db["iclr_2024"].delete_many({"s_id": {"$in": [before[3], before[20]]}})
+    db["iclr_2024"].insert_many(papers("n", 2, "Reject"))
+
+    [entry] = builder.refresh([2024])
+    assert (entry["action"], entry["added"], entry["removed"], entry["size"]) == ("patched", 2, 2, 30)
+
+    pool = pools.find_one({"_id": "2024|Reject"})
+    served = [s_id for s_id in before[:10] if s_id != before[3]]
+    assert pool["s_ids"][:9] == served and pool["cursor"] == 9
+    unserved = pool["s_ids"][9:]
+    assert {"n0", "n1"} <= set(unserved) and before[20] not in unserved
+    assert [s_id for s_id in unserved if not s_id.startswith("n")] == [s_id for s_id in before[10:] if s_id != before[20]]
+    assert pool["version"] == 2
+
+
+def test_pool_reshuffles_when_exhausted_and_drops_stale_strata(db):
+    db["iclr_2024"].insert_many(papers("a", 5, "Accept (oral)") + papers("r", 5, "Reject"))
+    builder = sample_pools.SamplePoolBuilder(db, seed=3)
+    builder.refresh([2024])
+    pools = db[sample_pools.POOL_COLLECTION]
+    pools.update_one({"_id": "2024|Reject"}, {"$set": {"cursor": 5}})
+    db["iclr_2024"].delete_many({"decision": "Accept (oral)"})
+
+    outcome = {entry["stratum"]: entry for entry in builder.refresh([2024])}
+    assert outcome["2024|Reject"]["action"] == "reshuffled"
+    assert outcome["2024|*"] == {"stratum": "2024|*", "action": "dropped", "size": 0, "added": 0, "removed": 1}
+    pool = pools.find_one({"_id": "2024|Reject"})
+    assert (pool["cursor"], pool["cycle"]) == (0, 1)
+    assert pools.find_one({"_id": "2024|Accept (oral)"}) is None
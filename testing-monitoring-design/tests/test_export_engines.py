@@ -0,0 +1,174 @@
+"""
+Export engines end to end against mongomock and moto.
+Run from the repo root with: python -m pytest testing-monitoring-design/tests
+"""
+
+import importlib.util
+import json
+import os
+import sys
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+boto3 = pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "scripts")
+
+BUCKET = "export-test-bucket"
+PREFIX = "iclr-data"
+PAPER_COUNT = 230
+CHUNK_SIZE = 50
+
+
+def load_script(filename, name):
+    """Import a hyphenated script as a module"""
+    spec = importlib.util.spec_from_file_location(name, os.path.join(SCRIPTS_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    # Registered so process pools can pickle its functions
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+exporter_module = load_script("export-20000-papers.py", "export_papers")
+
+
+def paper(i):
+    return {
+        "s_id": f"test{i:05d}",
+        "title": f"Paper {i}",
+        "authors": [f"Author {i % 7}", f"Author {i % 11}"],
+        "abstract": "Learning representations " * (i % 5 + 1),
+        "year": "2024" if i % 10 else None,
+        "decision": "Accept (poster)" if i % 3 == 0 else "Reject",
+        "metareviews": [{"values": {"rating": f"{i % 10}: rating", "confidence": "3"}}] * (i % 4),
+    }
+
+
+@pytest.fixture
+def s3_client(monkeypatch):
+    for variable in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_SECURITY_TOKEN", "AWS_SESSION_TOKEN"):
+        monkeypatch.setenv(variable, "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.delenv("S3_ENDPOINT_URL", raising=False)
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+@pytest.fixture
+def mongo_client():
+    client = mongomock.MongoClient()
+    client["iclr"]["iclr_2024"].insert_many([paper(i) for i in range(PAPER_COUNT)])
+    return client
+
+
+def make_exporter(mongo_client, compression):
+    return exporter_module.MongoDBToS3Exporter(
+        "mongodb://localhost:27017", "iclr", "iclr_2024", BUCKET, PREFIX,
+        client=mongo_client, compression=compression
+    )
+
+
+def run_engine(exporter, engine):
+    if engine == "threads":
+        return exporter.export_papers_in_chunks(chunk_size=CHUNK_SIZE, max_workers=2)
+    return exporter.export_papers_async(
+        chunk_size=CHUNK_SIZE, read_concurrency=2, serialize_workers=1, upload_concurrency=2
+    )
+
+
+def exported_papers(s3_client, exporter, timestamp):
+    papers = []
+    for key in exporter.list_chunk_keys(timestamp):
+        body = s3_client.get_object(Bucket=BUCKET, Key=key)["Body"].read()
+        papers.extend(exporter_module.decode_chunk(body, exporter.compression, exporter.dictionary)["papers"])
+    return papers
+
+
+@pytest.mark.parametrize("engine", ["threads", "async"])
+@pytest.mark.parametrize("compression", exporter_module.CHUNK_COMPRESSIONS)
+def test_engine_exports_every_paper(s3_client, mongo_client, engine, compression):
+    if compression == "zstd-dict" and exporter_module.zstandard is None:
+        pytest.skip("zstandard is not installed")
+
+    exporter = make_exporter(mongo_client, compression)
+    timestamp = run_engine(exporter, engine)
+
+    assert exporter.verify_export(timestamp)
+    papers = exported_papers(s3_client, exporter, timestamp)
+    assert sorted(p["s_id"] for p in papers) == [f"test{i:05d}" for i in range(PAPER_COUNT)]
+    assert all(isinstance(p["_id"], str) for p in papers)
+
+    summary = exporter.last_export["collection_summary"]
+    assert summary["total_papers"] == PAPER_COUNT
+    assert summary["by_year"]["unknown"] == len(range(0, PAPER_COUNT, 10))
+    assert summary["bson_bytes"] > 0
+    assert all(check["match"] for check in exporter.last_export["cross_checks"])
+
+    manifest_key = f"{PREFIX}/manifests/export_manifest_{timestamp}.json"
+    manifest = json.loads(s3_client.get_object(Bucket=BUCKET, Key=manifest_key)["Body"].read())
+    assert manifest["compression"]["codec"] == compression
+
+
+@pytest.mark.parametrize("compression", exporter_module.CHUNK_COMPRESSIONS)
+def test_unified_manifest_matches_single_export_schema(s3_client, mongo_client, compression, monkeypatch):
+    if compression == "zstd-dict" and exporter_module.zstandard is None:
+        pytest.skip("zstandard is not installed")
+
+    mongo_client["iclr"]["iclr_2025"].insert_many([paper(i) for i in range(PAPER_COUNT, PAPER_COUNT + 60)])
+    monkeypatch.setattr(exporter_module, "MongoClient", lambda *args, **kwargs: mongo_client)
+    exporter = exporter_module.MultiYearExporter(
+        "mongodb://localhost:27017", "iclr", {"2024": "iclr_2024", "2025": "iclr_2025"}, BUCKET, PREFIX,
+        compression=compression
+    )
+    timestamp = exporter.export_all_years(chunk_size=CHUNK_SIZE, max_workers_per_year=2)
+
+    manifest_key = f"{PREFIX}/manifests/export_manifest_{timestamp}.json"
+    manifest = json.loads(s3_client.get_object(Bucket=BUCKET, Key=manifest_key)["Body"].read())
+    assert manifest["compression"] == {"codec": compression}
+    assert manifest["total_papers"] == PAPER_COUNT + 60
+    for info in manifest["years"].values():
+        assert info["compression"]["codec"] == compression
+        assert ("dictionary" in info["compression"]) == (compression == "zstd-dict")
+
+
+def test_engines_write_the_same_papers(s3_client, mongo_client):
+    threaded = make_exporter(mongo_client, "none")
+    pipelined = make_exporter(mongo_client, "none")
+    first = exported_papers(s3_client, threaded, run_engine(threaded, "threads"))
+    second = exported_papers(s3_client, pipelined, run_engine(pipelined, "async"))
+
+    assert sorted(first, key=lambda p: p["s_id"]) == sorted(second, key=lambda p: p["s_id"])
+
+
+@pytest.mark.parametrize("compression", exporter_module.CHUNK_COMPRESSIONS)
+def test_auto_tune_probes_the_configured_encoding(s3_client, mongo_client, compression, monkeypatch):
+    if compression == "zstd-dict" and exporter_module.zstandard is None:
+        pytest.skip("zstandard is not installed")
+
+    exporter = make_exporter(mongo_client, compression)
+    probe_keys = []
+    put_object = exporter.s3_client.put_object
+
+    def recording_put_object(**kwargs):
+        probe_keys.append(kwargs["Key"])
+        return put_object(**kwargs)
+
+    monkeypatch.setattr(exporter.s3_client, "put_object", recording_put_object)
+    settings = exporter.auto_tune(chunk_sizes=[20, CHUNK_SIZE])
+
+    assert [probe["chunk_size"] for probe in settings["probes"]] == [20, CHUNK_SIZE]
+    assert probe_keys and all(key.endswith(exporter_module.CHUNK_SUFFIXES[compression]) for key in probe_keys)
+
+
+def test_summary_without_collstats(mongo_client):
+    exporter = make_exporter(mongo_client, "none")
+    summary = exporter.collect_collection_summary(exporter.get_collection())
+
+    assert summary["total_papers"] == PAPER_COUNT
+    assert summary["review_count_histogram"] == {"0": 58, "1": 58, "2": 57, "3": 57}
+    assert summary["bson_bytes"] > 0